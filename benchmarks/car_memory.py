@@ -0,0 +1,49 @@
+"""Memory per Car, as measured by tracemalloc.
+
+Usage:
+    python -m benchmarks.car_memory [--cars 100000]
+
+Cars are created like a car park creates them (random, entered and exited), and like a store loads them (from JSON,
+i.e. every car gets its own copy of the model string before interning). License plates are included.
+"""
+import argparse
+import tracemalloc
+
+from smartpark.car import Car
+
+from benchmarks import fixtures
+
+
+def measure_bytes_per_car(create_cars, num_cars: int) -> float:
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    cars = create_cars(num_cars)
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+
+    assert len(cars) == num_cars
+    return size / num_cars
+
+
+def create_exited_cars(num_cars: int):
+    cars = fixtures.create_cars(num_cars)
+    for car in cars:
+        car.exited_car_park(25.5)
+    return cars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartPark Memory per Car")
+    parser.add_argument("--cars", type=int, default=100_000)
+    args = parser.parse_args()
+
+    car_json = fixtures.create_cars(1)[0].to_json_format()
+
+    for name, create_cars in [("entered", fixtures.create_cars),
+                              ("entered and exited", create_exited_cars),
+                              ("from JSON", lambda n: [Car.from_json(car_json) for _ in range(n)])]:
+        print(f"{name:<20} {measure_bytes_per_car(create_cars, args.cars):8.1f} bytes/car")
+
+
+if __name__ == "__main__":
+    main()
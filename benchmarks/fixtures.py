@@ -0,0 +1,134 @@
+from typing import List
+from datetime import datetime, timedelta
+import os
+import random
+import sqlite3
+import tempfile
+
+from smartpark.car import Car
+from smartpark.carpark import SimulatedCarPark
+
+
+CAR_MODELS = ["ModelA", "ModelB", "ModelC"]
+
+
+def create_car_park_config(name: str = "carpark", total_bays: int = 100) -> dict:
+    """Car Park Configuration for an offline Car Park (i.e. no broker needed)"""
+    return {"name": name,
+            "location": "Benchmark Park",
+            "host": "localhost",
+            "port": 1883,
+            "topic-root": name,
+            "total_bays": total_bays
+            }
+
+
+def create_cars(num_cars: int, seed: int = 0) -> List[Car]:
+    """Random Cars that entered the Car Park, about half of them parked"""
+    random.seed(seed)
+    cars = []
+    for i in range(num_cars):
+        car = Car.generate_random_car(CAR_MODELS)
+        car.entered_car_park(random.uniform(20, 30))
+        if i % 2 == 0:
+            car.car_parked()
+        cars.append(car)
+    return cars
+
+
+def create_car_park(num_cars: int, total_bays: int | None = None, seed: int = 0):
+    """Offline SimulatedCarPark filled with 'num_cars' Cars, about half of them parked. 'total_bays' (default:
+    'num_cars') must be at least half of 'num_cars'."""
+    total_bays = num_cars if total_bays is None else total_bays
+    car_park = SimulatedCarPark(create_car_park_config(total_bays=total_bays), connect=False)
+    car_park.temperature = 25
+
+    for car in create_cars(num_cars, seed):
+        car_park.add_car(car)
+
+    return car_park
+
+
+def create_config_file(num_car_parks: int, sensors_per_car_park: int = 2, displays_per_car_park: int = 2) -> str:
+    """Write a generated TOML Configuration with many Car Parks. Returns its path."""
+    lines = []
+    for i in range(num_car_parks):
+        lines += ["[[car_parks]]",
+                  f'name = "carpark{i}"',
+                  f'location = "Location {i}"',
+                  'host = "localhost"',
+                  "port = 1883",
+                  f'topic-root = "carpark{i}"',
+                  f"total_bays = {100 + i}",
+                  ""]
+
+        for j in range(sensors_per_car_park):
+            lines += ["[[car_parks.sensors]]",
+                      f'name = "sensor{j}"',
+                      f'location = "L{i}"',
+                      f'type = "{"entry" if j % 2 == 0 else "exit"}"',
+                      ""]
+
+        for j in range(displays_per_car_park):
+            lines += ["[[car_parks.displays]]", f'name = "display{j}"', ""]
+
+    with tempfile.NamedTemporaryFile("w", suffix=".toml", delete=False) as file:
+        file.write("\n".join(lines))
+
+    return file.name
+
+
+def create_stays(num_stays: int, seed: int = 0) -> List[Car]:
+    """Cars with a History of Stays: one entry per minute on average, stays of 10 min to 5 h"""
+    random.seed(seed)
+    cars = []
+    entry_time = 1_700_000_000
+    for i in range(num_stays):
+        entry_time += random.randint(1, 119)
+        car = Car(f"P{i:07d}", random.choice(CAR_MODELS))
+        car.entry_timestamp = entry_time
+        car.exit_timestamp = entry_time + random.randint(600, 18000)
+        cars.append(car)
+    return cars
+
+
+def create_visit_store(num_visits: int, seed: int = 0):
+    """Visit Store filled with a History of Visits: one entry per minute on average, stays of 10 min to 5 h.
+    Returns (store, start_time) where start_time is the first entry, in seconds since the car's epoch."""
+    from smartpark.visit_store import VisitStore
+
+    random.seed(seed)
+    store = VisitStore(os.path.join(tempfile.mkdtemp(), "visits.db"))
+
+    start_time = 1_700_000_000
+    rows = []
+    entry_time = start_time
+    for i in range(num_visits):
+        entry_time += random.randint(1, 119)
+        rows.append((f"P{i % (num_visits // 4 + 1):07d}", random.choice(CAR_MODELS), entry_time,
+                     random.uniform(20, 30), entry_time + random.randint(600, 18000), random.uniform(20, 30)))
+
+    connection = sqlite3.connect(store.db_path)
+    with connection:
+        connection.executemany("INSERT INTO visits (license_plate, car_model, entry_time, entry_temperature, "
+                               "exit_time, exit_temperature) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    connection.close()
+
+    return store, start_time
+
+
+def create_reservation_book(num_reservations: int, total_bays: int = 500, seed: int = 0):
+    """Reservation Book filled with future Reservations: one start per minute on average, 30 min to 4 h long.
+    Returns (book, start_time) where start_time is the first start."""
+    from smartpark.reservations import ReservationBook
+
+    random.seed(seed)
+    book = ReservationBook(total_bays, seed=seed)
+
+    start_time = datetime(2030, 1, 1)
+    start = start_time
+    for i in range(num_reservations):
+        start += timedelta(seconds=random.randint(1, 119))
+        book.book(f"R{i:07d}", start, start + timedelta(seconds=random.randint(1800, 14400)))
+
+    return book, start_time
@@ -0,0 +1,109 @@
+from typing import Callable, Dict, List
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+
+class BenchmarkResult:
+    """Timing Samples of a Benchmark, in seconds per operation"""
+    def __init__(self, name: str, samples: List[float], number: int):
+        self.name = name
+        self.samples = sorted(samples)
+        self.number = number
+
+    def percentile(self, q: float) -> float:
+        index = min(len(self.samples) - 1, max(0, round(q / 100 * (len(self.samples) - 1))))
+        return self.samples[index]
+
+    def to_dict(self) -> dict:
+        return {"number": self.number,
+                "repeats": len(self.samples),
+                "min": self.samples[0],
+                "mean": statistics.fmean(self.samples),
+                "p50": self.percentile(50),
+                "p90": self.percentile(90),
+                "p99": self.percentile(99),
+                "max": self.samples[-1]
+                }
+
+
+class BenchmarkSuite:
+    """Collection of Benchmarks with stable timing: warmup, repeats and percentiles.
+
+    Each repeat times 'number' calls of the benchmark function with the garbage collector disabled, like timeit.
+    Results are saved as JSON and can be compared against a stored baseline on the median (p50).
+    """
+    def __init__(self, warmup: int = 2, repeats: int = 15):
+        self._warmup = warmup
+        self._repeats = repeats
+        self._benchmarks: Dict[str, tuple] = {}
+        self.results: Dict[str, BenchmarkResult] = {}
+
+    def add(self, name: str, func: Callable[[], object], number: int = 1, setup: Callable[[], None] | None = None):
+        """Register a Benchmark. 'setup' runs before every repeat and is not timed."""
+        self._benchmarks[name] = (func, number, setup)
+
+    def run(self, name_filter: str | None = None) -> Dict[str, BenchmarkResult]:
+        for name, (func, number, setup) in self._benchmarks.items():
+            if name_filter is not None and name_filter not in name:
+                continue
+
+            for _ in range(self._warmup):
+                if setup is not None:
+                    setup()
+                for _ in range(number):
+                    func()
+
+            samples = []
+            for _ in range(self._repeats):
+                if setup is not None:
+                    setup()
+
+                gc.collect()
+                gc.disable()
+                try:
+                    start = time.perf_counter()
+                    for _ in range(number):
+                        func()
+                    samples.append((time.perf_counter() - start) / number)
+                finally:
+                    gc.enable()
+
+            self.results[name] = BenchmarkResult(name, samples, number)
+            print(f"{name:<50} p50={self.results[name].percentile(50) * 1e6:>12.2f} us"
+                  f"  p90={self.results[name].percentile(90) * 1e6:>12.2f} us")
+
+        return self.results
+
+    def save(self, file_path: str):
+        out_dict = {"python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "results": {name: result.to_dict() for name, result in self.results.items()}
+                    }
+
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        with open(file_path, "w") as file:
+            json.dump(out_dict, file, indent=4)
+
+    def compare(self, baseline_path: str, tolerance: float = 0.25) -> List[str]:
+        """Compare the medians against a Baseline. Returns the Benchmarks slower than (1 + tolerance) x baseline."""
+        with open(baseline_path, "r") as file:
+            baseline = json.load(file)["results"]
+
+        regressions = []
+        for name, result in self.results.items():
+            if name not in baseline:
+                continue
+
+            ratio = result.percentile(50) / baseline[name]["p50"]
+            status = "REGRESSION" if ratio > 1 + tolerance else "ok"
+            print(f"{name:<50} {ratio:>6.2f}x baseline  {status}")
+
+            if ratio > 1 + tolerance:
+                regressions.append(name)
+
+        return regressions
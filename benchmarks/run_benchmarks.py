@@ -0,0 +1,415 @@
+"""Performance Benchmarks for the core hot paths.
+
+Usage:
+    python -m benchmarks.run_benchmarks [--quick] [--filter <name>] [--save-baseline]
+
+Results are written to benchmarks/results/latest.json and compared against benchmarks/baseline.json when it
+exists. The exit code is 1 when a benchmark regressed by more than the tolerance.
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+import argparse
+import contextlib
+import importlib.util
+import io
+import itertools
+import os
+import random
+import subprocess
+import sys
+import threading
+import uuid
+
+import paho.mqtt.client as paho
+
+from smartpark.car import Car, timestamp_to_datetime
+from smartpark.config import Config, flatten_zone_configs
+from smartpark.occupancy_index import OccupancyIndex
+from smartpark.bays import BayMap
+from smartpark.zones import ZoneTree
+from smartpark.dedup import EventDeduplicator
+from smartpark.reorder import ReorderBuffer
+from smartpark.telemetry import TemperatureFilter
+from smartpark.ingress import IngressQueue
+from smartpark.overstays import OverstayMonitor
+from smartpark.heartbeat import SensorLivenessMonitor
+from smartpark.analytics import CarParkAnalytics
+from smartpark.carpark import CarPark
+from smartpark.simulation import VirtualClock, CarParkSimulation
+from smartpark.executor import KeyedExecutor
+from smartpark.display_protocol import DeltaEncoder, DeltaDecoder
+from smartpark.tracing import create_trace_field, parse_trace_field
+
+from benchmarks.harness import BenchmarkSuite
+from benchmarks import fixtures
+
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+
+
+def add_car_park_benchmarks(suite: BenchmarkSuite, sizes):
+    for num_cars in sizes:
+        car_park = fixtures.create_car_park(num_cars)
+        # O(1) properties: many calls per sample, else the sample is the timer overhead
+        suite.add(f"car_park.available_bays[{num_cars}]", lambda cp=car_park: cp.available_bays, number=100000)
+        suite.add(f"car_park.parked_cars[{num_cars}]", lambda cp=car_park: cp.parked_cars, number=100000)
+        suite.add(f"car_park.get_all_cars[{num_cars}]", lambda cp=car_park: cp.get_all_cars(),
+                  number=max(10, 1000000 // num_cars))
+
+
+def add_car_benchmarks(suite: BenchmarkSuite):
+    car = fixtures.create_cars(1)[0]
+    car_json, car_csv = car.to_json_format(), car.to_csv_format()
+
+    suite.add("car.json_round_trip", lambda: Car.from_json(car.to_json_format()), number=2000)
+    suite.add("car.csv_round_trip", lambda: Car.from_csv(car.to_csv_format()), number=2000)
+    suite.add("car.from_json", lambda: Car.from_json(car_json), number=2000)
+    suite.add("car.from_csv", lambda: Car.from_csv(car_csv), number=2000)
+
+
+def add_config_benchmarks(suite: BenchmarkSuite, num_car_parks: int):
+    config_path = fixtures.create_config_file(num_car_parks)
+    config = Config(config_path)
+    os.remove(config_path)
+
+    last = f"carpark{num_car_parks - 1}"
+    suite.add(f"config.get_car_park_config[{num_car_parks}]", lambda: config.get_car_park_config(last))
+    suite.add(f"config.get_sensor_pub_topics[{num_car_parks}]", lambda: config.get_sensor_pub_topics(last))
+    suite.add(f"config.get_sensor_config_dict[{num_car_parks}]",
+              lambda: config.get_sensor_config_dict(last, "sensor1", "exit"))
+    suite.add(f"config.get_display_config_dict[{num_car_parks}]",
+              lambda: config.get_display_config_dict(last, "display1"))
+
+
+def add_display_benchmarks(suite: BenchmarkSuite):
+    fields = ["42", "24.5", "2024-01-01 10:00:00", "60", "58", "2"]
+    legacy_msg = ";".join(fields)
+    traced_msg = legacy_msg + ";" + create_trace_field("0123456789abcdef", 1700000000.0)
+
+    encoder = DeltaEncoder(keyframe_interval=1000000)
+    decoder = DeltaDecoder()
+    decoder.decode(encoder.encode(fields))
+    counter = itertools.count()
+
+    def delta_round_trip():
+        i = next(counter)
+        decoder.decode(encoder.encode([str(i % 100), "24.5", "2024-01-01 10:00:00", str(i), str(i), "0"]))
+
+    suite.add("display.parse_legacy", lambda: legacy_msg.split(";"), number=10000)
+    suite.add("display.parse_traced", lambda: parse_trace_field(traced_msg.split(";")[6]), number=10000)
+    suite.add("display.delta_round_trip", delta_round_trip, number=10000)
+
+
+def add_message_handling_benchmarks(suite: BenchmarkSuite, num_cars: int):
+    car_park = fixtures.create_car_park(num_cars)
+    signals = itertools.cycle([b"Enter,24.5", b"Exit,25.5"])
+    message = paho.MQTTMessage(topic=b"carpark/L1/sensor0/entry")
+
+    def handle_message():
+        message.payload = next(signals)
+        car_park.on_message(car_park.client, None, message)
+
+    def handle_messages_quietly():
+        with contextlib.redirect_stdout(io.StringIO()):  # The car park prints its state on every event
+            for _ in range(100):
+                handle_message()
+
+    suite.add(f"car_park.on_message[{num_cars}] x100", handle_messages_quietly)
+
+
+def add_visit_store_benchmarks(suite: BenchmarkSuite, num_visits: int):
+    store, start_time = fixtures.create_visit_store(num_visits)
+    middle = timestamp_to_datetime(start_time + num_visits * 30)  # About half way through the history
+    car = fixtures.create_cars(1)[0]
+
+    suite.add(f"visit_store.by_license_plate[{num_visits}]", lambda: store.get_visits_by_license_plate("P0000042"),
+              number=100)
+    suite.add(f"visit_store.in_window_1h[{num_visits}]",
+              lambda: store.get_visits_in_window(middle, middle + timedelta(hours=1)), number=100)
+    suite.add(f"visit_store.by_car_model_1h[{num_visits}]",
+              lambda: store.get_visits_by_car_model("ModelA", middle, middle + timedelta(hours=1)), number=100)
+    suite.add("visit_store.record_entry", lambda: store.record_entry(car), number=1000, setup=store.flush)
+
+
+def add_occupancy_index_benchmarks(suite: BenchmarkSuite, num_stays: int):
+    cars = fixtures.create_stays(num_stays)
+    index = OccupancyIndex.build(cars, seed=0)
+    times = itertools.cycle([timestamp_to_datetime(car.entry_timestamp) for car in cars[::max(1, num_stays // 1000)]])
+    counter = itertools.count(cars[-1].exit_timestamp)
+
+    def peak_occupancy_1d():
+        start = next(times)
+        index.peak_occupancy(start, start + timedelta(days=1))
+
+    suite.add(f"occupancy_index.build[{num_stays}]", lambda: OccupancyIndex.build(cars, seed=0))
+    suite.add(f"occupancy_index.add_change[{num_stays}]", lambda: index.add_change(next(counter), 1), number=1000)
+    suite.add(f"occupancy_index.occupancy_at[{num_stays}]", lambda: index.occupancy_at(next(times)), number=1000)
+    suite.add(f"occupancy_index.peak_occupancy_1d[{num_stays}]", peak_occupancy_1d, number=1000)
+
+
+def add_reservation_benchmarks(suite: BenchmarkSuite, num_reservations: int):
+    book, start_time = fixtures.create_reservation_book(num_reservations)
+    offsets = itertools.cycle(range(0, num_reservations * 60, max(1, num_reservations * 60 // 1000)))
+
+    def book_and_cancel():
+        start = start_time + timedelta(seconds=next(offsets))
+        reservation = book.book("ABC-123", start, start + timedelta(hours=2))
+        if reservation is not None:
+            book.cancel(reservation.reservation_id)
+
+    def available_bays_2h():
+        start = start_time + timedelta(seconds=next(offsets))
+        book.available_bays(start, start + timedelta(hours=2))
+
+    suite.add(f"reservations.book_and_cancel[{num_reservations}]", book_and_cancel, number=1000)
+    suite.add(f"reservations.held_bays[{num_reservations}]",
+              lambda: book.held_bays(start_time + timedelta(seconds=next(offsets))), number=1000)
+    suite.add(f"reservations.available_bays_2h[{num_reservations}]", available_bays_2h, number=1000)
+
+
+def add_bay_benchmarks(suite: BenchmarkSuite, num_bays: int):
+    random.seed(0)
+    bays = BayMap([random.uniform(0, 500) for _ in range(num_bays)])
+    for _ in range(num_bays // 2):  # Half full
+        bays.allocate()
+
+    def allocate_and_release():
+        bays.release(bays.allocate())
+
+    suite.add(f"bays.allocate_and_release[{num_bays}]", allocate_and_release, number=1000)
+    suite.add(f"bays.encode[{num_bays}]", lambda: bays.encode(0), number=100)
+
+
+def add_zone_benchmarks(suite: BenchmarkSuite, num_levels: int):
+    """Zones of a large site: levels, each with EV / accessible / staff / general areas of rows of 20 bays"""
+    zone_configs = flatten_zone_configs([
+        {"name": f"level{i}", "zones": [{"name": area, "zones": [{"name": f"row{j}", "bays": 20} for j in range(10)]}
+                                        for area in ["ev", "accessible", "staff", "general"]]}
+        for i in range(num_levels)])
+    zones = ZoneTree(zone_configs)
+    leaves = itertools.cycle([zones.get_zone_of_bay(bay_id) for bay_id in range(0, num_levels * 800, 7)])
+
+    def occupy_and_release():
+        zone_id = next(leaves)
+        zones.occupy(zone_id)
+        zones.release(zone_id)
+
+    suite.add(f"zones.occupy_and_release[{len(zones)}]", occupy_and_release, number=1000)
+    suite.add(f"zones.find_free_zone[{len(zones)}]", zones.find_free_zone, number=1000)
+
+
+def add_dedup_benchmarks(suite: BenchmarkSuite):
+    deduplicator = EventDeduplicator()
+    seqs = itertools.count(1)
+    event_ids = [uuid.uuid4().hex for _ in range(10000)]
+
+    def new_event():
+        seq = next(seqs)
+        deduplicator.is_duplicate("carpark/L1/sensor0/entry", seq, event_ids[seq % len(event_ids)])
+
+    def duplicate_event():
+        deduplicator.is_duplicate("carpark/L1/sensor0/entry", 1, event_ids[1])
+
+    suite.add("dedup.new_event", new_event, number=2000)
+    suite.add("dedup.duplicate_event", duplicate_event, number=2000)
+
+
+def add_reorder_benchmarks(suite: BenchmarkSuite):
+    """Events of 4 sensors, out of order by up to 0.5 s, buffered for 1 s"""
+    buffer = ReorderBuffer(max_lateness=1.0)
+    random.seed(0)
+    jitters = itertools.cycle([random.uniform(0, 0.5) for _ in range(1000)])
+    timestamps = itertools.count(0, 0.01)
+
+    def push_and_pop():
+        buffer.push(next(timestamps) - next(jitters), None)
+        buffer.pop_ready()
+
+    suite.add("reorder.push_and_pop", push_and_pop, number=2000)
+
+
+def add_telemetry_benchmarks(suite: BenchmarkSuite):
+    temperature_filter = TemperatureFilter(deadband=0.5, max_interval=60, window=5)
+    random.seed(0)
+    readings = itertools.cycle([25 + random.gauss(0, 0.2) for _ in range(1000)])
+
+    suite.add("telemetry.filter_update", lambda: temperature_filter.update(next(readings)), number=2000)
+
+
+def add_ingress_benchmarks(suite: BenchmarkSuite):
+    queue = IngressQueue(1000)
+
+    def put_and_get():
+        queue.put("telemetry", event=False)
+        queue.put("entry")
+        queue.get()
+        queue.get()
+
+    suite.add("ingress.put_get", put_and_get, number=2000)
+
+
+def add_executor_benchmarks(suite: BenchmarkSuite, num_messages: int):
+    """Messages of several Car Parks handed to the Worker Pool, until all of them are handled"""
+    executor = KeyedExecutor(4, name="benchmark-executor")
+    keys = [f"carpark{i}" for i in range(8)]
+
+    def submit_and_drain():
+        done = [threading.Event() for _ in keys]
+        for i in range(num_messages):
+            executor.submit(keys[i % len(keys)], int)
+        for key, event in zip(keys, done):
+            executor.submit(key, event.set)
+        for event in done:
+            event.wait()
+
+    suite.add(f"executor.submit_{num_messages}", submit_and_drain)
+
+
+def add_overstay_benchmarks(suite: BenchmarkSuite, num_cars: int):
+    """Deadlines of many live Cars: entries, exits and checks, each touching only the cars concerned"""
+    monitor = OverstayMonitor(max_stay=4 * 3600)
+    cars = []
+    for i in range(num_cars):
+        car = Car(f"CAR-{i}", "ModelA")
+        car.entry_timestamp = i % 3600
+        monitor.on_car_added(car)
+        cars.append(car)
+
+    timestamps = itertools.count(4 * 3600)
+    car_ids = itertools.cycle(range(num_cars))
+
+    def exit_enter_and_check():
+        car = cars[next(car_ids)]
+        monitor.on_car_removed(car)
+        car.entry_timestamp = next(timestamps)
+        monitor.on_car_added(car)
+        monitor.check(car.entry_timestamp)
+
+    suite.add(f"overstays.exit_enter_check_{num_cars}", exit_enter_and_check, number=2000)
+
+
+def add_heartbeat_benchmarks(suite: BenchmarkSuite, num_sensors: int):
+    """Heartbeats of a Fleet of Sensors, each rescheduling one deadline, with a liveness check per heartbeat"""
+    monitor = SensorLivenessMonitor(timeout=30, now=0)
+    sensor_topics = [f"carpark/L{i % 100}/sensor{i}/entry" for i in range(num_sensors)]
+    for sensor_topic in sensor_topics:
+        monitor.watch(sensor_topic, 0)
+
+    # Every sensor beats once per 10 s: the clock advances 10 s per round of heartbeats
+    heartbeats = itertools.count()
+
+    def beat_and_check():
+        i = next(heartbeats)
+        now = 10 * i / num_sensors
+        monitor.beat(sensor_topics[i % num_sensors], now)
+        monitor.check(now)
+
+    suite.add(f"heartbeat.beat_check_{num_sensors}", beat_and_check, number=2000)
+
+
+def add_simulation_benchmarks(suite: BenchmarkSuite, total_bays: int):
+    """A Day of Traffic of a Car Park in virtual time, at about half occupancy"""
+    def simulate_day():
+        clock = VirtualClock(datetime(2026, 1, 5))
+        car_park = CarPark(fixtures.create_car_park_config(total_bays=total_bays), clock=clock, connect=False)
+        CarParkSimulation(car_park, clock, arrival_rate=total_bays / 5, seed=0).run(timedelta(days=1))
+
+    suite.add(f"simulation.day_{total_bays}_bays", simulate_day, number=1)
+
+
+def add_analytics_benchmarks(suite: BenchmarkSuite):
+    analytics = CarParkAnalytics(seed=0)
+    cars = fixtures.create_cars(1000)
+    for i, car in enumerate(cars):
+        car.entry_timestamp = i
+        car.exit_temperature = 25
+    car_ids = itertools.cycle(range(len(cars)))
+
+    def enter_and_exit():
+        car = cars[next(car_ids)]
+        car.exit_timestamp = car.entry_timestamp + 3600
+        analytics.on_car_added(car)
+        analytics.on_car_removed(car)
+
+    suite.add("analytics.enter_exit", enter_and_exit, number=2000)
+    suite.add("analytics.summary", lambda: analytics.encode(3600), number=20)
+
+
+def add_forecast_benchmarks(suite: BenchmarkSuite, num_car_parks: int):
+    """Refit of the Forecasts of many Car Parks from two weeks of history each, one sample every 5 minutes"""
+    if importlib.util.find_spec("numpy") is None:  # Optional dependency
+        return
+
+    import numpy as np
+    from smartpark.forecast import OccupancyForecaster
+
+    rng = np.random.default_rng(0)
+    timestamps = np.arange(0, 14 * 86400, 300) + 1_767_571_200
+    total_bays = rng.integers(50, 2000, num_car_parks)
+    histories = [(timestamps, rng.integers(0, bays, len(timestamps))) for bays in total_bays]
+    forecaster = OccupancyForecaster(total_bays)
+
+    suite.add(f"forecast.fit_{num_car_parks}_car_parks", lambda: forecaster.fit(histories), number=1)
+    suite.add(f"forecast.forecast_{num_car_parks}_car_parks", lambda: forecaster.forecast(int(timestamps[-1])),
+              number=20)
+
+
+def add_startup_benchmarks(suite: BenchmarkSuite):
+    """Cold Start of a fresh interpreter, e.g. a headless edge box running every role in one process"""
+    def cold_start(code: str):
+        return lambda: subprocess.run([sys.executable, "-c", code], check=True)
+
+    suite.add("startup.headless_roles", cold_start("import smartpark.sensor, smartpark.carpark, smartpark.display"))
+    suite.add("startup.runner", cold_start("import smartpark.runner"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartPark Performance Benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Smaller fixtures and fewer repeats")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--output", default=str(BENCHMARKS_DIR / "results" / "latest.json"))
+    parser.add_argument("--baseline", default=str(BENCHMARKS_DIR / "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown of the median")
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite(warmup=1 if args.quick else 3, repeats=5 if args.quick else 20)
+
+    add_car_park_benchmarks(suite, [1000] if args.quick else [10000, 100000])
+    add_car_benchmarks(suite)
+    add_config_benchmarks(suite, 50 if args.quick else 500)
+    add_display_benchmarks(suite)
+    add_message_handling_benchmarks(suite, 100 if args.quick else 1000)
+    add_visit_store_benchmarks(suite, 10000 if args.quick else 500000)
+    add_occupancy_index_benchmarks(suite, 10000 if args.quick else 200000)
+    add_reservation_benchmarks(suite, 10000 if args.quick else 50000)
+    add_bay_benchmarks(suite, 1000 if args.quick else 100000)
+    add_zone_benchmarks(suite, 5 if args.quick else 50)
+    add_dedup_benchmarks(suite)
+    add_reorder_benchmarks(suite)
+    add_telemetry_benchmarks(suite)
+    add_ingress_benchmarks(suite)
+    add_overstay_benchmarks(suite, 10000 if args.quick else 300000)
+    add_executor_benchmarks(suite, 1000 if args.quick else 10000)
+    add_heartbeat_benchmarks(suite, 1000 if args.quick else 50000)
+    add_analytics_benchmarks(suite)
+    add_simulation_benchmarks(suite, 200 if args.quick else 2000)
+    add_forecast_benchmarks(suite, 50 if args.quick else 500)
+    add_startup_benchmarks(suite)
+
+    suite.run(args.filter)
+    suite.save(args.output)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        suite.save(args.baseline)
+        print(f"Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        regressions = suite.compare(args.baseline, args.tolerance)
+        if len(regressions) > 0:
+            print(f"Regressions: {regressions}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Long-running Soak Test for memory growth and leaks.
+
+Drives synthetic Entry/Exit Events through an offline SimulatedCarPark and its Displays (delivered in-process, no
+broker needed), takes periodic tracemalloc snapshots and RSS samples, and reports the top growth sites.
+
+Usage:
+    python -m benchmarks.soak [--events 1000000] [--budget-mb 16] [--enter-prb 0.5]
+
+The exit code is 1 when the traced memory grew by more than the budget after the warmup. Expect a few minutes
+per 100k events: every event is logged to a file and tracemalloc slows allocations down.
+"""
+from typing import Any, List
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import paho.mqtt.client as paho
+
+from smartpark.carpark import SimulatedCarPark
+from smartpark.display import Display, decode_display_message, trace_display_message
+
+from benchmarks import fixtures
+
+
+class SoakDisplay(Display):
+    """Display that parses Messages like the other Displays, without printing or storing them"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.num_messages = 0
+        self.last_fields: List[str] = []
+
+    def start_listening(self):
+        pass
+
+    @decode_display_message
+    @trace_display_message
+    def on_message(self, client: paho.Client, userdata: Any, message: paho.MQTTMessage):
+        msg_str = message.payload.decode().split(';')
+        self.last_fields = [int(msg_str[0]), float(msg_str[1]), msg_str[2], int(msg_str[3]), int(msg_str[4]),
+                            int(msg_str[5])]
+        self.num_messages += 1
+
+
+class _LoopbackPublisher:
+    """Deliver the Messages published by the Car Park directly to the Displays, in-process"""
+    def __init__(self, displays: List[Display]):
+        self._displays = displays
+
+    def __call__(self, topic: str, payload: str = None, *args, **kwargs):
+        for display in self._displays:
+            message = paho.MQTTMessage(topic=topic.encode())
+            message.payload = payload.encode()
+            display.on_message(display.client, None, message)
+        return paho.MQTTMessageInfo(0)  # rc = MQTT_ERR_SUCCESS
+
+
+def get_rss_bytes() -> int:
+    """Current Resident Set Size of this process, or the peak RSS when the current one is not available"""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def run_soak(num_events: int, num_samples: int, warmup_events: int, enter_prb: float, total_bays: int,
+             num_displays: int, delta: bool, seed: int, top: int, frames: int = 1) -> dict:
+    random.seed(seed)
+
+    car_park_config = fixtures.create_car_park_config(total_bays=total_bays)
+    if delta:
+        car_park_config["display_protocol"] = "delta"
+
+    car_park = SimulatedCarPark(car_park_config, connect=False)
+    display_topic = car_park.display_topic
+    displays = [SoakDisplay(fixtures.create_car_park_config(f"display{i}") | {"topic-qualifier": "na"},
+                            display_topic, connect=False)
+                for i in range(num_displays)]
+    car_park.client.publish = _LoopbackPublisher(displays)
+
+    message = paho.MQTTMessage(topic=b"carpark/L1/sensor0/entry")
+    sample_every = max(1, num_events // num_samples)
+
+    tracemalloc.start(frames)
+    baseline_snapshot, baseline_traced = None, 0
+    samples = []
+    start = time.monotonic()
+
+    # The car park prints its state on every event
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(1, num_events + 1):
+            signal = "Enter" if random.random() < enter_prb else "Exit"
+            message.payload = f"{signal},{random.uniform(20, 30):.1f}".encode()
+            car_park.on_message(car_park.client, None, message)
+
+            if i == warmup_events:
+                baseline_snapshot = tracemalloc.take_snapshot()
+                baseline_traced = tracemalloc.get_traced_memory()[0]
+
+            if i % sample_every == 0:
+                traced, peak = tracemalloc.get_traced_memory()
+                samples.append({"events": i,
+                                "elapsed": time.monotonic() - start,
+                                "traced_mb": traced / 2 ** 20,
+                                "peak_mb": peak / 2 ** 20,
+                                "rss_mb": get_rss_bytes() / 2 ** 20,
+                                "cars": car_park.total_cars
+                                })
+                sys.__stdout__.write(f"{samples[-1]}\n")
+                sys.__stdout__.flush()
+
+    final_snapshot = tracemalloc.take_snapshot()
+    final_traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    top_growth = []
+    if baseline_snapshot is not None:
+        growth_stats = [stat for stat in final_snapshot.compare_to(baseline_snapshot, "lineno") if stat.size_diff > 0]
+        for stat in sorted(growth_stats, key=lambda stat: stat.size_diff, reverse=True)[:top]:
+            top_growth.append(f"{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks) - {stat.traceback}")
+
+    return {"events": num_events,
+            "elapsed": time.monotonic() - start,
+            "growth_mb": (final_traced - baseline_traced) / 2 ** 20,
+            "cars": car_park.total_cars,
+            "display_messages": [display.num_messages for display in displays],
+            "samples": samples,
+            "top_growth": top_growth
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartPark Soak Test")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--samples", type=int, default=20, help="Number of memory samples")
+    parser.add_argument("--warmup", type=int, default=None, help="Events before the baseline (default: 5%%)")
+    parser.add_argument("--budget-mb", type=float, default=16.0, help="Allowed traced memory growth after warmup")
+    parser.add_argument("--enter-prb", type=float, default=0.5,
+                        help="Probability of an entry. Above 0.5 the car park fills up and memory grows by design.")
+    parser.add_argument("--total-bays", type=int, default=500)
+    parser.add_argument("--displays", type=int, default=2)
+    parser.add_argument("--delta", action="store_true", help="Use the delta display protocol")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top", type=int, default=10, help="Number of growth sites to report")
+    parser.add_argument("--frames", type=int, default=1, help="Traceback depth of tracemalloc (slower when deeper)")
+    args = parser.parse_args()
+
+    report = run_soak(args.events, args.samples, args.warmup or max(1, args.events // 20), args.enter_prb,
+                      args.total_bays, args.displays, args.delta, args.seed, args.top, args.frames)
+
+    print(f"Events: {report['events']} in {report['elapsed']:.1f} s, cars left: {report['cars']}")
+    print(f"Traced memory growth after warmup: {report['growth_mb']:.3f} MiB (budget {args.budget_mb} MiB)")
+    print("Top growth sites:")
+    for line in report["top_growth"]:
+        print(f"    {line}")
+
+    if report["growth_mb"] > args.budget_mb:
+        print("FAILED: memory growth exceeds the budget")
+        sys.exit(1)
+
+    print("PASSED")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,12 @@ setup(
         "sense-hat",
         "toml"
     ],
+    extras_require={
+        "forecast": ["numpy"]  # Occupancy Forecasts, see smartpark.forecast
+    },
     entry_points={
         "console_scripts": [
-            "smartpark = smartpark.main:main",
+            "smartpark = smartpark.runner:main",
         ],
     },
     python_requires=">=3.10"
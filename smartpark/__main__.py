@@ -1,19 +1,6 @@
-import concurrent.futures
-import subprocess
-import sys
-
-from smartpark.project_paths import SMART_PARK_DIR
-
-
-def run_script(script_name):
-    """Run a Python Script"""
-    subprocess.run([sys.executable, SMART_PARK_DIR / script_name])
+from smartpark.runner import main
 
 
 if __name__ == "__main__":
-    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-        executor.submit(run_script, "sensor.py")
-        executor.submit(run_script, "carpark.py")
-        executor.submit(run_script, "display.py")
-
-    print("Closing Car Park Simulation Program")
+    # Sensor, Car Park and Display run in this process, the second Tk GUI in its own process (see smartpark/runner.py)
+    main()
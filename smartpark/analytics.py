@@ -0,0 +1,250 @@
+from typing import Dict, List, Sequence
+import json
+import math
+import random
+import threading
+
+from smartpark.car import Car
+
+
+def create_analytics_topic(display_topic: str) -> str:
+    """Create the Topic of the Analytics Summaries, published periodically by the Car Park (see CarParkAnalytics)"""
+    return f"{display_topic}/analytics"
+
+
+class KLLSketch:
+    """KLL Quantile Sketch: approximate quantiles of a stream in constant memory, mergeable across car parks.
+
+    Items go to a stack of compactors. When a level is full, it is sorted and every other item (from a random offset)
+    is promoted to the next level with twice the weight, the rest are dropped. Level capacities shrink by 'c' going
+    down from the top, so the sketch holds O(k) items and the rank error is about 1.7 / k, whatever the stream length.
+    """
+    DEFAULT_K = 200
+
+    def __init__(self, k: int = DEFAULT_K, c: float = 2 / 3, seed: int | None = None):
+        if k < 8:
+            raise ValueError("k must be at least 8")
+
+        self._k = k
+        self._c = c
+        self._random = random.Random(seed)
+        self._compactors: List[list] = [[]]
+        self._size = 0  # Items held in the compactors
+        self._max_size = self._capacity(0)
+        self._count = 0  # Items seen
+
+    def __len__(self) -> int:
+        """Number of Items seen"""
+        return self._count
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._compactors) - level - 1
+        return int(math.ceil(self._c ** depth * self._k)) + 1
+
+    def _grow(self):
+        self._compactors.append([])
+        self._max_size = sum(self._capacity(level) for level in range(len(self._compactors)))
+
+    def update(self, item: float):
+        self._compactors[0].append(item)
+        self._size += 1
+        self._count += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self):
+        for level in range(len(self._compactors)):
+            compactor = self._compactors[level]
+            if len(compactor) < self._capacity(level):
+                continue
+
+            if level + 1 == len(self._compactors):
+                self._grow()
+
+            compactor.sort()
+            last = compactor.pop() if len(compactor) % 2 == 1 else None  # An odd item stays on its level
+            self._compactors[level + 1].extend(compactor[self._random.randint(0, 1)::2])
+            compactor.clear()
+            if last is not None:
+                compactor.append(last)
+
+            self._size = sum(len(c) for c in self._compactors)
+            if self._size < self._max_size:
+                break
+
+    def merge(self, other: "KLLSketch"):
+        """Add the Items of another Sketch, e.g. to summarize several car parks"""
+        while len(self._compactors) < len(other._compactors):
+            self._grow()
+
+        for level, compactor in enumerate(other._compactors):
+            self._compactors[level].extend(compactor)
+
+        self._count += other._count
+        self._size = sum(len(c) for c in self._compactors)
+        while self._size >= self._max_size:
+            self._compress()
+
+    def quantiles(self, fractions: Sequence[float]) -> List[float | None]:
+        """Approximate Quantiles, e.g. [0.5, 0.9] for the median and the 90th percentile. None when empty."""
+        weighted = sorted((item, 1 << level) for level, compactor in enumerate(self._compactors) for item in compactor)
+        total = sum(weight for _, weight in weighted)
+        if total == 0:
+            return [None for _ in fractions]
+
+        results = []
+        for fraction in fractions:
+            target, cumulative = fraction * total, 0
+            value = weighted[-1][0]
+            for item, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    value = item
+                    break
+            results.append(value)
+        return results
+
+
+class EWMARate:
+    """Event Rates as Exponentially Weighted Moving Averages over several Horizons (seconds), in events per hour.
+
+    Each horizon keeps one decaying value: an event adds 1 / horizon after decaying it by exp(-elapsed / horizon).
+    """
+    DEFAULT_HORIZONS = (300, 3600, 86400)  # 5 minutes, 1 hour, 1 day
+
+    def __init__(self, horizons: Sequence[float] = DEFAULT_HORIZONS):
+        if len(horizons) == 0 or min(horizons) <= 0:
+            raise ValueError("horizons must be positive")
+
+        self._horizons = list(horizons)
+        self._rates = [0.0 for _ in horizons]  # Events per second, at the last event
+        self._last_time: float | None = None
+
+    def update(self, time: float):
+        """Record an Event at 'time' (seconds, e.g. Car.entry_timestamp)"""
+        if self._last_time is not None:
+            elapsed = max(0.0, time - self._last_time)
+            self._rates = [rate * math.exp(-elapsed / horizon) for rate, horizon in zip(self._rates, self._horizons)]
+        self._rates = [rate + 1 / horizon for rate, horizon in zip(self._rates, self._horizons)]
+        self._last_time = time if self._last_time is None else max(self._last_time, time)
+
+    def rates(self, now: float) -> Dict[float, float]:
+        """Events per Hour over each Horizon, decayed up to 'now'"""
+        elapsed = 0.0 if self._last_time is None else max(0.0, now - self._last_time)
+        return {horizon: rate * math.exp(-elapsed / horizon) * 3600
+                for rate, horizon in zip(self._rates, self._horizons)}
+
+
+class RunningStats:
+    """Running Count, Mean, Standard Deviation, Min and Max (Welford), mergeable (Chan et al.)"""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0  # Sum of squared differences from the mean
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "RunningStats"):
+        if other.count == 0:
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def summary(self) -> dict:
+        if self.count == 0:
+            return {"count": 0}
+        return {"count": self.count, "mean": self.mean, "stddev": self.stddev, "min": self.min, "max": self.max}
+
+
+class CarParkAnalytics:
+    """Streaming Analytics of a Car Park, in fixed memory however many cars pass through.
+
+    Register with CarPark.register_car_listener(). Keeps:
+        - Dwell Times (seconds) in KLL sketches, for the car park and for each car model
+        - Arrival and Departure Rates as EWMAs over several horizons (see EWMARate)
+        - Entry and Exit Temperatures as running statistics (see RunningStats)
+    Analytics of several car parks can be merged, e.g. for a fleet summary.
+    """
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, k: int = KLLSketch.DEFAULT_K, horizons: Sequence[float] = EWMARate.DEFAULT_HORIZONS,
+                 seed: int | None = None):
+        self._k = k
+        self._random = random.Random(seed)
+        self.dwell_times = KLLSketch(k, seed=self._random.random())
+        self.model_dwell_times: Dict[str, KLLSketch] = {}  # Car models are a fixed catalogue
+        self.arrivals = EWMARate(horizons)
+        self.departures = EWMARate(horizons)
+        self.entry_temperatures = RunningStats()
+        self.exit_temperatures = RunningStats()
+        self._lock = threading.Lock()  # Updated on the event handling path, summarized by the publisher
+
+    def on_car_added(self, car: Car):
+        with self._lock:
+            self.arrivals.update(car.entry_timestamp)
+            if car.entry_temperature is not None and not math.isnan(float(car.entry_temperature)):  # Known
+                self.entry_temperatures.update(float(car.entry_temperature))
+
+    def on_car_removed(self, car: Car):
+        with self._lock:
+            self.departures.update(car.exit_timestamp)
+            if car.exit_temperature is not None and not math.isnan(float(car.exit_temperature)):  # Known
+                self.exit_temperatures.update(float(car.exit_temperature))
+
+            if car.entry_timestamp is None:
+                return
+            dwell_time = car.exit_timestamp - car.entry_timestamp
+            self.dwell_times.update(dwell_time)
+            if car.car_model not in self.model_dwell_times:
+                self.model_dwell_times[car.car_model] = KLLSketch(self._k, seed=self._random.random())
+            self.model_dwell_times[car.car_model].update(dwell_time)
+
+    def merge(self, other: "CarParkAnalytics"):
+        """Add the Dwell Times and Temperatures of another Car Park. Rates are per car park, and are not merged."""
+        with self._lock:
+            self.dwell_times.merge(other.dwell_times)
+            for car_model, sketch in other.model_dwell_times.items():
+                if car_model not in self.model_dwell_times:
+                    self.model_dwell_times[car_model] = KLLSketch(self._k, seed=self._random.random())
+                self.model_dwell_times[car_model].merge(sketch)
+            self.entry_temperatures.merge(other.entry_temperatures)
+            self.exit_temperatures.merge(other.exit_temperatures)
+
+    def _dwell_summary(self, sketch: KLLSketch) -> dict:
+        return {"count": len(sketch)} | {f"p{round(q * 100)}": value
+                                         for q, value in zip(self.QUANTILES, sketch.quantiles(self.QUANTILES))}
+
+    def summary(self, now: float) -> dict:
+        """Summary of the Analytics at 'now' (seconds, e.g. Car.entry_timestamp)"""
+        with self._lock:
+            return {"dwell_seconds": self._dwell_summary(self.dwell_times),
+                    "dwell_seconds_by_model": {car_model: self._dwell_summary(sketch)
+                                               for car_model, sketch in sorted(self.model_dwell_times.items())},
+                    "arrivals_per_hour": {f"{horizon:g}s": rate for horizon, rate in self.arrivals.rates(now).items()},
+                    "departures_per_hour": {f"{horizon:g}s": rate
+                                            for horizon, rate in self.departures.rates(now).items()},
+                    "entry_temperature": self.entry_temperatures.summary(),
+                    "exit_temperature": self.exit_temperatures.summary()
+                    }
+
+    def encode(self, now: float) -> str:
+        """Encode the Summary as a JSON Message String"""
+        return json.dumps(self.summary(now))
@@ -0,0 +1,93 @@
+from typing import List, Sequence
+import heapq
+import threading
+
+
+def create_bays_topic(display_topic: str) -> str:
+    """Create the Topic of the Per-Bay State, published by the Car Park next to its Display Messages"""
+    return f"{display_topic}/bays"
+
+
+def encode_bay_state(num_bays: int, occupied: bytes | bytearray, assigned_bay: int | None = None) -> str:
+    """Encode the Per-Bay State for Displays.
+
+    Format of Message String: "<num-bays>;<occupied-bitmap>;<assigned-bay>"
+        - occupied-bitmap: hex of one bit per bay, bay i is bit (i % 8) of byte (i // 8)
+        - assigned-bay: bay of the last parked car, to direct its driver, empty if none
+    """
+    return f"{num_bays};{occupied.hex()};{'' if assigned_bay is None else assigned_bay}"
+
+
+def decode_bay_state(msg: str):
+    """Decode a Per-Bay State Message String. Returns (occupied per bay as a list of bool, assigned bay or None)"""
+    num_bays, bitmap, assigned_bay = msg.split(";")
+    occupied = bytes.fromhex(bitmap)
+    return ([bool(occupied[i >> 3] & (1 << (i & 7))) for i in range(int(num_bays))],
+            None if assigned_bay == "" else int(assigned_bay))
+
+
+class BayMap:
+    """Individual Bays of a Car Park, with the Allocation of the best free Bay.
+
+    Bays have ids 0 to n-1 and a distance (e.g. to the entrance or the lifts); the best free bay is the nearest one,
+    ties broken by id. Free bays are kept in a heap of (distance, id), so allocating and releasing are O(log n).
+    The occupancy is also a bitmap of one bit per bay, which is the compact state sent to displays.
+    """
+    def __init__(self, distances: Sequence[float]):
+        self._distances = list(distances)
+        self._free = [(distance, bay_id) for bay_id, distance in enumerate(self._distances)]
+        heapq.heapify(self._free)
+        self._occupied = bytearray((len(self._distances) + 7) // 8)
+        self._num_occupied = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, total_bays: int, distances: Sequence[float] | None = None):
+        """Bays of a Car Park configuration: 'bay_distances' if given, else bay i at distance i"""
+        if distances is None:
+            return cls(range(total_bays))
+        if len(distances) != total_bays:
+            raise ValueError(f"Expected {total_bays} bay distances, got {len(distances)}")
+        return cls(distances)
+
+    def __len__(self) -> int:
+        return len(self._distances)
+
+    @property
+    def free_bays(self) -> int:
+        return len(self._distances) - self._num_occupied
+
+    def get_distance(self, bay_id: int) -> float:
+        return self._distances[bay_id]
+
+    def is_occupied(self, bay_id: int) -> bool:
+        return bool(self._occupied[bay_id >> 3] & (1 << (bay_id & 7)))
+
+    def get_occupied_bays(self) -> List[int]:
+        return [bay_id for bay_id in range(len(self._distances)) if self.is_occupied(bay_id)]
+
+    def allocate(self) -> int | None:
+        """Take the best free Bay. Returns None when every bay is occupied."""
+        with self._lock:
+            if len(self._free) == 0:
+                return None
+
+            _, bay_id = heapq.heappop(self._free)
+            self._occupied[bay_id >> 3] |= 1 << (bay_id & 7)
+            self._num_occupied += 1
+            return bay_id
+
+    def release(self, bay_id: int):
+        """Free a Bay. Releasing a free bay is ignored."""
+        with self._lock:
+            if not self.is_occupied(bay_id):
+                return
+
+            self._occupied[bay_id >> 3] &= ~(1 << (bay_id & 7))
+            self._num_occupied -= 1
+            heapq.heappush(self._free, (self._distances[bay_id], bay_id))
+
+    def encode(self, assigned_bay: int | None = None) -> str:
+        """Per-Bay State Message String, see encode_bay_state()"""
+        with self._lock:
+            return encode_bay_state(len(self._distances), self._occupied, assigned_bay)
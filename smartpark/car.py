@@ -1,7 +1,24 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import random
 import string
 import json
+import sys
+
+
+EPOCH = datetime(1970, 1, 1)  # Naive Epoch of the compact Timestamps, so that naive local times round-trip exactly
+
+
+def datetime_to_timestamp(value: datetime | None) -> int | None:
+    """Convert a naive Datetime to whole seconds since EPOCH"""
+    if value is None:
+        return None
+    return (value - EPOCH) // timedelta(seconds=1)
+
+
+def timestamp_to_datetime(timestamp: int | None) -> datetime | None:
+    if timestamp is None:
+        return None
+    return EPOCH + timedelta(seconds=timestamp)
 
 
 class Car:
@@ -14,7 +31,17 @@ class Car:
         - entry_temperature
         - exit_time
         - exit_temperature
+        - bay_id: Bay assigned while parked, when the Car Park assigns bays (see BayMap)
+        - zone_id: Zone parked in, when the Car Park has zones (see ZoneTree)
+        - car_park: Car Park holding the Car, told when the Car is parked or un-parked (see CarPark.add_car)
+
+    Cars are compact, as a car park can hold many of them: no instance __dict__ (__slots__), interned car models and
+    entry/exit times stored as whole seconds, converted to datetime when accessed.
     """
+
+    __slots__ = ("license_plate", "_car_model", "_entry_timestamp", "entry_temperature", "_is_parked",
+                 "_exit_timestamp", "exit_temperature", "bay_id", "zone_id", "car_park")
+
     def __init__(self, license_plate: str, car_model: str):
         self.license_plate = license_plate
         self.car_model = car_model
@@ -26,10 +53,56 @@ class Car:
         self.exit_time: datetime | None = None
         self.exit_temperature: float | int | None = None
 
+        self.bay_id: int | None = None
+        self.zone_id: int | None = None
+        self.car_park = None  # Set by the Car Park while it holds the Car
+
     @property
     def is_parked(self):
         return self._is_parked
 
+    @property
+    def car_model(self) -> str:
+        return self._car_model
+
+    @car_model.setter
+    def car_model(self, value: str):
+        self._car_model = sys.intern(value)  # One shared string per model, instead of a copy per car
+
+    @property
+    def entry_time(self) -> datetime | None:
+        return timestamp_to_datetime(self._entry_timestamp)
+
+    @entry_time.setter
+    def entry_time(self, value: datetime | None):
+        self._entry_timestamp = datetime_to_timestamp(value)
+
+    @property
+    def exit_time(self) -> datetime | None:
+        return timestamp_to_datetime(self._exit_timestamp)
+
+    @exit_time.setter
+    def exit_time(self, value: datetime | None):
+        self._exit_timestamp = datetime_to_timestamp(value)
+
+    @property
+    def entry_timestamp(self) -> int | None:
+        """Entry Time in seconds since EPOCH, without creating a datetime"""
+        return self._entry_timestamp
+
+    @entry_timestamp.setter
+    def entry_timestamp(self, value: int | None):
+        self._entry_timestamp = value
+
+    @property
+    def exit_timestamp(self) -> int | None:
+        """Exit Time in seconds since EPOCH, without creating a datetime"""
+        return self._exit_timestamp
+
+    @exit_timestamp.setter
+    def exit_timestamp(self, value: int | None):
+        self._exit_timestamp = value
+
     @classmethod
     def from_json(cls, car_as_json: str):
         """Construct Car from JSON String"""
@@ -97,22 +170,26 @@ class Car:
 
     def car_parked(self):
         """Update Parking Status of Car to 'Parked'"""
+        if not self._is_parked and self.car_park is not None:
+            self.car_park.count_parked_cars(1)
         self._is_parked = True
 
     def car_unparked(self):
         """Update Parking Status of Car to 'Un-Parked'"""
+        if self._is_parked and self.car_park is not None:
+            self.car_park.count_parked_cars(-1)
         self._is_parked = False
 
-    def entered_car_park(self, temperature: float):
-        """Call when a Car Entered the Park"""
+    def entered_car_park(self, temperature: float, entry_time: datetime | None = None):
+        """Call when a Car Entered the Park. The entry time defaults to now, e.g. when not given by the Sensor."""
         # Warn: Make sure to check if there is available bay before changing parked state
-        self.entry_time = datetime.now()
+        self.entry_time = datetime.now() if entry_time is None else entry_time
         self.entry_temperature = float(temperature)
 
-    def exited_car_park(self, temperature: float):
-        """Call when a Car Exited the Park"""
+    def exited_car_park(self, temperature: float, exit_time: datetime | None = None):
+        """Call when a Car Exited the Park. The exit time defaults to now, e.g. when not given by the Sensor."""
         self.car_unparked()  # Update the State of Car to Un-parked
-        self.exit_time = datetime.now()
+        self.exit_time = datetime.now() if exit_time is None else exit_time
         self.exit_temperature = float(temperature)
 
     def to_csv_format(self):
@@ -1,34 +1,248 @@
-import pprint
+import logging
+import math
 import random
+import threading
+import time
 
 import paho.mqtt.client as paho
-from typing import List, Any
+from typing import Callable, Dict, List, Any
 from datetime import datetime
 
 from smartpark.config import Config
 from smartpark.utils import quit_listener
 from smartpark.mqtt_device import MqttDevice
-from smartpark.car import Car
+from smartpark.car import Car, datetime_to_timestamp
+from smartpark.sensor_message import SensorMessage
+from smartpark.dedup import EventDeduplicator
+from smartpark.telemetry import create_telemetry_topic
+from smartpark.heartbeat import create_heartbeat_topic
+from smartpark.tracing import TRACER, create_trace_field
+from smartpark.metrics import REGISTRY, start_metrics_server
+from smartpark.profiling import PROFILER
 from smartpark.logger import class_logger
-from smartpark.project_paths import LOG_DIR
+from smartpark.display_protocol import DeltaEncoder, create_keyframe_request_topic
+from smartpark.project_paths import LOG_DIR, DATA_DIR
+
+
+MESSAGES = REGISTRY.counter("smartpark_car_park_messages_total", "Sensor messages received", ["car_park"])
+DUPLICATES = REGISTRY.counter("smartpark_car_park_duplicates_total", "Duplicate sensor messages dropped",
+                              ["car_park"])
+TELEMETRY_MESSAGES = REGISTRY.counter("smartpark_car_park_telemetry_messages_total", "Sensor telemetry received",
+                                      ["car_park"])
+INGRESS_DEPTH = REGISTRY.gauge("smartpark_car_park_ingress_queue_depth", "Messages waiting in the ingress queue",
+                               ["car_park"])
+MESSAGE_ERRORS = REGISTRY.counter("smartpark_car_park_message_errors_total", "Queued messages whose handler raised",
+                                  ["car_park"])
+SHED_MESSAGES = REGISTRY.counter("smartpark_car_park_shed_messages_total",
+                                 "Messages dropped or display publishes skipped under load", ["car_park", "kind"])
+OVERSTAYS = REGISTRY.counter("smartpark_car_park_overstays_total", "Cars still in the car park after the maximum stay",
+                             ["car_park"])
+SENSORS_DOWN = REGISTRY.gauge("smartpark_car_park_sensors_down", "Sensors without a heartbeat", ["car_park"])
+SENSOR_STATUS_CHANGES = REGISTRY.counter("smartpark_car_park_sensor_status_changes_total",
+                                         "Sensors gone down or recovered", ["car_park", "status"])
+LATE_MESSAGES = REGISTRY.counter("smartpark_car_park_late_messages_total",
+                                 "Sensor messages too late to be applied in sensor-time order", ["car_park"])
+PARSE_ERRORS = REGISTRY.counter("smartpark_car_park_parse_errors_total", "Invalid sensor messages", ["car_park"])
+HANDLE_SECONDS = REGISTRY.histogram("smartpark_car_park_handle_seconds", "Time spent handling a sensor message",
+                                    ["car_park"])
+CARS_ENTERED = REGISTRY.counter("smartpark_car_park_cars_entered_total", "Cars entered", ["car_park"])
+CARS_EXITED = REGISTRY.counter("smartpark_car_park_cars_exited_total", "Cars exited", ["car_park"])
+TOTAL_CARS = REGISTRY.gauge("smartpark_car_park_cars", "Cars in the car park, parked or not", ["car_park"])
+PARKED_CARS = REGISTRY.gauge("smartpark_car_park_parked_cars", "Parked cars", ["car_park"])
+AVAILABLE_BAYS = REGISTRY.gauge("smartpark_car_park_available_bays", "Available bays", ["car_park"])
+ZONE_AVAILABLE_BAYS = REGISTRY.gauge("smartpark_car_park_zone_available_bays", "Available bays per zone",
+                                     ["car_park", "zone"])
+DISPLAY_PUBLISHES = REGISTRY.counter("smartpark_car_park_display_publishes_total", "Messages published to displays",
+                                     ["car_park"])
+PUBLISH_FAILURES = REGISTRY.counter("smartpark_car_park_publish_failures_total", "Failed publishes to displays",
+                                    ["car_park"])
+
+
+class CarListener:
+    """Listener of the Cars entering and exiting a Car Park, e.g. a Visit Store or an Index.
+
+    Register with CarPark.register_car_listener(). Listeners are called on the event handling path: keep them fast.
+    """
+    def on_car_added(self, car: Car):
+        pass
+
+    def on_car_removed(self, car: Car):
+        pass
 
 
 class CarPark(MqttDevice):
-    def __init__(self, config: dict, *args, **kwargs):
+    logger = logging.getLogger("smartpark.car_park")  # Replaced by the log file of subclasses (see class_logger)
+
+    def __init__(self, config: dict, *args, clock: Callable[[], datetime] = datetime.now, **kwargs):
         mqtt_config = {k: v for k, v in config.items() if k not in ["total_bays"]} | {"topic-qualifier": "na"}
         super().__init__(mqtt_config, *args, **kwargs)
 
         self.display_topic: str = self.create_topic_qualifier("display")  # Topic for Publication to Displays
         self._sensor_topics: List[str] = []
-
-        self.client.on_message = self.on_message
+        self._sensor_temperatures: Dict[str, float] = {}  # Latest Telemetry of each Sensor Topic
 
         self._total_bays = config["total_bays"]
-
-        self._cars: List[Car] = []
+        self._clock = clock  # Current Time when not given by the Sensors, e.g. a virtual clock (see CarParkSimulation)
+
+        # Optional Bounded Ingress Queue, i.e. ingress_queue_size = <messages> (see IngressQueue). The network thread
+        # only queues the messages, a worker thread handles them.
+        self._ingress = None
+        self._shed_display_publishes = False
+        self._display_pending = False  # A Display Publish was shed, the state is published once the queue drains
+        if config.get("ingress_queue_size", None) is not None:
+            from smartpark.ingress import IngressQueue
+            self._ingress = IngressQueue(config["ingress_queue_size"],
+                                         config.get("ingress_overflow", IngressQueue.DROP_OLDEST))
+            self._shed_display_publishes = config.get("shed_display_publishes", True)
+            INGRESS_DEPTH.labels(self.name).set_function(lambda car_park: len(car_park._ingress), owner=self)
+
+        # Optional Worker Pool shared by the Devices of the process, i.e. message_workers = <threads> (see
+        # KeyedExecutor). The messages of this car park are handled in order by a single worker.
+        self._executor = None
+        if config.get("message_workers", None) is not None:
+            if self._ingress is not None:
+                raise ValueError("message_workers cannot be combined with ingress_queue_size")
+            from smartpark.executor import get_executor
+            self._executor = get_executor(config["message_workers"])
+
+        self.client.on_message = self._admit(self.on_message)
+
+        self._cars: Dict[Car, None] = {}  # Insertion-ordered Set of Cars, removed in O(1)
+        self._num_parked_cars = 0  # Kept by add_car, remove_car and the held Cars (see count_parked_cars)
+        self._car_listeners: List[CarListener] = []
 
         self._temperature: float | int | None = None  # From Sensor Message
         self._entry_or_exit_time: datetime | None = None  # Passed from the Car
+        self._event_time: datetime | None = None  # Time of Detection of the Sensor Message being handled, if given
+        self._trace: SensorMessage | None = None  # Traced Sensor Message being handled, if any
+
+        # Duplicate Sensor Messages are dropped, by sequence number and event id (see EventDeduplicator)
+        self._deduplicator = EventDeduplicator(config.get("dedup_window", EventDeduplicator.DEFAULT_WINDOW_SIZE),
+                                               config.get("dedup_event_ids", EventDeduplicator.DEFAULT_MAX_EVENT_IDS))
+
+        # Optional Reordering of Sensor Messages by Sensor Time, i.e. reorder_lateness = <seconds>
+        self._reorder_buffer = None
+        self._reorder_wakeup: threading.Condition | None = None  # Signals the reorder thread of new deadlines
+        self._event_lock = threading.RLock()  # Messages are applied by the MQTT thread, and by the reorder thread
+        if config.get("reorder_lateness", None) is not None:
+            from smartpark.reorder import ReorderBuffer
+            self._reorder_buffer = ReorderBuffer(config["reorder_lateness"])
+            self._reorder_wakeup = threading.Condition(self._event_lock)
+            threading.Thread(target=self._reorder_loop, name=f"reorder-{self.name}", daemon=True).start()
+
+        # Occupancy is computed when scraped, not on the hot path. The gauges do not keep the car park alive.
+        TOTAL_CARS.labels(self.name).set_function(lambda car_park: car_park.total_cars, owner=self)
+        PARKED_CARS.labels(self.name).set_function(lambda car_park: car_park.parked_cars, owner=self)
+        AVAILABLE_BAYS.labels(self.name).set_function(lambda car_park: car_park.available_bays, owner=self)
+
+        if self._ingress is not None:
+            threading.Thread(target=self._ingress_loop, name=f"ingress-{self.name}", daemon=True).start()
+
+        if config.get("metrics_port", None) is not None:  # Optional Metrics Endpoint
+            start_metrics_server(config["metrics_port"])
+
+        # Profiling can be switched on/off at runtime: publish "start[,<sample-rate>]" or "stop" to this topic
+        self.profiling_topic: str = self.create_topic_qualifier("profiling")
+        self.client.message_callback_add(self.profiling_topic, self._on_profiling_command)
+        self.client.subscribe(self.profiling_topic)
+
+        # Optional Delta-Encoded Display Protocol, i.e. display_protocol = "delta"
+        self._delta_encoder: DeltaEncoder | None = None
+        if config.get("display_protocol", "full") == "delta":
+            self._delta_encoder = DeltaEncoder(config.get("keyframe_interval", DeltaEncoder.DEFAULT_KEYFRAME_INTERVAL))
+            keyframe_request_topic = create_keyframe_request_topic(self.display_topic)
+            self.client.message_callback_add(keyframe_request_topic, self._on_keyframe_request)
+            self.client.subscribe(keyframe_request_topic)
+
+        # Optional Visit History in SQLite, i.e. visit_store = "<file>.db" (relative to the data directory)
+        self.visit_store = None
+        if config.get("visit_store", None) is not None:
+            from smartpark.visit_store import VisitStore  # Imported here, sqlite3 is only loaded when used
+            self.visit_store = VisitStore(DATA_DIR / config["visit_store"])
+            self.register_car_listener(self.visit_store)
+
+        # Optional Index of the Occupancy over time, i.e. occupancy_index = true. Includes the Visit Store history.
+        self.occupancy_index = None
+        if config.get("occupancy_index", False):
+            from smartpark.occupancy_index import OccupancyIndex
+            self.occupancy_index = OccupancyIndex.build(self.visit_store.iter_visits()
+                                                        if self.visit_store is not None else [])
+            self.register_car_listener(self.occupancy_index)
+
+        # Optional Bay Reservations, i.e. reservations = true. Held bays are not available to other cars.
+        self.reservations = None
+        if config.get("reservations", False):
+            from smartpark.reservations import ReservationBook
+            self.reservations = ReservationBook(self._total_bays)
+            self.register_car_listener(self.reservations)
+
+        # Optional Assignment of Individual Bays, i.e. bay_assignment = true, with bay_distances = [...] (optional)
+        self.bays = None
+        self._assigned_bay: int | None = None  # Bay of the last parked Car, for the next Display Message
+        if config.get("bay_assignment", False):
+            from smartpark.bays import BayMap, create_bays_topic
+            self.bays = BayMap.from_config(self._total_bays, config.get("bay_distances", None))
+            self.bays_topic: str = create_bays_topic(self.display_topic)
+
+        # Optional Hierarchical Zones, i.e. [[car_parks.zones]] (flattened by the Config, see flatten_zone_configs)
+        self.zones = None
+        self._updated_zones: set = set()  # Zones to publish with the next Display Message
+        if len(config.get("zones", [])) > 0:
+            from smartpark.zones import ZoneTree
+            self.zones = ZoneTree(config["zones"])
+            self._updated_zones.update(range(len(self.zones)))
+            for zone_id in range(len(self.zones)):
+                ZONE_AVAILABLE_BAYS.labels(self.name, self.zones.get_path(zone_id)).set_function(
+                    lambda car_park, zone_id=zone_id: car_park.zones.get_available(zone_id), owner=self)
+
+        # Optional Streaming Analytics, i.e. analytics = true. A summary is published every analytics_interval seconds
+        # on <display-topic>/analytics (see create_analytics_topic).
+        self.analytics = None
+        if config.get("analytics", False):
+            from smartpark.analytics import CarParkAnalytics, create_analytics_topic
+            self.analytics = CarParkAnalytics()
+            self.analytics_topic: str = create_analytics_topic(self.display_topic)
+            self.register_car_listener(self.analytics)
+            threading.Thread(target=self._analytics_loop, args=(config.get("analytics_interval", 60),),
+                             name=f"analytics-{self.name}", daemon=True).start()
+
+        # Optional Occupancy Forecasts, i.e. forecast_history = "<file>" (relative to the data directory), with the
+        # stored Display Messages of this car park (see store_message). Requires NumPy. The forecasts are published on
+        # <display-topic>/forecast with each Display Message. The forecaster is fitted in the background, then refitted
+        # every forecast_refit_interval seconds: until there is a history (e.g. on a first run), it forecasts from the
+        # live state only.
+        self.forecaster = None
+        if config.get("forecast_history", None) is not None:
+            from smartpark.forecast import OccupancyForecaster, create_forecast_topic
+            self._forecast_history = DATA_DIR / config["forecast_history"]
+            self._forecast_horizons = config.get("forecast_horizons", [1800, 3600])
+            self.forecaster = OccupancyForecaster([self._total_bays], horizons=self._forecast_horizons)
+            self.forecast_topic: str = create_forecast_topic(self.display_topic)
+            threading.Thread(target=self._forecast_loop, args=(config.get("forecast_refit_interval", 3600),),
+                             name=f"forecast-{self.name}", daemon=True).start()
+
+        # Optional Sensor Failure Detection, i.e. sensor_timeout = <seconds> without a heartbeat or a detection.
+        # Status changes are published on <display-topic>/sensors (see create_sensor_status_topic).
+        self.sensor_liveness = None
+        if config.get("sensor_timeout", None) is not None:
+            from smartpark.heartbeat import SensorLivenessMonitor, create_sensor_status_topic
+            self.sensor_liveness = SensorLivenessMonitor(config["sensor_timeout"], time.monotonic())
+            self.sensor_status_topic: str = create_sensor_status_topic(self.display_topic)
+            SENSORS_DOWN.labels(self.name).set_function(lambda car_park: len(car_park.sensor_liveness.down_sensors),
+                                                        owner=self)
+            threading.Thread(target=self._sensor_check_loop, args=(config.get("sensor_check_interval", 1),),
+                             name=f"sensors-{self.name}", daemon=True).start()
+
+        # Optional Overstay Detection, i.e. max_stay = <seconds>. Overstays are checked every overstay_check_interval
+        # seconds, and published on <display-topic>/overstays (see create_overstays_topic).
+        self.overstays = None
+        if config.get("max_stay", None) is not None:
+            from smartpark.overstays import OverstayMonitor, create_overstays_topic
+            self.overstays = OverstayMonitor(config["max_stay"])
+            self.overstays_topic: str = create_overstays_topic(self.display_topic)
+            self.register_car_listener(self.overstays)
+            threading.Thread(target=self._overstay_loop, args=(config.get("overstay_check_interval", 1),),
+                             name=f"overstays-{self.name}", daemon=True).start()
 
     @property
     def temperature(self):
@@ -38,6 +252,22 @@ class CarPark(MqttDevice):
     def temperature(self, value):
         self._temperature = value
 
+    @property
+    def event_time(self):
+        return self._event_time
+
+    @event_time.setter
+    def event_time(self, value: datetime | None):
+        self._event_time = value
+
+    @property
+    def trace(self):
+        return self._trace
+
+    @trace.setter
+    def trace(self, value: SensorMessage | None):
+        self._trace = value
+
     @property
     def entry_or_exit_time(self):
         return self._entry_or_exit_time
@@ -52,11 +282,11 @@ class CarPark(MqttDevice):
     
     @property
     def parked_cars(self) -> int:
-        return len(self.get_parked_cars())
+        return self._num_parked_cars
 
     @property
     def un_parked_cars(self) -> int:
-        return len(self.get_un_parked_cars())
+        return len(self._cars) - self._num_parked_cars
 
     @property
     def total_bays(self) -> int:
@@ -64,10 +294,23 @@ class CarPark(MqttDevice):
 
     @property
     def available_bays(self) -> int:
-        num_available_bays = self._total_bays - len(self.get_parked_cars())
+        num_available_bays = self._total_bays - self._num_parked_cars
         assert 0 <= num_available_bays, "Number of Bays Cannot be Negative!"
+
+        if self.reservations is not None:
+            # Cars parked before a reservation started may still take its bay, hence the floor
+            num_available_bays = max(0, num_available_bays - self.reservations.held_bays(self._get_current_time()))
         return num_available_bays
 
+    @property
+    def held_bays(self) -> int:
+        """Number of Bays held by Reservations now"""
+        return 0 if self.reservations is None else self.reservations.held_bays(self._get_current_time())
+
+    def _get_current_time(self) -> datetime:
+        """Time of the Event being handled, when given by the Sensor, else now on the clock"""
+        return self._clock() if self._event_time is None else self._event_time
+
     def get_parked_cars(self) -> List[Car]:
         """Get List of Parked Cars"""
         return [car for car in self._cars if car.is_parked]
@@ -81,13 +324,25 @@ class CarPark(MqttDevice):
         return self.get_parked_cars() + self.get_un_parked_cars()
 
     def register_sensor_topic(self, sensor_topic: str, *args, **kwargs):
-        """Register a Sensor Topic"""
+        """Register a Sensor Topic, and its Telemetry Topic"""
         if sensor_topic in self._sensor_topics:
             return
 
         self._sensor_topics.append(sensor_topic)
         self.client.subscribe(sensor_topic, *args, **kwargs)
 
+        telemetry_topic = create_telemetry_topic(sensor_topic)
+        # Recorded on arrival by the network thread: queued, it would come after the events that need its temperature
+        self.client.message_callback_add(telemetry_topic, self._on_telemetry)
+        self.client.subscribe(telemetry_topic, *args, **kwargs)
+
+        if self.sensor_liveness is not None:
+            heartbeat_topic = create_heartbeat_topic(sensor_topic)
+            # Recorded on arrival by the network thread: a heartbeat queued behind a burst would be late, or shed
+            self.client.message_callback_add(heartbeat_topic, self._on_heartbeat)
+            self.client.subscribe(heartbeat_topic, *args, **kwargs)
+            self.sensor_liveness.watch(sensor_topic, time.monotonic())
+
     def unregister_sensor_topic(self, sensor_topic: str, *args, **kwargs):
         """Unregister a Sensor Topic"""
         if sensor_topic not in self._sensor_topics:
@@ -96,16 +351,292 @@ class CarPark(MqttDevice):
         self._sensor_topics = [topic for topic in self._sensor_topics if topic != sensor_topic]
         self.client.unsubscribe(sensor_topic, *args, **kwargs)
 
+        telemetry_topic = create_telemetry_topic(sensor_topic)
+        self.client.message_callback_remove(telemetry_topic)
+        self.client.unsubscribe(telemetry_topic, *args, **kwargs)
+        self._sensor_temperatures.pop(sensor_topic, None)
+
+        if self.sensor_liveness is not None:
+            heartbeat_topic = create_heartbeat_topic(sensor_topic)
+            self.client.message_callback_remove(heartbeat_topic)
+            self.client.unsubscribe(heartbeat_topic, *args, **kwargs)
+            self.sensor_liveness.unwatch(sensor_topic)
+
+    def _admit(self, callback, event: bool = True):
+        """Wrap a Message Callback for the Ingress Queue or the Worker Pool, if any: the message is queued, to be
+        handled by a worker.
+
+        In the Ingress Queue, Events (Enter/Exit) come before auxiliary messages, and are never dropped. Telemetry and
+        heartbeats are not queued: they are recorded on arrival.
+        """
+        if self._executor is not None:
+            return self._executor.wrap(self.name, callback)
+        if self._ingress is None:
+            return callback
+
+        def admit(client: paho.Client, userdata: Any, message: paho.MQTTMessage):
+            if self._ingress.put((callback, client, userdata, message), event) > 0:
+                SHED_MESSAGES.labels(self.name, "telemetry").inc()
+
+        return admit
+
+    def _ingress_loop(self):
+        """Worker handling the queued Messages"""
+        while True:
+            callback, client, userdata, message = self._ingress.get()
+            try:
+                callback(client, userdata, message)
+            except Exception:
+                MESSAGE_ERRORS.labels(self.name).inc()
+                self.logger.exception(f"Failed to handle a message on {message.topic}")
+
+            with self._event_lock:
+                if self._display_pending and self._ingress.pending_events == 0:
+                    self._display_pending = False
+                    self.publish_to_display()
+
+    def _on_heartbeat(self, client: paho.Client, userdata: Any, message: paho.MQTTMessage):
+        """Callback for the Heartbeats of Sensors"""
+        self.record_sensor_alive(message.topic[:-len("/heartbeat")])
+
+    def record_sensor_alive(self, sensor_topic: str):
+        """Record a Sign of Life of a Sensor (a heartbeat or a detection), raising its recovery if it was down"""
+        if self.sensor_liveness is not None and self.sensor_liveness.beat(sensor_topic, time.monotonic()):
+            self._publish_sensor_status(sensor_topic, False)
+
+    def check_sensors(self, now: float | None = None) -> List[str]:
+        """Raise the Sensors gone silent for sensor_timeout seconds at 'now' (default: time.monotonic())"""
+        down = self.sensor_liveness.check(time.monotonic() if now is None else now)
+        for sensor_topic in down:
+            self._publish_sensor_status(sensor_topic, True)
+        return down
+
+    def _publish_sensor_status(self, sensor_topic: str, down: bool):
+        SENSOR_STATUS_CHANGES.labels(self.name, "down" if down else "up").inc()
+        if down:
+            self.on_sensor_down(sensor_topic)
+        else:
+            self.on_sensor_recovered(sensor_topic)
+        self.client.publish(self.sensor_status_topic, f"{sensor_topic};{'down' if down else 'up'}")
+
+    def on_sensor_down(self, sensor_topic: str):
+        """Override to act on a Sensor gone silent, e.g. to log it"""
+        pass
+
+    def on_sensor_recovered(self, sensor_topic: str):
+        """Override to act on a Sensor heard from again"""
+        pass
+
+    def _sensor_check_loop(self, interval: float):
+        while True:
+            time.sleep(interval)
+            self.check_sensors()
+
+    def _on_telemetry(self, client: paho.Client, userdata: Any, message: paho.MQTTMessage):
+        """Callback for the Telemetry of Sensors: keeps the latest Temperature of each Sensor"""
+        try:
+            temperature = float(message.payload.decode())
+        except ValueError:
+            PARSE_ERRORS.labels(self.name).inc()
+            return
+
+        TELEMETRY_MESSAGES.labels(self.name).inc()
+        self._sensor_temperatures[message.topic[:-len("/telemetry")]] = temperature
+
+    def resolve_temperature(self, sensor_topic: str, sensor_message: SensorMessage) -> bool:
+        """Fill in the Temperature of a Sensor Message sent without one, from the Telemetry of its Sensor (or the
+        latest Temperature of the Car Park). Returns False when there is none yet: the temperature is then unknown
+        (NaN), and the message is still applied."""
+        if sensor_message.temperature != "":
+            return True
+
+        temperature = self._sensor_temperatures.get(sensor_topic, self.temperature)
+        if temperature is None:
+            sensor_message.temperature = math.nan
+            return False
+
+        sensor_message.temperature = temperature
+        return True
+
+    def reserve_bay(self, license_plate: str, start: datetime, end: datetime):
+        """Reserve a Bay for [start, end), see ReservationBook. Returns None when no bay is left."""
+        assert self.reservations is not None, "Enable Reservations in the Configuration!"
+
+        # A reservation starting now also competes with the parked cars. Not while an event is handled: now is then
+        # the time of the event.
+        with self._event_lock:
+            now = self._get_current_time()
+            self.reservations.expire(datetime_to_timestamp(now))
+            parked_cars = self.parked_cars if start <= now < end else 0
+            return self.reservations.book(license_plate, start, end, reserved_bays=parked_cars)
+
+    def cancel_reservation(self, reservation_id: int) -> bool:
+        assert self.reservations is not None, "Enable Reservations in the Configuration!"
+        return self.reservations.cancel(reservation_id)
+
+    def is_duplicate(self, sensor_topic: str, sensor_message: SensorMessage) -> bool:
+        """Check a Sensor Message against the recent ones of its Sensor, before applying it. Counts the duplicates."""
+        if not self._deduplicator.is_duplicate(sensor_topic, sensor_message.seq, sensor_message.event_id):
+            return False
+
+        DUPLICATES.labels(self.name).inc()
+        return True
+
+    def handle_sensor_message(self, sensor_message: SensorMessage, received_time: float | None = None) -> bool:
+        """Apply a Sensor Message, in sensor-time order when reordering is enabled (see ReorderBuffer).
+
+        Returns False when the message came too late to be reordered: it is then applied at once, and counted.
+        """
+        if self._reorder_buffer is None or sensor_message.timestamp is None:
+            with self._event_lock:
+                self.apply_sensor_message(sensor_message, received_time)
+            return True
+
+        if not self._reorder_buffer.push(sensor_message.timestamp, (sensor_message, received_time)):
+            LATE_MESSAGES.labels(self.name).inc()
+            with self._event_lock:
+                self.apply_sensor_message(sensor_message, received_time)
+            return False
+
+        self._apply_ready_messages()
+        return True
+
+    def flush_sensor_messages(self):
+        """Apply every Sensor Message waiting in the Reorder Buffer, e.g. before stopping"""
+        if self._reorder_buffer is None:
+            return
+
+        with self._event_lock:
+            for sensor_message, received_time in self._reorder_buffer.pop_all():
+                self.apply_sensor_message(sensor_message, received_time)
+
+    def _apply_ready_messages(self):
+        with self._event_lock:
+            for sensor_message, received_time in self._reorder_buffer.pop_ready():
+                self.apply_sensor_message(sensor_message, received_time)
+
+            # Messages still waiting are applied by the reorder thread once they waited long enough, even if no
+            # message follows
+            self._reorder_wakeup.notify()
+
+    def _reorder_loop(self):
+        """Single long-lived Thread applying the buffered Messages at their deadlines"""
+        with self._reorder_wakeup:
+            while True:
+                self._apply_ready_messages()
+                deadline = self._reorder_buffer.next_deadline()
+                self._reorder_wakeup.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def apply_sensor_message(self, sensor_message: SensorMessage, received_time: float | None = None):
+        """Apply an Entry/Exit Sensor Message to the Car Park, at its Sensor Time if given.
+
+        The Sensor Time is only the current time while the message is handled: afterwards, e.g. for a reservation or
+        a periodic publish, the current time is on the clock again.
+        """
+        handling_start = time.monotonic()
+        sensor_time = sensor_message.timestamp
+
+        self.temperature = sensor_message.temperature
+        self.event_time = None if sensor_time is None else datetime.fromtimestamp(sensor_time)
+        self.trace = sensor_message if sensor_message.traced and sensor_message.event_id is not None \
+            and sensor_time is not None else None
+
+        try:
+            if sensor_message.signal == "Enter":
+                self.on_car_entry()
+            elif sensor_message.signal == "Exit":
+                self.on_car_exit()
+        finally:
+            self.event_time = None
+
+        if self.trace is not None:
+            TRACER.dump_on_exit(LOG_DIR / 'tracing' / f"car_park-{self.name}.json")
+            if received_time is not None:
+                TRACER.record("sensor_to_car_park", received_time - sensor_time)
+            TRACER.record("car_park.handle", time.monotonic() - handling_start)
+
+    def register_car_listener(self, listener: CarListener):
+        """Register a Listener notified of every Car added to or removed from the Car Park"""
+        self._car_listeners.append(listener)
+
+    @PROFILER.span("car_park.add_car")
     def add_car(self, car: Car):
         """Add a Car in the Car Park"""
         assert self.temperature is not None, "Update the Temperature!"
 
         # Note: The recently added car does not necessarily get parked first.
 
-        car.entered_car_park(self.temperature)
-        self._entry_or_exit_time = car.entry_time
-        self._cars.append(car)
+        car.entered_car_park(self.temperature, self._get_current_time())
+        with self._event_lock:
+            self._entry_or_exit_time = car.entry_time
+            self._cars[car] = None
+            car.car_park = self
+            if car.is_parked:
+                self._num_parked_cars += 1
+        CARS_ENTERED.labels(self.name).inc()
+
+        for listener in self._car_listeners:
+            listener.on_car_added(car)
+
+    def count_parked_cars(self, delta: int):
+        """Count a held Car parked (1) or un-parked (-1), called by Car.car_parked and Car.car_unparked"""
+        with self._event_lock:
+            self._num_parked_cars += delta
+
+    def park_car(self, car: Car, zone: str | None = None) -> bool:
+        """Park a Car in the Car Park, in the best free Bay when bays are assigned. Car.car_parked also parks a car,
+        without a bay or a zone.
+
+        With zones, the car is counted in the zone of its bay, else in a free zone within 'zone' (e.g. "level1/ev")
+        or anywhere. A zone cannot be chosen when bays are assigned.
 
+        Returns False when the car is not parked by this call: it was already parked (in its bay and zone), or there
+        is no free bay, or no zone with a free bay (within 'zone', if given).
+        """
+        if zone is not None and (self.zones is None or self.bays is not None):
+            raise ValueError("A zone can only be chosen in a car park with zones, without bay assignment")
+
+        with self._event_lock:
+            if car.is_parked:
+                return False
+
+            # The bay and zone are found before the car is parked, so that a full car park or zone leaves it un-parked
+            bay_id = zone_id = None
+            if self.bays is not None:
+                bay_id = self.bays.allocate()
+                if bay_id is None:
+                    return False
+                if self.zones is not None:
+                    zone_id = self.zones.get_zone_of_bay(bay_id)
+            elif self.zones is not None:
+                zone_id = self.zones.find_free_zone(None if zone is None else self.zones.get_zone_id(zone))
+                if zone_id is None:
+                    return False
+
+            car.car_parked()
+            car.bay_id, car.zone_id = bay_id, zone_id
+
+            if bay_id is not None:
+                self._assigned_bay = bay_id
+            if zone_id is not None:
+                self._updated_zones.update(self.zones.occupy(zone_id))
+
+        return True
+
+    def unpark_car(self, car: Car):
+        """Un-Park a Car, freeing its Bay and Zone"""
+        with self._event_lock:
+            if car.bay_id is not None and self.bays is not None:
+                self.bays.release(car.bay_id)
+                car.bay_id = None
+
+            if car.zone_id is not None and self.zones is not None:
+                self._updated_zones.update(self.zones.release(car.zone_id))
+                car.zone_id = None
+
+            car.car_unparked()
+
+    @PROFILER.span("car_park.remove_car")
     def remove_car(self, car: Car):
         """Remove a Car from the Car Park"""
         assert self.temperature is not None, "Update the Temperature!"
@@ -113,30 +644,190 @@ class CarPark(MqttDevice):
         # Note: As an example, we can randomly select any car (parked or un-parked) to exit.
         # Need to implement logic in on_car_exit() method.
 
-        car.exited_car_park(self.temperature)
-        self._entry_or_exit_time = car.exit_time
-        self._cars = [c for c in self._cars if c.license_plate != car.license_plate]
+        with self._event_lock:
+            self.unpark_car(car)
+            car.exited_car_park(self.temperature, self._get_current_time())
+            self._entry_or_exit_time = car.exit_time
+            self._cars.pop(car, None)
+            if car.car_park is self:
+                car.car_park = None
+        CARS_EXITED.labels(self.name).inc()
+
+        for listener in self._car_listeners:
+            listener.on_car_removed(car)
+
+    def check_overstays(self, now: datetime | None = None) -> List[Car]:
+        """Report the Cars staying longer than the Maximum Stay at 'now' (default: the current time), once each"""
+        from smartpark.overstays import encode_overstay
+
+        with self._event_lock:
+            cars = self.overstays.check(datetime_to_timestamp(self._get_current_time() if now is None else now))
+
+        for car in cars:
+            OVERSTAYS.labels(self.name).inc()
+            self.on_overstay(car)
+            self.client.publish(self.overstays_topic, encode_overstay(car))
+        return cars
+
+    def on_overstay(self, car: Car):
+        """Override to act on an Overstay, e.g. to log it"""
+        pass
+
+    def _overstay_loop(self, interval: float):
+        while True:
+            time.sleep(interval)
+            self.check_overstays(self._clock())
+
+    def publish_analytics(self) -> str:
+        """Publish the Analytics Summary (see CarParkAnalytics), at the time on the clock: rates decay when quiet"""
+        msg_str = self.analytics.encode(datetime_to_timestamp(self._clock()))
+        self.client.publish(self.analytics_topic, msg_str)
+        return msg_str
+
+    def _analytics_loop(self, interval: float):
+        while True:
+            time.sleep(interval)
+            self.publish_analytics()
+
+    def publish_forecast(self) -> str:
+        """Update the Forecaster with the current State, and publish the Forecasts (see encode_forecast)"""
+        from smartpark.forecast import encode_forecast
+
+        now = datetime_to_timestamp(self._get_current_time())
+        self.forecaster.update(0, now, self.available_bays)
+        msg_str = encode_forecast(self.forecaster.horizons, self.forecaster.forecast_car_park(0, now))
+        self.client.publish(self.forecast_topic, msg_str)
+        return msg_str
 
-    def publish_to_display(self) -> str:
+    def _forecast_loop(self, interval: float):
+        from smartpark.forecast import fit_from_display_history
+
+        while True:
+            try:
+                forecaster = fit_from_display_history(self._forecast_history, self._total_bays, self.display_topic,
+                                                      horizons=self._forecast_horizons)
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Forecasts not fitted from {self._forecast_history}: {e}")
+            else:
+                with self._event_lock:
+                    self.forecaster = forecaster
+
+            time.sleep(interval)
+
+    def _get_display_fields(self) -> List[str]:
+        """Returns the Fields of the Display Message"""
+        return [f"{self.available_bays}",
+                f"{self.temperature}",
+                f"{self._entry_or_exit_time.strftime('%Y-%m-%d %H:%M:%S')}",
+                f"{self.total_cars}",
+                f"{self.parked_cars}",
+                f"{self.un_parked_cars}"
+                ] + self._get_trace_fields()
+
+    def _get_trace_fields(self) -> List[str]:
+        """Returns the optional Trace Field of the Display Message, for Traced Sensor Messages"""
+        if self._trace is None or self._trace.timestamp is None:
+            return []
+        return [create_trace_field(self._trace.event_id, self._trace.timestamp)]
+
+    @PROFILER.span("car_park.publish_to_display")
+    def publish_to_display(self) -> str | None:
         """Publish the latest Entry/Exit Event to listening Displays.
 
         Format of Message String:
-        "<available-bays>;<temperature>;<time>;<total-cars>;<parked-cars>;<un-parked-cars>"
+        "<available-bays>;<temperature>;<time>;<total-cars>;<parked-cars>;<un-parked-cars>[;<trace>]"
+
+        The Trace is only appended when the handled Sensor Message was traced (see create_trace_field). With the Delta
+        Display Protocol, only the changed fields are sent (see DeltaEncoder).
+
+        When bays are assigned, the Per-Bay State is also published on the Bays Topic (see encode_bay_state). With
+        zones, the availability of the zones updated since the last message is published (see create_zone_topic). With
+        forecasts, the expected available bays are published on the Forecast Topic (see create_forecast_topic).
+
+        Under a burst of queued events (see IngressQueue), the publish is shed and None is returned: the state after
+        the last queued event is published once the queue drains.
         """
-        msg_str = f"{self.available_bays};" \
-                  f"{self.temperature};" \
-                  f"{self._entry_or_exit_time.strftime('%Y-%m-%d %H:%M:%S')};"\
-                  f"{self.total_cars};"\
-                  f"{self.parked_cars};"\
-                  f"{self.un_parked_cars}"
-
-        self.client.publish(self.display_topic, msg_str)
+        if self._shed_display_publishes and self._ingress.pending_events > 0:
+            self._display_pending = True
+            SHED_MESSAGES.labels(self.name, "display").inc()
+            return None
+
+        if self._delta_encoder is None:
+            msg_str = ";".join(self._get_display_fields())
+        else:
+            msg_str = self._delta_encoder.encode(self._get_display_fields())
+
+        if self.client.publish(self.display_topic, msg_str).rc != paho.MQTT_ERR_SUCCESS:
+            PUBLISH_FAILURES.labels(self.name).inc()
+        DISPLAY_PUBLISHES.labels(self.name).inc()
+
+        if self.bays is not None:
+            self.client.publish(self.bays_topic, self.bays.encode(self._assigned_bay))
+            self._assigned_bay = None
+
+        if self.zones is not None:
+            self._publish_zones()
+
+        if self.forecaster is not None:
+            self.publish_forecast()
+
         self._print_car_park_state()
         print("=" * 100, "\n")
         return msg_str
 
+    def _publish_zones(self):
+        """Publish the Availability of the updated Zones, retained"""
+        from smartpark.zones import create_zone_topic
+
+        for zone_id in sorted(self._updated_zones):
+            self.client.publish(create_zone_topic(self.display_topic, self.zones.get_path(zone_id)),
+                                f"{self.zones.get_available(zone_id)};{self.zones.get_capacity(zone_id)}",
+                                retain=True)
+        self._updated_zones.clear()
+
+    def _on_keyframe_request(self, client: paho.Client, userdata: Any, message: paho.MQTTMessage):
+        """Callback for Displays Requesting a Keyframe of the Delta Display Protocol. Runs on the network thread: the
+        encoder is shared with the threads applying messages, under the event lock."""
+        with self._event_lock:
+            if self._entry_or_exit_time is None:  # Nothing to publish yet, the first message is always a Keyframe
+                return
+
+            self.client.publish(self.display_topic,
+                                self._delta_encoder.encode(self._get_display_fields(), keyframe=True))
+
+    def _on_profiling_command(self, client: paho.Client, userdata: Any, message: paho.MQTTMessage):
+        """Callback for the Profiling Control Topic. Commands: "start[,<sample-rate>]" or "stop".
+
+        Invalid commands are logged and counted as parse errors. Stopping writes the captures in its own thread, off
+        the network thread.
+        """
+        command = message.payload.decode(errors="replace").split(",")
+
+        try:
+            if command[0] == "start" and len(command) <= 2:
+                sample_rate = float(command[1]) if len(command) > 1 else 0.1
+                if not 0 <= sample_rate <= 1:
+                    raise ValueError(f"Sample rate out of [0, 1]: {sample_rate}")
+            elif command != ["stop"]:
+                raise ValueError(f"Unknown command: {command[0]}")
+        except ValueError as e:
+            self.logger.error(f"Invalid Profiling Command - {message.payload!r}: {e}")
+            PARSE_ERRORS.labels(self.name).inc()
+            return
+
+        if command[0] == "start":
+            PROFILER.start(sample_rate=sample_rate)
+            print("Profiling Started")
+        else:
+            threading.Thread(target=self._stop_profiling, name=f"profiling-{self.name}").start()
+
+    def _stop_profiling(self):
+        for path in PROFILER.stop(f"car_park-{self.name}"):
+            print(f"Profiling Written - {path}")
+
     def _print_car_park_state(self):
         """Print Car Park State"""
+        import pprint  # Imported here, pprint is slow to import and only needed once a car park is serving
 
         print_dict = {"Available Bays": self.available_bays,
                       "Number of Cars": self.total_cars,
@@ -145,6 +836,8 @@ class CarPark(MqttDevice):
                       "Time": self._entry_or_exit_time.strftime('%Y-%m-%d %H:%M:%S'),
                       "Temperature": self.temperature
                       }
+        if self.reservations is not None:
+            print_dict["Held Bays"] = self.held_bays
         pprint.pprint(print_dict)
 
     def start_serving(self, *args, **kwargs):
@@ -169,6 +862,12 @@ class CarPark(MqttDevice):
 class SimulatedCarPark(CarPark):
     def start_serving(self):
         self.logger.info(f"Car Park Start Serving ...")
+
+        try:
+            PROFILER.install_signal_handler(f"car_park-{self.name}")  # e.g. kill -USR1 <pid>
+        except ValueError:  # Not in the main thread
+            self.logger.warning("Profiling signal handler not installed")
+
         self.client.loop_forever()
 
     def on_car_entry(self):
@@ -181,8 +880,9 @@ class SimulatedCarPark(CarPark):
         if self.available_bays > 0:  # If there are available bay(s)
             # Select a Car to be parked, car who just entered or un-parked car(s)
             car_to_park = random.choice(self.get_un_parked_cars())
-            car_to_park.car_parked()
-            self.logger.info(f"Car '{car_to_park}' got parked")
+            self.park_car(car_to_park)
+            self.logger.info(f"Car '{car_to_park}' got parked" +
+                             (f" in bay {car_to_park.bay_id}" if car_to_park.bay_id is not None else ""))
             print(car_to_park.to_json_format(indent=4))
 
         self.publish_to_display()
@@ -193,7 +893,7 @@ class SimulatedCarPark(CarPark):
         car: Car | None = random.choice(all_cars) if len(all_cars) > 0 else None
 
         if car is not None:
-            car.car_unparked()  # Un-park the car regardless if it's parked or not!
+            self.unpark_car(car)  # Un-park the car regardless if it's parked or not!
             self.logger.info(f"Car '{car}' got un-parked")
             self.remove_car(car)
             self.logger.info(f"Car Exited - {car.to_json_format()}")
@@ -204,27 +904,52 @@ class SimulatedCarPark(CarPark):
 
             # Important for Simulation when the first random "signal" is exit when there are no cars in the Car Park.
             if self.entry_or_exit_time is None:
-                self.entry_or_exit_time = datetime.now()
+                self.entry_or_exit_time = self._get_current_time()
 
             print("There are no cars in the park to exit!")
 
+    def on_overstay(self, car: Car):
+        self.logger.warning(f"Car Overstayed - {car.to_json_format()}")
+
+    def on_sensor_down(self, sensor_topic: str):
+        self.logger.error(f"Sensor Down - {sensor_topic}")
+
+    def on_sensor_recovered(self, sensor_topic: str):
+        self.logger.info(f"Sensor Recovered - {sensor_topic}")
+
+    @PROFILER.span("car_park.on_message", capture=True)
     @quit_listener
+    @PROFILER.span("car_park.on_message.handler")
     def on_message(self, client: paho.Client, userdata: Any, message: paho.MQTTMessage):
+        received_time = time.time()
+        handling_start = time.monotonic()
+
         msg = message.payload.decode()
 
         self.logger.info(f"Message Received - {msg}")
+        MESSAGES.labels(self.name).inc()
 
         try:
-            signal, self.temperature = msg.split(",")
+            sensor_message = SensorMessage.from_payload(msg)
         except Exception as e:
             print(e)
             self.logger.error(str(e))
+            PARSE_ERRORS.labels(self.name).inc()
             return
 
-        if signal == "Enter":
-            self.on_car_entry()
-        elif signal == "Exit":
-            self.on_car_exit()
+        self.record_sensor_alive(message.topic)
+
+        if self.is_duplicate(message.topic, sensor_message):
+            self.logger.warning(f"Duplicate Message Dropped - {msg}")
+            return
+
+        if not self.resolve_temperature(message.topic, sensor_message):
+            self.logger.warning(f"Unknown Temperature for the Message, no Telemetry received yet - {msg}")
+
+        if not self.handle_sensor_message(sensor_message, received_time):
+            self.logger.warning(f"Late Message Applied out of Order - {msg}")
+
+        HANDLE_SECONDS.labels(self.name).observe(time.monotonic() - handling_start)
 
 
 def create_car_park_from_config_path(car_park_type, config_path: str, car_park_name: str, *args, **kwargs):
@@ -2,6 +2,46 @@ from typing import List
 import toml
 
 
+def flatten_zone_configs(zone_configs: List[dict], parent: str | None = None) -> List[dict]:
+    """Flatten nested Zone Configurations, parents before their children.
+
+    Zones are nested with 'zones' (e.g. levels, then EV / accessible / staff bays). Each flattened zone has:
+        - path: names from the top zone, joined with '/', e.g. "level1/ev"
+        - parent: path of the parent zone, None for a top zone
+        - bays: number of bays, required for the zones without sub-zones, else the sum of the sub-zones
+    Other keys are kept as given. Raises ValueError when a zone is invalid.
+    """
+    out_zone_configs = []
+
+    for zone_config in zone_configs:
+        if "name" not in zone_config or "/" in zone_config["name"]:
+            raise ValueError(f"Invalid zone name in {zone_config}")
+
+        path = zone_config["name"] if parent is None else f"{parent}/{zone_config['name']}"
+        temp_zone_dict = {"path": path, "parent": parent}
+        for key, value in zone_config.items():
+            if key not in ["name", "zones"]:
+                temp_zone_dict[key] = value
+
+        sub_zone_configs = flatten_zone_configs(zone_config.get("zones", []), path)
+        if len(sub_zone_configs) > 0:
+            bays = sum(sub_zone["bays"] for sub_zone in sub_zone_configs if sub_zone["parent"] == path)
+            if zone_config.get("bays", bays) != bays:
+                raise ValueError(f"Zone '{path}' has {zone_config['bays']} bays, its sub-zones have {bays}")
+            temp_zone_dict["bays"] = bays
+        elif "bays" not in zone_config:
+            raise ValueError(f"Zone '{path}' has neither bays nor sub-zones")
+
+        out_zone_configs.append(temp_zone_dict)
+        out_zone_configs.extend(sub_zone_configs)
+
+    paths = [zone_config["path"] for zone_config in out_zone_configs]
+    if len(set(paths)) != len(paths):
+        raise ValueError(f"Duplicate zone names in {paths}")
+
+    return out_zone_configs
+
+
 class Config:
     """Class for Parsing a TOML Configuration File.
     """
@@ -72,6 +112,12 @@ class Config:
             temp_sensor_dict["name"] = sensor_dict_config["name"]
             temp_sensor_dict["topic-qualifier"] = sensor_dict_config["type"]
             temp_sensor_dict["location"] = sensor_dict_config["location"]
+
+            # Optional Sensor Settings, e.g. trace = true
+            for key, value in sensor_dict_config.items():
+                if key not in ["name", "type", "location"]:
+                    temp_sensor_dict[key] = value
+
             out_sensor_configs.append(temp_sensor_dict | common_config)
 
         return out_sensor_configs
@@ -92,8 +138,31 @@ class Config:
         out_dict["location"] = car_park_complete_config["location"]
         out_dict["total_bays"] = car_park_complete_config["total_bays"]
 
+        # Optional Car Park Settings, e.g. display_protocol = "delta"
+        for key, value in car_park_complete_config.items():
+            if key not in out_dict and key not in ["sensors", "displays", "zones", "topic-root", "host", "port"]:
+                out_dict[key] = value
+
+        # Optional Zones, flattened (see flatten_zone_configs)
+        if "zones" in car_park_complete_config:
+            out_dict["zones"] = self.get_zone_configs(car_park_name)
+
         return out_dict | common_config
 
+    def get_zone_configs(self, car_park_name: str) -> List[dict]:
+        """Returns the flattened List of Zone Configurations from a given Car Park Name, empty if it has no zones.
+
+        Raises ValueError when the top zones do not add up to the bays of the Car Park."""
+        car_park_complete_config = self._get_car_park_complete_config(car_park_name)
+        zone_configs = flatten_zone_configs(car_park_complete_config.get("zones", []))
+
+        bays = sum(zone_config["bays"] for zone_config in zone_configs if zone_config["parent"] is None)
+        if len(zone_configs) > 0 and bays != car_park_complete_config["total_bays"]:
+            raise ValueError(f"The zones of '{car_park_name}' have {bays} bays, the car park has "
+                             f"{car_park_complete_config['total_bays']}")
+
+        return zone_configs
+
     def get_display_configs(self, car_park_name: str) -> List[dict]:
         """Returns a List of Display Configurations as a Dictionary from a given Car Park Name"""
         common_config = self._get_common_config(car_park_name)
@@ -111,6 +180,11 @@ class Config:
             temp_display_dict["location"] = display_location if display_location is not None else \
                 self._get_car_park_complete_config(car_park_name)["location"]
 
+            # Optional Display Settings, e.g. metrics_port = 9102
+            for key, value in display_dict_config.items():
+                if key not in ["name", "location"]:
+                    temp_display_dict[key] = value
+
             out_display_configs.append(temp_display_dict | common_config)
 
         return out_display_configs
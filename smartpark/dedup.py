@@ -0,0 +1,94 @@
+from typing import Dict
+from collections import OrderedDict
+import threading
+
+
+class SequenceWindow:
+    """Sliding Window over the Sequence Numbers of one Sensor.
+
+    Remembers which of the last 'size' sequence numbers (up to the highest seen) were seen, as the bits of one int:
+    bit i is set when (highest - i) was seen. Older sequence numbers are unknown.
+    """
+    def __init__(self, size: int):
+        self._size = size
+        self._full_mask = (1 << size) - 1
+        self._highest: int | None = None
+        self._mask = 0
+
+    def check(self, seq: int) -> bool | None:
+        """Record a Sequence Number. Returns True if it was seen, False if not, None if it is before the window."""
+        if self._highest is None or seq > self._highest:
+            shift = self._size if self._highest is None else seq - self._highest
+            self._mask = ((self._mask << shift) | 1) & self._full_mask if shift < self._size else 1
+            self._highest = seq
+            return False
+
+        offset = self._highest - seq
+        if offset >= self._size:
+            return None
+
+        if (self._mask >> offset) & 1:
+            return True
+
+        self._mask |= 1 << offset
+        return False
+
+    def reset(self, seq: int):
+        """Restart the Window at a Sequence Number, e.g. the sensor restarted from 1"""
+        self._highest = seq
+        self._mask = 1
+
+
+class EventDeduplicator:
+    """Bounded per-Sensor Detection of Duplicate Events, e.g. QoS 1 redeliveries or retrying sensors.
+
+    Each sensor has a SequenceWindow and an LRU of its recent Event IDs:
+        - With an Event ID, it decides: a duplicate when it is among the recent ones. A sequence number that was seen
+          or is before the window, with a new Event ID, means the sensor restarted, and its window starts over.
+        - Without one, a sequence number in the window is a duplicate when it was seen
+    Events with neither are never duplicates. The memory is fixed per sensor, however long the car park runs.
+    """
+
+    DEFAULT_WINDOW_SIZE = 1024
+    DEFAULT_MAX_EVENT_IDS = 1024
+
+    def __init__(self, window_size: int = DEFAULT_WINDOW_SIZE, max_event_ids: int = DEFAULT_MAX_EVENT_IDS):
+        if window_size < 1 or max_event_ids < 1:
+            raise ValueError("window_size and max_event_ids must be at least 1")
+
+        self._window_size = window_size
+        self._max_event_ids = max_event_ids
+        self._windows: Dict[str, SequenceWindow] = {}
+        self._event_ids: Dict[str, OrderedDict] = {}
+        self._lock = threading.Lock()
+
+    def is_duplicate(self, sensor: str, seq: int | None = None, event_id: str | None = None) -> bool:
+        """Check an Event of a Sensor (e.g. its topic) and Record it"""
+        with self._lock:
+            seen = None
+            if seq is not None:
+                window = self._windows.get(sensor, None)
+                if window is None:
+                    window = self._windows[sensor] = SequenceWindow(self._window_size)
+                seen = window.check(seq)
+
+            if event_id is not None:
+                event_ids = self._event_ids.get(sensor, None)
+                if event_ids is None:
+                    event_ids = self._event_ids[sensor] = OrderedDict()
+
+                if event_id in event_ids:
+                    event_ids.move_to_end(event_id)
+                    return True
+
+                event_ids[event_id] = None
+                if len(event_ids) > self._max_event_ids:
+                    event_ids.popitem(last=False)
+
+                if seen is not False:
+                    seen = None
+
+            if seen is None and seq is not None:
+                window.reset(seq)
+
+            return seen is True
@@ -3,17 +3,74 @@ from typing import Any, Iterable
 from functools import wraps
 import paho.mqtt.client as paho
 import threading
-import tkinter as tk
+import time
 
 from smartpark.config import Config
 from smartpark.utils import quit_listener, create_path_if_not_exists
 from smartpark.mqtt_device import MqttDevice
 from smartpark.logger import class_logger
+from smartpark.display_protocol import DeltaDecoder, create_keyframe_request_topic
+from smartpark.tracing import TRACER, parse_trace_field
+from smartpark.metrics import REGISTRY, start_metrics_server
 from smartpark.project_paths import LOG_DIR, DATA_DIR
 
 
+MESSAGES = REGISTRY.counter("smartpark_display_messages_total", "Messages received from the car park", ["display"])
+PARSE_ERRORS = REGISTRY.counter("smartpark_display_parse_errors_total", "Invalid messages from the car park",
+                                ["display"])
+HANDLE_SECONDS = REGISTRY.histogram("smartpark_display_handle_seconds", "Time spent handling a message",
+                                    ["display"])
+
+
+def measure_display_message(on_message_callback):
+    """Count the Messages, Parse Errors and Handling Time of a Display.
+
+    Decorator for the MQTT on_message() callback. Parse Errors are counted, then raised as before.
+    """
+    @wraps(on_message_callback)
+    def wrapper(self, client: paho.Client, userdata, message):
+        handling_start = time.monotonic()
+        MESSAGES.labels(self.name).inc()
+
+        try:
+            return on_message_callback(self, client, userdata, message)
+        except (ValueError, IndexError):
+            PARSE_ERRORS.labels(self.name).inc()
+            raise
+        finally:
+            HANDLE_SECONDS.labels(self.name).observe(time.monotonic() - handling_start)
+    return wrapper
+
+
+def decode_display_message(on_message_callback):
+    """Rebuild full Messages from the Delta Display Protocol before passing them to the Display.
+
+    Decorator for the MQTT on_message() callback. Deltas are dropped while a Keyframe is awaited (e.g. after a gap in
+    the Sequence Numbers), and a Keyframe is requested from the Car Park. Full messages are passed as-is.
+    """
+    @wraps(on_message_callback)
+    def wrapper(self, client: paho.Client, userdata, message):
+        if not hasattr(self, "delta_decoder"):
+            setattr(self, "delta_decoder", DeltaDecoder())
+
+        fields = self.delta_decoder.decode(message.payload.decode())
+
+        if self.delta_decoder.pop_keyframe_request():
+            client.publish(create_keyframe_request_topic(self.display_topic), "")
+
+        if fields is None:
+            return
+
+        message.payload = ";".join(fields).encode()
+        return on_message_callback(self, client, userdata, message)
+    return wrapper
+
+
 def store_message(file_path: str):
-    """Store Messages/Data Received from Car Park.
+    """Store Messages/Data Received from Car Park, with the Display Topic of the Car Park (see load_display_history).
+
+    Format of each Line (the Display Topic was added as a 7th field, and the trace field is not stored anymore):
+        "<available-bays>,<temperature>,<time>,<num-cars>,<num-parked-cars>,<num-un-parked-cars>,<display-topic>"
 
     Decorator for the MQTT on_message() callback.
     """
@@ -26,7 +83,8 @@ def store_message(file_path: str):
             msg_split = msg.split(";")
 
             if len(msg_split) > 1:
-                data = ",".join(msg_split)
+                # Line: the fields of the message, without the optional trace field, then the display topic
+                data = ",".join(msg_split[:6] + [message.topic])
 
                 create_path_if_not_exists(file_path)
 
@@ -38,6 +96,33 @@ def store_message(file_path: str):
     return inner
 
 
+def trace_display_message(on_message_callback):
+    """Record the Latencies of Traced Display Messages, i.e. Messages with the optional Trace Field.
+
+    Decorator for the MQTT on_message() callback. Place it below decode_display_message().
+    """
+    @wraps(on_message_callback)
+    def wrapper(self, client: paho.Client, userdata, message):
+        msg_split = message.payload.decode().split(";")
+
+        if len(msg_split) <= 6:  # Not Traced
+            return on_message_callback(self, client, userdata, message)
+
+        received_time = time.time()
+        result = on_message_callback(self, client, userdata, message)
+
+        try:
+            _, sensor_time, car_park_time = parse_trace_field(msg_split[6])
+        except ValueError:
+            return result
+
+        TRACER.record("car_park_to_display", received_time - car_park_time)
+        TRACER.record("sensor_to_display", time.time() - sensor_time)
+        TRACER.dump_on_exit(LOG_DIR / 'tracing' / f"display-{self.name}.json")
+        return result
+    return wrapper
+
+
 class Display(MqttDevice):
     """Base Class for Displays. It follows the Subscriber pattern.
     """
@@ -48,6 +133,12 @@ class Display(MqttDevice):
 
         self.client.subscribe(self.display_topic)
         self.client.on_message = self.on_message
+        if config.get("message_workers", None) is not None:  # Optional Worker Pool, see KeyedExecutor
+            from smartpark.executor import get_executor
+            self.client.on_message = get_executor(config["message_workers"]).wrap(self.name, self.on_message)
+
+        if config.get("metrics_port", None) is not None:  # Optional Metrics Endpoint
+            start_metrics_server(config["metrics_port"])
 
     @abstractmethod
     def start_listening(self, *args, **kwargs):
@@ -80,6 +171,8 @@ class WindowedDisplay:
             An iterable (usually a list) of field names for the UI. Updates to values must be presented in a dictionary
             with these values as keys.
         """
+        import tkinter as tk  # Imported here, so that headless Displays do not load tkinter
+
         self.window = tk.Tk()
         self.window.title(f'{title}: Parking')
         self.window.geometry('1400x600')
@@ -140,6 +233,9 @@ class TkGUIDisplay(Display):
         self.window.show()
 
     @quit_listener
+    @measure_display_message
+    @decode_display_message
+    @trace_display_message
     @store_message(DATA_DIR / "display_messages.txt")
     def on_message(self, client: paho.Client, userdata: Any, message: paho.MQTTMessage):
         data = message.payload.decode()
@@ -172,6 +268,9 @@ class ConsoleDisplay(Display):
         self.client.loop_forever()
 
     @quit_listener
+    @measure_display_message
+    @decode_display_message
+    @trace_display_message
     @store_message(DATA_DIR / "display_messages.txt")
     def on_message(self, client: paho.Client, userdata: Any, message: paho.MQTTMessage):
         data = message.payload.decode()  # "<Entry|Exit>,<temperature>"
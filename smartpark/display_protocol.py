@@ -0,0 +1,132 @@
+from typing import List
+
+
+KEYFRAME = "K"
+DELTA = "D"
+
+
+def create_keyframe_request_topic(display_topic: str) -> str:
+    """Create the Topic used by Displays to Request a Keyframe from the Car Park"""
+    return f"{display_topic}/keyframe"
+
+
+class DeltaEncoder:
+    """Encode Display Fields as Delta Updates with a Sequence Number. Used by the Car Park.
+
+    Formats of Message String:
+        - Keyframe: "K;<seq>;<field-0>;<field-1>;...;<field-n>"
+        - Delta:    "D;<seq>;<index>=<value>;<index>=<value>;..."
+
+    Only the fields that changed since the previous message are sent in a Delta. A full Keyframe is sent every
+    'keyframe_interval' messages, when the number of fields changes, or when a Display requested one.
+    """
+
+    DEFAULT_KEYFRAME_INTERVAL = 20
+
+    def __init__(self, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL):
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be at least 1")
+
+        self._keyframe_interval = keyframe_interval
+        self._seq = 0
+        self._since_keyframe = 0
+        self._last_fields: List[str] | None = None
+        self._keyframe_requested = False
+
+    @property
+    def seq(self) -> int:
+        """Sequence Number of the last encoded Message"""
+        return self._seq
+
+    def request_keyframe(self):
+        """Force the next encoded Message to be a Keyframe"""
+        self._keyframe_requested = True
+
+    def encode(self, fields: List[str], keyframe: bool = False) -> str:
+        """Encode the given Display Fields as a Keyframe or Delta Message String"""
+        fields = [str(field) for field in fields]
+        self._seq += 1
+
+        if keyframe or self._keyframe_requested or self._last_fields is None \
+                or len(fields) != len(self._last_fields) \
+                or self._since_keyframe >= self._keyframe_interval - 1:
+            self._keyframe_requested = False
+            self._since_keyframe = 0
+            self._last_fields = fields
+            return ";".join([KEYFRAME, str(self._seq)] + fields)
+
+        changes = [f"{i}={value}" for i, (value, last_value) in enumerate(zip(fields, self._last_fields))
+                   if value != last_value]
+
+        self._since_keyframe += 1
+        self._last_fields = fields
+        return ";".join([DELTA, str(self._seq)] + changes)
+
+
+class DeltaDecoder:
+    """Rebuild the full Display Fields from Keyframe and Delta Messages. Used by the Displays.
+
+    A gap in the Sequence Numbers (i.e. a lost Message) invalidates the current state. Deltas are then dropped until
+    the next Keyframe arrives. Messages without the protocol header are returned as-is (i.e. full messages).
+    """
+    def __init__(self):
+        self._seq: int | None = None
+        self._fields: List[str] | None = None
+        self._keyframe_request_pending = False
+        self._keyframe_requested = False
+
+    @property
+    def seq(self) -> int | None:
+        """Sequence Number of the last applied Message"""
+        return self._seq
+
+    @property
+    def awaiting_keyframe(self) -> bool:
+        return self._fields is None
+
+    def pop_keyframe_request(self) -> bool:
+        """Returns True once per gap, when the caller should request a Keyframe from the Car Park"""
+        pending = self._keyframe_request_pending
+        self._keyframe_request_pending = False
+        return pending
+
+    def _await_keyframe(self):
+        """Drop the current State and Request a Keyframe, once until the next Keyframe arrives"""
+        self._fields = None
+        if not self._keyframe_requested:
+            self._keyframe_requested = True
+            self._keyframe_request_pending = True
+
+    def decode(self, msg: str) -> List[str] | None:
+        """Decode a Message String and Returns the full list of Display Fields, or None while awaiting a Keyframe"""
+        msg_split = msg.split(";")
+
+        if msg_split[0] not in [KEYFRAME, DELTA]:
+            return msg_split
+
+        kind, seq, payload = msg_split[0], int(msg_split[1]), msg_split[2:]
+
+        if kind == KEYFRAME:
+            self._seq = seq
+            self._fields = payload
+            self._keyframe_request_pending = False
+            self._keyframe_requested = False
+            return list(self._fields)
+
+        if self._fields is None or self._seq is None:
+            self._await_keyframe()
+            return None
+
+        if seq <= self._seq:  # Duplicate or stale Delta
+            return None
+
+        if seq != self._seq + 1:  # Gap detected, wait for the next Keyframe
+            self._await_keyframe()
+            return None
+
+        for change in payload:
+            index, value = change.split("=", 1)
+            self._fields[int(index)] = value
+
+        self._seq = seq
+        return list(self._fields)
@@ -0,0 +1,87 @@
+from typing import Any, Callable, Dict, List
+from zlib import crc32
+import queue
+import threading
+
+import paho.mqtt.client as paho
+
+from smartpark.metrics import REGISTRY
+
+
+QUEUED_MESSAGES = REGISTRY.gauge("smartpark_executor_queued_messages", "Messages waiting for a worker", ["worker"])
+MESSAGE_ERRORS = REGISTRY.counter("smartpark_executor_errors_total", "Messages whose handler raised", ["worker"])
+
+
+class KeyedExecutor:
+    """Pool of Worker Threads handling MQTT Messages off the paho Network Thread.
+
+    Each key (e.g. a Car Park or Display name) is always handled by the same worker, picked by a stable hash of the
+    key: the messages of a key are handled in order, by a single writer, while different keys run in parallel. The
+    network thread only queues the messages, so that slow handlers (e.g. file I/O, GUI updates) do not stall it.
+    """
+    def __init__(self, num_workers: int, name: str = "executor"):
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+
+        self._queues: List[queue.SimpleQueue] = [queue.SimpleQueue() for _ in range(num_workers)]
+        self._threads = [threading.Thread(target=self._work, args=(i,), name=f"{name}-{i}", daemon=True)
+                         for i in range(num_workers)]
+        for i, thread in enumerate(self._threads):
+            QUEUED_MESSAGES.labels(thread.name).set_function(self._queues[i].qsize)
+            thread.start()
+
+    @property
+    def num_workers(self) -> int:
+        return len(self._queues)
+
+    def get_worker(self, key: str) -> int:
+        """Index of the Worker handling a Key"""
+        return crc32(key.encode()) % len(self._queues)
+
+    def submit(self, key: str, function: Callable, *args):
+        """Queue a Call on the Worker of the Key"""
+        self._queues[self.get_worker(key)].put((function, args))
+
+    def wrap(self, key: str, on_message_callback: Callable) -> Callable:
+        """Wrap an MQTT Message Callback, so that the messages are handled by the Worker of the Key"""
+        def submit_message(client: paho.Client, userdata: Any, message: paho.MQTTMessage):
+            self.submit(key, on_message_callback, client, userdata, message)
+        return submit_message
+
+    def shutdown(self, wait: bool = True):
+        """Stop the Workers once they handled the queued Calls"""
+        for worker_queue in self._queues:
+            worker_queue.put(None)
+
+        if wait:
+            for thread in self._threads:
+                if thread is not threading.current_thread():
+                    thread.join()
+
+    def _work(self, index: int):
+        worker_queue, name = self._queues[index], self._threads[index].name
+        while True:
+            item = worker_queue.get()
+            if item is None:
+                return
+
+            function, args = item
+            try:
+                function(*args)
+            except SystemExit:  # A device quitting (see quit_listener) does not stop the other keys of the worker
+                pass
+            except Exception as e:
+                MESSAGE_ERRORS.labels(name).inc()
+                print(e)
+
+
+_EXECUTORS: Dict[int, KeyedExecutor] = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+
+def get_executor(num_workers: int) -> KeyedExecutor:
+    """Executor shared by the Devices of the current process, e.g. the Roles of the Role Runner. One per pool size."""
+    with _EXECUTORS_LOCK:
+        if num_workers not in _EXECUTORS:
+            _EXECUTORS[num_workers] = KeyedExecutor(num_workers, name=f"executor{num_workers}")
+        return _EXECUTORS[num_workers]
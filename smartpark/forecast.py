@@ -0,0 +1,193 @@
+"""Occupancy Forecasting from the stored Display History, e.g. "expected free bays in 30/60 minutes" on the signs.
+
+Requires NumPy, an optional dependency (pip install smartpark[forecast]): it is only imported when forecasting is
+used, see the forecast_history setting of the Car Park.
+"""
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+import math
+
+from smartpark.tracing import TRACE_FIELD_SEP
+
+if TYPE_CHECKING:
+    import numpy
+
+
+WEEK_SECONDS = 7 * 86400
+EPOCH_WEEKDAY = 3  # The EPOCH of the timestamps (1970-01-01) is a Thursday, weeks start on Monday
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("Forecasting requires NumPy: pip install smartpark[forecast]") from e
+    return numpy
+
+
+def create_forecast_topic(display_topic: str) -> str:
+    """Create the Topic of the Occupancy Forecasts, published by the Car Park next to its Display Messages.
+
+    Format of Message String: "<minutes>:<expected-available-bays>;..." e.g. "30:12;60:8"
+    """
+    return f"{display_topic}/forecast"
+
+
+def encode_forecast(horizons: Sequence[int], available_bays: Sequence[int]) -> str:
+    return ";".join(f"{horizon // 60}:{bays}" for horizon, bays in zip(horizons, available_bays))
+
+
+def load_display_history(file_path: str, display_topic: str | None = None) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+    """Load the Display Messages stored by store_message(). Returns (timestamps, available bays) as NumPy arrays.
+
+    Format of each Line:
+        "<available-bays>,<temperature>,<time>,<num-cars>,<num-parked-cars>,<num-un-parked-cars>,<display-topic>"
+    Timestamps are in seconds since EPOCH (see Car.entry_timestamp). Invalid lines are skipped, and so are the lines
+    of other car parks when a Display Topic is given. The copies of a message stored by each display of a car park are
+    loaded once.
+
+    Lines stored before the Display Topic was recorded have no car park: six fields, or a trace field in its place.
+    They are loaded for any Display Topic.
+    """
+    np = _import_numpy()
+
+    available, times = [], []
+    with open(file_path, 'r') as file:
+        for line in file:
+            line_split = line.rstrip("\n").split(",")
+            if len(line_split) < 6 or not line_split[0].isdigit():
+                continue
+            has_topic = len(line_split) > 6 and TRACE_FIELD_SEP not in line_split[6]
+            if display_topic is not None and has_topic and line_split[6] != display_topic:
+                continue
+            available.append(int(line_split[0]))
+            times.append(line_split[2])
+
+    timestamps = np.array(times, dtype="datetime64[s]").astype(np.int64)
+    order = np.argsort(timestamps, kind="stable")
+    timestamps, available = timestamps[order], np.array(available, dtype=np.float64)[order]
+
+    copies = np.zeros(len(timestamps), dtype=bool)
+    copies[1:] = (timestamps[1:] == timestamps[:-1]) & (available[1:] == available[:-1])
+    return timestamps[~copies], available[~copies]
+
+
+class OccupancyForecaster:
+    """Forecasts of the Available Bays of many Car Parks at once, in vectorized batches.
+
+    Model of each car park: a seasonal profile, i.e. the time-weighted mean of the available bays in each
+    'slot_seconds' slot of the week (time of day and day of week), plus the current deviation from the profile,
+    extrapolated with its recent trend (over 'trend_seconds') and fading out over 'trend_seconds' towards the profile:
+        forecast(t + h) = profile(t + h) + exp(-h / trend_seconds) * (deviation(t) + trend * h)
+
+    fit() computes the profiles and the recent deviations of all the car parks from their histories in one pass over
+    the concatenated samples; update() records the live state of a car park, so that forecasts follow it between fits.
+    """
+    def __init__(self, total_bays: Sequence[int], horizons: Sequence[int] = (1800, 3600), slot_seconds: int = 900,
+                 trend_seconds: float = 3600):
+        np = _import_numpy()
+
+        if WEEK_SECONDS % slot_seconds != 0:
+            raise ValueError("slot_seconds must divide a week")
+
+        self._np = np
+        self.horizons = list(horizons)
+        self._slot_seconds = slot_seconds
+        self._num_slots = WEEK_SECONDS // slot_seconds
+        self._trend_seconds = trend_seconds
+
+        self._total_bays = np.asarray(total_bays, dtype=np.float64)
+        num_parks = len(self._total_bays)
+        self._profiles = np.repeat(self._total_bays[:, None], self._num_slots, axis=1)  # Empty car parks until fit
+
+        # Live State of each Car Park: last deviation from the profile, and an older one for the trend
+        self._last_times = np.full(num_parks, np.nan)
+        self._last_deviations = np.zeros(num_parks)
+        self._anchor_times = np.full(num_parks, np.nan)
+        self._anchor_deviations = np.zeros(num_parks)
+
+    def __len__(self) -> int:
+        return len(self._total_bays)
+
+    def _slots(self, timestamps):
+        return ((timestamps + EPOCH_WEEKDAY * 86400) % WEEK_SECONDS) // self._slot_seconds
+
+    def fit(self, histories: Sequence[Tuple["numpy.ndarray", "numpy.ndarray"]]):
+        """Fit the Profiles of all the Car Parks from their (timestamps, available bays) histories, sorted by time"""
+        np = self._np
+        if len(histories) != len(self):
+            raise ValueError(f"Expected {len(self)} histories, got {len(histories)}")
+
+        lengths = np.array([len(timestamps) for timestamps, _ in histories])
+        parks = np.repeat(np.arange(len(self)), lengths)
+        timestamps = np.concatenate([np.asarray(t, dtype=np.int64) for t, _ in histories] + [np.zeros(0, np.int64)])
+        available = np.concatenate([np.asarray(a, dtype=np.float64) for _, a in histories] + [np.zeros(0)])
+
+        # Each sample holds until the next one of its car park, up to one slot
+        durations = np.full(len(timestamps), float(self._slot_seconds))
+        same_park = parks[1:] == parks[:-1]
+        durations[:-1][same_park] = np.minimum(np.diff(timestamps)[same_park], self._slot_seconds)
+
+        bins = parks * self._num_slots + self._slots(timestamps)
+        size = len(self) * self._num_slots
+        weights = np.bincount(bins, weights=durations, minlength=size).reshape(len(self), self._num_slots)
+        sums = np.bincount(bins, weights=durations * available, minlength=size).reshape(len(self), self._num_slots)
+
+        # Slots without history fall back to the mean of the car park, or to an empty car park
+        park_weights = weights.sum(axis=1)
+        park_means = np.where(park_weights > 0, sums.sum(axis=1) / np.maximum(park_weights, 1e-12), self._total_bays)
+        self._profiles = np.where(weights > 0, sums / np.maximum(weights, 1e-12), park_means[:, None])
+
+        # Recent State: the last sample, and the last sample at least trend_seconds older, of each car park
+        has_history = lengths > 0
+        ends = np.cumsum(lengths) - 1
+        deviations = available - self._profiles[parks, self._slots(timestamps)]
+        keys = parks * (1 << 40) + timestamps  # Sorted by car park, then by time
+        last_times = timestamps[ends[has_history]]
+        anchors = np.searchsorted(keys, np.flatnonzero(has_history) * (1 << 40) + last_times - self._trend_seconds,
+                                  side="right") - 1
+        anchors = np.maximum(anchors, ends[has_history] - lengths[has_history] + 1)  # Within the car park
+
+        self._last_times[has_history] = last_times
+        self._last_deviations[has_history] = deviations[ends[has_history]]
+        self._anchor_times[has_history] = timestamps[anchors]
+        self._anchor_deviations[has_history] = deviations[anchors]
+
+    def update(self, index: int, timestamp: int, available_bays: int):
+        """Record the Live State of a Car Park, e.g. on each Display Message"""
+        deviation = available_bays - self._profiles[index, self._slots(timestamp)]
+
+        # The anchor of the trend moves forward once it is trend_seconds old
+        if math.isnan(self._anchor_times[index]) or timestamp - self._anchor_times[index] > 2 * self._trend_seconds:
+            self._anchor_times[index], self._anchor_deviations[index] = timestamp, deviation
+        elif timestamp - self._anchor_times[index] > self._trend_seconds:
+            self._anchor_times[index] = self._last_times[index]
+            self._anchor_deviations[index] = self._last_deviations[index]
+
+        self._last_times[index], self._last_deviations[index] = timestamp, deviation
+
+    def forecast(self, now: int) -> "numpy.ndarray":
+        """Expected Available Bays of every Car Park at now + each horizon, as a (car parks, horizons) Array"""
+        np = self._np
+        horizons = np.asarray(self.horizons, dtype=np.float64)
+
+        elapsed = np.where(np.isnan(self._last_times), 0.0, now - self._last_times)
+        span = self._last_times - self._anchor_times
+        trends = np.where(span > 0, (self._last_deviations - self._anchor_deviations) / np.where(span > 0, span, 1),
+                          0.0)
+
+        ahead = elapsed[:, None] + horizons[None, :]  # Seconds from the last state to each forecast time
+        deviations = np.exp(-ahead / self._trend_seconds) * (self._last_deviations[:, None] + trends[:, None] * ahead)
+        seasonal = self._profiles[:, self._slots(now + horizons.astype(np.int64))]
+
+        return np.clip(np.rint(seasonal + deviations), 0, self._total_bays[:, None]).astype(np.int64)
+
+    def forecast_car_park(self, index: int, now: int) -> List[int]:
+        return self.forecast(now)[index].tolist()
+
+
+def fit_from_display_history(file_path: str, total_bays: int, display_topic: str | None = None,
+                             **kwargs) -> OccupancyForecaster:
+    """Forecaster of a single Car Park, fitted from its stored Display History (see load_display_history)"""
+    forecaster = OccupancyForecaster([total_bays], **kwargs)
+    forecaster.fit([load_display_history(file_path, display_topic)])
+    return forecaster
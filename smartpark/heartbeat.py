@@ -0,0 +1,86 @@
+from typing import List, Set
+import threading
+
+from smartpark.timing_wheel import TimingWheel
+
+
+def create_heartbeat_topic(sensor_topic: str) -> str:
+    """Create the Heartbeat Topic of a Sensor, e.g. "<topic-root>/<location>/<name>/entry/heartbeat".
+
+    Format of Message String: "<sensor-time>", in seconds since epoch
+    """
+    return f"{sensor_topic}/heartbeat"
+
+
+def create_sensor_status_topic(display_topic: str) -> str:
+    """Create the Topic of the Sensor Status Events, published by the Car Park next to its Display Messages.
+
+    Format of Message String: "<sensor-topic>;<down|up>"
+    """
+    return f"{display_topic}/sensors"
+
+
+class SensorLivenessMonitor:
+    """Failure Detection of Sensors, from their Heartbeats (or any other message of theirs).
+
+    Each watched sensor has a deadline 'timeout' seconds after its last heartbeat, in a TimingWheel: a heartbeat
+    reschedules it in O(1), and check() only pops the sensors whose deadline passed, so the work does not grow with
+    the number of healthy sensors. A sensor is reported down once, and recovered on its next heartbeat.
+
+    Times are on the caller's monotonic clock, e.g. time.monotonic().
+    """
+    DOWN = "down"
+    UP = "up"
+
+    def __init__(self, timeout: float, now: float):
+        if timeout <= 0:
+            raise ValueError("timeout must be positive")
+
+        self._timeout = timeout
+        # Every deadline is within one timeout: the slots cover it with a tick of 1/8 of the timeout
+        self._wheel = TimingWheel(tick=timeout / 8, num_slots=16, start=now)
+        self._watched: Set[str] = set()
+        self._down: Set[str] = set()
+        self._lock = threading.Lock()  # Heartbeats and checks come from different threads
+
+    def __len__(self) -> int:
+        """Number of watched Sensors"""
+        return len(self._watched)
+
+    @property
+    def down_sensors(self) -> Set[str]:
+        return set(self._down)
+
+    def is_down(self, sensor_topic: str) -> bool:
+        return sensor_topic in self._down
+
+    def watch(self, sensor_topic: str, now: float):
+        """Watch a Sensor, alive until 'timeout' seconds without a heartbeat"""
+        with self._lock:
+            self._watched.add(sensor_topic)
+            self._wheel.schedule(sensor_topic, now + self._timeout)
+
+    def unwatch(self, sensor_topic: str):
+        with self._lock:
+            self._watched.discard(sensor_topic)
+            self._down.discard(sensor_topic)
+            self._wheel.cancel(sensor_topic)
+
+    def beat(self, sensor_topic: str, now: float) -> bool:
+        """Record a Heartbeat. Returns True when the sensor recovers, i.e. it was down."""
+        with self._lock:
+            if sensor_topic not in self._watched:
+                return False
+
+            self._wheel.schedule(sensor_topic, now + self._timeout)
+            if sensor_topic in self._down:
+                self._down.remove(sensor_topic)
+                return True
+            return False
+
+    def check(self, now: float) -> List[str]:
+        """Returns the Sensors gone down since the last check"""
+        with self._lock:
+            down = [sensor_topic for sensor_topic in self._wheel.advance(now) if sensor_topic in self._watched]
+            self._down.update(down)
+            return down
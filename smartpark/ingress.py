@@ -0,0 +1,73 @@
+from typing import Any
+from collections import deque
+import threading
+
+
+class IngressQueue:
+    """Bounded Ingress Queue between the MQTT Network Thread and the Worker handling the Messages.
+
+    Two classes of messages share 'max_size' slots: Events (Enter/Exit) are always taken first, and Auxiliary
+    messages (e.g. telemetry) after them. Events are never dropped. When the queue is full:
+        - "drop-oldest": the oldest auxiliary message is dropped to make room (the new one, if it is the only
+          auxiliary message); an event still waits for room when the queue is full of events
+        - "block": the network thread waits for room, for both classes
+    Only put() is called on the network thread, so that it keeps servicing the connection (e.g. keepalives).
+    """
+
+    DROP_OLDEST = "drop-oldest"
+    BLOCK = "block"
+
+    def __init__(self, max_size: int, overflow: str = DROP_OLDEST):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if overflow not in [self.DROP_OLDEST, self.BLOCK]:
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+
+        self._max_size = max_size
+        self._overflow = overflow
+        self._events: deque = deque()
+        self._auxiliary: deque = deque()
+        self._condition = threading.Condition()
+        self._dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._events) + len(self._auxiliary)
+
+    @property
+    def pending_events(self) -> int:
+        return len(self._events)
+
+    @property
+    def dropped(self) -> int:
+        """Number of dropped Auxiliary Messages"""
+        return self._dropped
+
+    def put(self, item: Any, event: bool = True) -> int:
+        """Queue an Event or an Auxiliary Message. Returns the number of dropped auxiliary messages (0 or 1)."""
+        with self._condition:
+            dropped = 0
+            if len(self) >= self._max_size and self._overflow == self.DROP_OLDEST:
+                if len(self._auxiliary) > 0:
+                    self._auxiliary.popleft()
+                    dropped = 1
+                elif not event:
+                    self._dropped += 1
+                    return 1
+
+            while len(self) >= self._max_size:
+                self._condition.wait()
+
+            (self._events if event else self._auxiliary).append(item)
+            self._dropped += dropped
+            self._condition.notify_all()
+            return dropped
+
+    def get(self, timeout: float | None = None) -> Any:
+        """Take the next Message, Events first. Returns None on timeout."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: len(self) > 0, timeout):
+                return None
+
+            item = self._events.popleft() if len(self._events) > 0 else self._auxiliary.popleft()
+            self._condition.notify_all()
+            return item
@@ -0,0 +1,242 @@
+from typing import Dict, List, Tuple
+import argparse
+import random
+import time
+
+import paho.mqtt.client as paho
+
+from smartpark.config import Config
+from smartpark.sensor import Detector, Sensor, EntrySensor, ExitSensor, FileDetector
+from smartpark.logger import class_logger
+from smartpark.project_paths import LOG_DIR
+
+
+@class_logger(LOG_DIR / 'sensor' / 'load_generator' / 'sensor.log', 'load_generator_logger')
+class LoadGenerator(Detector):
+    """High-Rate Synthetic Load Generator. Drives the Entry/Exit Sensors of every Car Park in a Config.
+
+    Arrivals:
+        - "poisson": Exponential inter-arrival times at the target aggregate 'rate' (events/sec)
+        - "trace": Inter-arrival times from a recorded file in the FileDetector format
+          "<Enter|Exit>,<temperature>,<timestamp>", rescaled to the target 'rate' (replayed as-is if rate=None)
+
+    Events are spread uniformly over the Car Parks, 'enter_prb' of them are entries. They are published through the
+    Sensors (see Sensor.on_detection), with their metadata and metrics, as in production.
+
+    Sensors: the ones of the Config, or 'sensors_per_car_park' Virtual Sensors per Car Park, alternately entry and exit,
+    cloned from the configured Sensors with synthetic names "<name>-v<index>" (and so their own topics). Car Parks
+    only listen to registered topics: register the 'sensor_topics' of the generator (see CarPark.register_sensor_topic).
+
+    Reported at the end: the achieved rate, publish errors, the scheduling lag (how far the generator fell behind its
+    schedule) and the back-pressure of the network, i.e. the depth of the outgoing queues of the paho clients: paho
+    accepts every publish and queues it without limit, so a broker or network too slow for the rate shows up there.
+
+    connect=False creates an offline generator, e.g. for tests: publish through recorded clients instead.
+    """
+
+    POISSON = "poisson"
+    TRACE = "trace"
+
+    LATE_THRESHOLD = 0.01  # Seconds behind schedule for an event to count as late
+
+    def __init__(self, config: Config, rate: float = 1000.0, arrivals: str = POISSON, trace_path: str | None = None,
+                 enter_prb=0.55, lower_bound=20, upper_bound=30, seed: int | None = None, connect: bool = True,
+                 sensors_per_car_park: int | None = None):
+        if arrivals not in [self.POISSON, self.TRACE]:
+            raise ValueError(f"Unknown arrivals '{arrivals}'")
+
+        if arrivals == self.TRACE and trace_path is None:
+            raise ValueError("trace_path is required for trace-driven arrivals")
+
+        if arrivals == self.POISSON and rate is None:
+            raise ValueError("rate is required for poisson arrivals")
+
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+
+        if sensors_per_car_park is not None and sensors_per_car_park < 2:
+            raise ValueError("sensors_per_car_park must be at least 2, for an entry and an exit sensor")
+
+        self._rate = rate
+        self._arrivals = arrivals
+        self._enter_prb = enter_prb
+        self._lower_bound = lower_bound
+        self._upper_bound = upper_bound
+        self._random = random.Random(seed)
+        self._connect = connect
+
+        # Virtual Sensors: {car park name: (entry sensors, exit sensors)}
+        self._car_park_sensors: Dict[str, Tuple[List[Sensor], List[Sensor]]] = {}
+
+        for car_park_name in config.get_car_park_names():
+            sensor_configs = config.get_sensor_configs(car_park_name)
+            entry_configs = [sensor_config for sensor_config in sensor_configs
+                             if sensor_config["topic-qualifier"] == "entry"]
+            exit_configs = [sensor_config for sensor_config in sensor_configs
+                            if sensor_config["topic-qualifier"] == "exit"]
+
+            if len(entry_configs) == 0 or len(exit_configs) == 0:
+                continue
+
+            if sensors_per_car_park is not None:
+                entry_configs, exit_configs = self._virtual_sensor_configs(entry_configs, exit_configs,
+                                                                           sensors_per_car_park)
+
+            self._car_park_sensors[car_park_name] = (
+                [EntrySensor(sensor_config, connect=connect) for sensor_config in entry_configs],
+                [ExitSensor(sensor_config, connect=connect) for sensor_config in exit_configs])
+
+        if len(self._car_park_sensors) == 0:
+            raise ValueError("The configuration has no car park with both entry and exit sensors")
+
+        self._sensor_groups = list(self._car_park_sensors.values())  # Drawn from for every Event
+
+        self._trace_gaps: List[float] = self._load_trace_gaps(trace_path) if arrivals == self.TRACE else []
+
+    @property
+    def sensors(self) -> List[Sensor]:
+        """List of all the Virtual Sensors"""
+        return [sensor for entry_sensors, exit_sensors in self._car_park_sensors.values()
+                for sensor in entry_sensors + exit_sensors]
+
+    @property
+    def sensor_topics(self) -> Dict[str, List[str]]:
+        """Topics of the Virtual Sensors, for each Car Park Name"""
+        return {car_park_name: [sensor.topic_address for sensor in entry_sensors + exit_sensors]
+                for car_park_name, (entry_sensors, exit_sensors) in self._car_park_sensors.items()}
+
+    @staticmethod
+    def _virtual_sensor_configs(entry_configs: List[dict], exit_configs: List[dict],
+                                count: int) -> Tuple[List[dict], List[dict]]:
+        """Clone 'count' Sensor Configurations, alternately entry and exit, with synthetic names"""
+        virtual_entry_configs, virtual_exit_configs = [], []
+
+        for index in range(count):
+            configs, virtual_configs = (entry_configs, virtual_entry_configs) if index % 2 == 0 else \
+                (exit_configs, virtual_exit_configs)
+            sensor_config = configs[(index // 2) % len(configs)]
+            virtual_configs.append(sensor_config | {"name": f"{sensor_config['name']}-v{index}"})
+
+        return virtual_entry_configs, virtual_exit_configs
+
+    def _load_trace_gaps(self, trace_path: str) -> List[float]:
+        """Load the inter-arrival times of a trace, rescaled so that their mean matches the target rate"""
+        timestamps = [timestamp for _, _, timestamp in FileDetector.read_lines_from(trace_path)
+                      if timestamp is not None]
+
+        gaps = [max(0.0, t1 - t0) for t0, t1 in zip(timestamps, timestamps[1:])]
+
+        if len(gaps) == 0 or sum(gaps) == 0:
+            raise ValueError("The trace needs at least two distinct timestamps")
+
+        if self._rate is not None:
+            scale = (len(gaps) / sum(gaps)) / self._rate
+            gaps = [gap * scale for gap in gaps]
+
+        return gaps
+
+    def _next_gap(self, index: int) -> float:
+        """Returns the time (in seconds) until the next event"""
+        if self._arrivals == self.POISSON:
+            return self._random.expovariate(self._rate)
+        return self._trace_gaps[index % len(self._trace_gaps)]
+
+    @staticmethod
+    def get_queue_depth(sensor: Sensor) -> int:
+        """Number of Messages queued in the paho Client of a Sensor, not yet sent (or acknowledged, for QoS > 0)"""
+        # paho has no public accessor for its outgoing queues
+        return len(sensor.client._out_packet) + len(sensor.client._out_messages)
+
+    def _publish_random_event(self) -> Tuple[Sensor, int]:
+        """Publish a random Entry/Exit Event to a random Car Park. Returns the Sensor, with its paho result code."""
+        entry_sensors, exit_sensors = self._random.choice(self._sensor_groups)
+        temperature = self._random.uniform(self._lower_bound, self._upper_bound)
+
+        if self._random.random() < self._enter_prb:
+            sensor, signal = self._random.choice(entry_sensors), "Enter"
+        else:
+            sensor, signal = self._random.choice(exit_sensors), "Exit"
+
+        return sensor, sensor.on_detection(f"{signal},{temperature}")
+
+    def run(self, duration: float | None = 10.0, max_events: int | None = None) -> dict:
+        """Generate Events until 'duration' seconds passed or 'max_events' were published. Returns the Report."""
+        if duration is None and max_events is None:
+            raise ValueError("Give a duration or max_events")
+
+        if self._connect:
+            for sensor in self.sensors:
+                sensor.client.loop_start()
+
+        num_events, num_errors, num_late, max_lag, max_queue_depth = 0, 0, 0, 0.0, 0
+
+        start = time.monotonic()
+        next_time = start
+
+        try:
+            while (max_events is None or num_events < max_events) and \
+                    (duration is None or next_time - start < duration):
+                now = time.monotonic()
+
+                if next_time > now:
+                    time.sleep(next_time - now)
+                else:  # Behind schedule, i.e. the generator itself cannot keep up with the rate
+                    lag = now - next_time
+                    max_lag = max(max_lag, lag)
+                    num_late += lag > self.LATE_THRESHOLD
+
+                sensor, rc = self._publish_random_event()
+                if rc != paho.MQTT_ERR_SUCCESS:
+                    num_errors += 1
+                max_queue_depth = max(max_queue_depth, self.get_queue_depth(sensor))
+
+                num_events += 1
+                next_time += self._next_gap(num_events)
+        except KeyboardInterrupt:
+            self.logger.info("KeyboardInterrupt - Stop Generating")
+
+        elapsed = time.monotonic() - start
+        final_queue_depth = sum(self.get_queue_depth(sensor) for sensor in self.sensors)
+
+        if self._connect:
+            for sensor in self.sensors:
+                sensor.client.loop_stop()
+
+        report = {"Target Rate": self._rate,
+                  "Achieved Rate": num_events / elapsed if elapsed > 0 else 0.0,
+                  "Events": num_events,
+                  "Publish Errors": num_errors,
+                  "Late Events": num_late,
+                  "Max Lag (s)": max_lag,
+                  "Max Queue Depth": max_queue_depth,
+                  "Final Queue Depth": final_queue_depth,
+                  "Elapsed (s)": elapsed
+                  }
+
+        self.logger.info(f"Load Report - {report}")
+        return report
+
+    def start_sensing(self, duration: float | None = 10.0, max_events: int | None = None):
+        report = self.run(duration, max_events)
+
+        for k, v in report.items():
+            print(f"{k}: {v}")
+
+
+if __name__ == "__main__":
+    from smartpark.project_paths import CONFIG_DIR
+
+    parser = argparse.ArgumentParser(description="Synthetic Load Generator for Car Parks")
+    parser.add_argument("--config", default=str(CONFIG_DIR / 'sample_smartpark_config.toml'))
+    parser.add_argument("--rate", type=float, default=1000.0, help="Target aggregate events/sec")
+    parser.add_argument("--arrivals", choices=[LoadGenerator.POISSON, LoadGenerator.TRACE],
+                        default=LoadGenerator.POISSON)
+    parser.add_argument("--trace", default=None, help="Trace file for trace-driven arrivals")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--sensors-per-car-park", type=int, default=None,
+                        help="Number of Virtual Sensors per Car Park (default: the Sensors of the config)")
+    args = parser.parse_args()
+
+    load_generator = LoadGenerator(Config(args.config), rate=args.rate, arrivals=args.arrivals,
+                                   trace_path=args.trace, sensors_per_car_park=args.sensors_per_car_park)
+    load_generator.start_sensing(duration=args.duration)
@@ -1,6 +1,7 @@
 from functools import wraps
 from logging.handlers import RotatingFileHandler
 import logging
+import os
 
 from smartpark.project_paths import LOG_DIR
 from smartpark.utils import create_path_if_not_exists
@@ -8,20 +9,30 @@ from smartpark.utils import create_path_if_not_exists
 
 def get_logger(log_filepath, logger_name,
                logging_level=logging.DEBUG, max_bytes=1048576, *args, **kwargs):
-    """Returns a Logger. Uses RotatingFileHandler."""
+    """Returns a Logger. Uses RotatingFileHandler.
+
+    The handler is only added once per log file, so that creating many instances does not duplicate handlers (and
+    log lines), nor leak open files.
+    """
     # Example: get_logger("car_park.txt", "car_park_logger", logging_level=logging.DEBUG)
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(logging_level)
+
+    log_filepath = os.path.abspath(log_filepath)
+    for handler in logger.handlers:
+        if isinstance(handler, RotatingFileHandler) and handler.baseFilename == log_filepath:
+            return logger
+
     handler = RotatingFileHandler(log_filepath, maxBytes=max_bytes, *args, **kwargs)
     formatter = logging.Formatter('[%(asctime)s] [%(levelname)s] | %(message)s')
     handler.setFormatter(formatter)
 
-    logger = logging.getLogger(logger_name)
     logger.addHandler(handler)
-    logger.setLevel(logging_level)
     return logger
 
 
 def class_logger(log_filepath: str, logger_name: str, *logger_args, **logger_kwargs):
-    """Decorator for MqttDevice subclasses to attach a logger."""
+    """Decorator for MqttDevice subclasses to attach a logger, in place of a default logger of the class if any."""
     def inner(cls):
         @wraps(cls)
         def wrapper(*args, **kwargs):
@@ -31,7 +42,7 @@ def class_logger(log_filepath: str, logger_name: str, *logger_args, **logger_kwa
             instance = cls(*args, **kwargs)
             logger = get_logger(log_filepath, logger_name, *logger_args, **logger_kwargs)
 
-            if not hasattr(instance, "logger"):
+            if "logger" not in vars(instance):
                 setattr(instance, "logger", logger)
             return instance
         return wrapper
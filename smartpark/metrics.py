@@ -0,0 +1,249 @@
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Sequence, Tuple
+from bisect import bisect_left
+import threading
+import weakref
+
+from smartpark.tracing import TRACER, Tracer
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+class _ShardedValue:
+    """Value split in one Cell per Thread, so that the hot path never takes a lock.
+
+    Each thread only writes its own cell. The lock is only taken once per thread (to create its cell) and when
+    reading, which sums all the cells.
+    """
+    def __init__(self, size: int = 1):
+        self._size = size
+        self._local = threading.local()
+        self._cells: List[list] = []
+        self._lock = threading.Lock()
+
+    def cell(self) -> list:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0] * self._size
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+            return cell
+
+    def values(self) -> list:
+        with self._lock:
+            cells = list(self._cells)
+        return [sum(cell[i] for cell in cells) for i in range(self._size)]
+
+
+class Counter:
+    """Monotonically increasing Counter"""
+    def __init__(self):
+        self._value = _ShardedValue()
+
+    def inc(self, amount: float = 1):
+        self._value.cell()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._value.values()[0]
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f"{name}{labels} {self.value}"]
+
+
+class Gauge:
+    """Gauge, either set directly or computed by a function when scraped"""
+    def __init__(self):
+        self._value: float = 0
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function: Callable[..., float], owner: Any = None):
+        """Compute the Value when scraped, e.g. for values that are expensive to maintain on the hot path.
+
+        With an 'owner' (e.g. a Car Park), the function is called with it, and only holds it weakly: the registry does
+        not keep the owner alive, and the value is 0 once it is gone.
+        """
+        if owner is None:
+            self._function = function
+            return
+
+        owner_ref = weakref.ref(owner)
+
+        def weak_function() -> float:
+            current_owner = owner_ref()
+            return 0 if current_owner is None else function(current_owner)
+
+        self._function = weak_function
+
+    @property
+    def value(self) -> float:
+        return self._value if self._function is None else self._function()
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f"{name}{labels} {self.value}"]
+
+
+class Histogram:
+    """Histogram with fixed Buckets (upper bounds in seconds), exposed as cumulative Prometheus Buckets"""
+
+    DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                       5.0, 10.0)
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self._buckets = tuple(sorted(buckets))
+        # Cells: [count of each bucket..., count of +Inf bucket, sum]
+        self._values = _ShardedValue(len(self._buckets) + 2)
+
+    def observe(self, value: float):
+        cell = self._values.cell()
+        cell[bisect_left(self._buckets, value)] += 1
+        cell[-1] += value
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        values = self._values.values()
+        counts, total_sum = values[:-1], values[-1]
+
+        out_samples = []
+        cumulative = 0
+        for bound, count in zip(list(self._buckets) + ["+Inf"], counts):
+            cumulative += count
+            bucket_labels = labels[:-1] + f',le="{bound}"}}' if labels else f'{{le="{bound}"}}'
+            out_samples.append(f"{name}_bucket{bucket_labels} {cumulative}")
+
+        out_samples.append(f"{name}_sum{labels} {total_sum}")
+        out_samples.append(f"{name}_count{labels} {cumulative}")
+        return out_samples
+
+
+class MetricFamily:
+    """A named Metric with optional Labels. Each combination of Label Values is a separate child Metric."""
+    def __init__(self, name: str, documentation: str, metric_type: str, factory: Callable, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], Counter | Gauge | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *labelvalues):
+        """Get or Create the child Metric of the given Label Values"""
+        key = tuple(str(value) for value in labelvalues)
+        child = self._children.get(key, None)
+
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+
+        return child
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+        for key, child in list(self._children.items()):
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key))
+            lines.extend(child.samples(self.name, f"{{{labels}}}" if labels else ""))
+
+        return lines
+
+
+def _escape(label_value: str) -> str:
+    return label_value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """Registry of Metrics, exposed in the Prometheus Text Format"""
+    def __init__(self, tracer: Tracer | None = None):
+        self._families: Dict[str, MetricFamily] = {}
+        self._lock = threading.Lock()
+        self._tracer = tracer
+
+    def _register(self, name, documentation, metric_type, factory, labelnames) -> MetricFamily:
+        with self._lock:
+            family = self._families.get(name, None)
+            if family is None:
+                family = MetricFamily(name, documentation, metric_type, factory, labelnames)
+                self._families[name] = family
+            elif family.metric_type != metric_type or family.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric '{name}' is already registered differently")
+            return family
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._register(name, documentation, "counter", Counter, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._register(name, documentation, "gauge", Gauge, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS) -> MetricFamily:
+        return self._register(name, documentation, "histogram", lambda: Histogram(buckets), labelnames)
+
+    def _expose_tracer(self) -> List[str]:
+        """Expose the Latency Histograms of the Tracer as Prometheus Summaries"""
+        snapshot = self._tracer.snapshot()
+        if len(snapshot) == 0:
+            return []
+
+        name = "smartpark_trace_latency_seconds"
+        lines = [f"# HELP {name} Traced latency of each stage from sensor to display", f"# TYPE {name} summary"]
+        for stage, summary in snapshot.items():
+            for quantile, key in [("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99")]:
+                lines.append(f'{name}{{stage="{stage}",quantile="{quantile}"}} {summary[key]}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {summary["mean"] * summary["count"]}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {summary["count"]}')
+        return lines
+
+    def expose(self) -> str:
+        """Returns all the Metrics in the Prometheus Text Format"""
+        lines = []
+        for family in list(self._families.values()):
+            lines.extend(family.expose())
+
+        if self._tracer is not None:
+            lines.extend(self._expose_tracer())
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry(TRACER)  # Registry of the current process
+
+_METRICS_SERVERS: Dict[int, "ThreadingHTTPServer"] = {}
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY) \
+        -> "ThreadingHTTPServer":
+    """Serve the Metrics on http://<host>:<port>/metrics from a daemon thread. Only one server is started per port."""
+    if port in _METRICS_SERVERS:
+        return _METRICS_SERVERS[port]
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Only imported when metrics are served
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ["/", "/metrics"]:
+                self.send_error(404)
+                return
+
+            body = registry.expose().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes are not logged
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    if port != 0:  # Port 0 binds any free port, see server.server_address
+        _METRICS_SERVERS[port] = server
+    return server
@@ -12,7 +12,7 @@ class MqttDevice:
         - host: str
         - port: int
     """
-    def __init__(self, config: dict, keepalive: int = 65535, *args, **kwargs):
+    def __init__(self, config: dict, keepalive: int = 65535, *args, connect: bool = True, **kwargs):
         self.topic_root = config["topic-root"]
         self.location = config["location"]
         self.name = config["name"]
@@ -21,7 +21,10 @@ class MqttDevice:
         self.port = config["port"]
 
         self.client: paho.Client = paho.Client(*args, **kwargs)
-        self.client.connect(self.host, self.port, keepalive=keepalive)
+
+        # connect=False creates an offline device, e.g. for benchmarks and simulations. Publishing is then a no-op.
+        if connect:
+            self.client.connect(self.host, self.port, keepalive=keepalive)
 
     @property
     def topic_address(self) -> str:
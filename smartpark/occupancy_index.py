@@ -0,0 +1,228 @@
+from typing import Dict, Iterable, Tuple
+from datetime import datetime
+import random
+import threading
+
+from smartpark.car import Car, datetime_to_timestamp
+
+
+class _Node:
+    """Node of the Treap: the change of occupancy at one time, with the aggregates of its subtree"""
+
+    __slots__ = ("time", "delta", "priority", "left", "right", "total", "max_prefix")
+
+    def __init__(self, time: int, delta: int, priority: float):
+        self.time = time
+        self.delta = delta
+        self.priority = priority
+        self.left: _Node | None = None
+        self.right: _Node | None = None
+        self.total = delta  # Sum of the deltas of the subtree
+        self.max_prefix = max(0, delta)  # Max sum of the deltas of a prefix of the subtree (the empty one included)
+
+    def update(self):
+        self.total, self.max_prefix = _combine(_totals(self.left), self.delta, _totals(self.right))
+
+
+def _split(node: _Node | None, time: int) -> Tuple[_Node | None, _Node | None]:
+    """Split a Treap in (times <= time, times > time)"""
+    if node is None:
+        return None, None
+
+    if node.time <= time:
+        node.right, right = _split(node.right, time)
+        node.update()
+        return node, right
+
+    left, node.left = _split(node.left, time)
+    node.update()
+    return left, node
+
+
+def _totals(node: _Node | None) -> Tuple[int, int]:
+    return (node.total, node.max_prefix) if node is not None else (0, 0)
+
+
+def _combine(left: Tuple[int, int], delta: int, right: Tuple[int, int]) -> Tuple[int, int]:
+    """(total, max prefix) of the changes of 'left', then 'delta', then 'right'"""
+    return left[0] + delta + right[0], max(left[1], left[0] + delta + right[1])
+
+
+def _aggregate_after(node: _Node | None, start: int) -> Tuple[int, int]:
+    """(total, max prefix) of the changes at times > start"""
+    if node is None:
+        return 0, 0
+    if node.time <= start:
+        return _aggregate_after(node.right, start)
+    return _combine(_aggregate_after(node.left, start), node.delta, _totals(node.right))
+
+
+def _aggregate_until(node: _Node | None, end: int) -> Tuple[int, int]:
+    """(total, max prefix) of the changes at times <= end"""
+    if node is None:
+        return 0, 0
+    if node.time > end:
+        return _aggregate_until(node.left, end)
+    return _combine(_totals(node.left), node.delta, _aggregate_until(node.right, end))
+
+
+def _aggregate_between(node: _Node | None, start: int, end: int) -> Tuple[int, int]:
+    """(total, max prefix) of the changes at times in (start, end]"""
+    while node is not None and (node.time <= start or node.time > end):
+        node = node.right if node.time <= start else node.left
+
+    if node is None:
+        return 0, 0
+    return _combine(_aggregate_after(node.left, start), node.delta, _aggregate_until(node.right, end))
+
+
+class OccupancyIndex:
+    """Interval Index over the Stays of Cars, for point-in-time Occupancy Queries.
+
+    Each Stay [entry, exit) adds +1 at its entry time and -1 at its exit time; a Car still inside has no exit yet.
+    The changes are kept in a Treap ordered by time (one node per distinct second), where each node aggregates the
+    sum and the max prefix sum of its subtree. Then, in O(log n) expected:
+        - Occupancy at T: sum of the changes up to T
+        - Peak Occupancy in [a, b]: occupancy at a + max prefix sum of the changes in (a, b]
+        - Updates: add one change, or merge it into the node of its time
+
+    Times are whole seconds, like Car.entry_timestamp. Register the index as a Car Listener of a Car Park to keep it
+    up to date, and build it from a Visit Store to include the history.
+    """
+    def __init__(self, seed: int | None = None):
+        self._root: _Node | None = None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()  # Updates come from the event handling thread, queries from any thread
+
+    def __len__(self) -> int:
+        """Number of distinct times with a change of occupancy"""
+        count, stack = 0, [self._root]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node is not None:
+                count += 1
+                stack.extend([node.left, node.right])
+        return count
+
+    @classmethod
+    def build(cls, cars: Iterable[Car], seed: int | None = None):
+        """Bulk Build from the Stays of Cars (e.g. VisitStore.iter_visits()) in O(n log n)"""
+        deltas: Dict[int, int] = {}
+        for car in cars:
+            deltas[car.entry_timestamp] = deltas.get(car.entry_timestamp, 0) + 1
+            if car.exit_timestamp is not None:
+                deltas[car.exit_timestamp] = deltas.get(car.exit_timestamp, 0) - 1
+
+        index = cls(seed)
+        index._root = index._build_sorted(sorted(deltas.items()))
+        return index
+
+    def _build_sorted(self, sorted_deltas) -> _Node | None:
+        """Build a Treap from (time, delta) sorted by time in O(n), with the right spine as a stack"""
+        spine = []
+        for time, delta in sorted_deltas:
+            node = _Node(time, delta, self._random.random())
+
+            last = None
+            while len(spine) > 0 and spine[-1].priority < node.priority:
+                last = spine.pop()
+                last.update()
+            node.left = last
+
+            if len(spine) > 0:
+                spine[-1].right = node
+            spine.append(node)
+
+        for node in reversed(spine):
+            node.update()
+
+        return spine[0] if len(spine) > 0 else None
+
+    def add_change(self, time: int, delta: int):
+        """Add a Change of Occupancy at a Time (seconds)"""
+        with self._lock:
+            self._add_change(time, delta)
+
+    def compact(self, time: int):
+        """Merge the Changes up to a Time (seconds) into one at that Time, once the times before it are not queried
+        anymore. The occupancy from then on is unchanged, and the whole past is one node."""
+        with self._lock:
+            past, self._root = _split(self._root, time)
+            total = _totals(past)[0]
+            if total != 0:
+                self._add_change(time, total)
+
+    def _add_change(self, time: int, delta: int):
+        path = []  # Nodes whose aggregates change, from the root
+        node = self._root
+        while node is not None and node.time != time:
+            path.append(node)
+            node = node.right if node.time < time else node.left
+
+        if node is not None:  # Merge into the node of the time
+            node.delta += delta
+            path.append(node)
+        else:  # Insert where the priority of the new node fits, splitting the subtree below it
+            new_node = _Node(time, delta, self._random.random())
+
+            path = []
+            node = self._root
+            while node is not None and node.priority > new_node.priority:
+                path.append(node)
+                node = node.right if node.time < time else node.left
+
+            new_node.left, new_node.right = _split(node, time)
+
+            if len(path) == 0:
+                self._root = new_node
+            elif path[-1].time < time:
+                path[-1].right = new_node
+            else:
+                path[-1].left = new_node
+            path.append(new_node)
+
+        for node in reversed(path):
+            node.update()
+
+    def add_stay(self, entry_time: int, exit_time: int | None = None):
+        self.add_change(entry_time, 1)
+        if exit_time is not None:
+            self.add_change(exit_time, -1)
+
+    def on_car_added(self, car: Car):
+        """Car Listener of a Car Park, see CarPark.register_car_listener()"""
+        self.add_change(car.entry_timestamp, 1)
+
+    def on_car_removed(self, car: Car):
+        self.add_change(car.exit_timestamp, -1)
+
+    def occupancy_at_timestamp(self, time: int) -> int:
+        """Occupancy at a Time in seconds (see Car.entry_timestamp)"""
+        with self._lock:
+            return self._occupancy_at(time)
+
+    def peak_occupancy_timestamps(self, start: int, end: int) -> int:
+        """Peak Occupancy in [start, end], in seconds (see Car.entry_timestamp)"""
+        if end < start:
+            raise ValueError("end must not be before start")
+
+        with self._lock:
+            return self._occupancy_at(start) + _aggregate_between(self._root, start, end)[1]
+
+    def _occupancy_at(self, time: int) -> int:
+        occupancy, node = 0, self._root
+        while node is not None:
+            if node.time <= time:
+                occupancy += (node.left.total if node.left is not None else 0) + node.delta
+                node = node.right
+            else:
+                node = node.left
+        return occupancy
+
+    def occupancy_at(self, time: datetime) -> int:
+        """Number of Cars in the Car Park at a Time"""
+        return self.occupancy_at_timestamp(datetime_to_timestamp(time))
+
+    def peak_occupancy(self, start: datetime, end: datetime) -> int:
+        """Max Number of Cars in the Car Park at any Time of [start, end]"""
+        return self.peak_occupancy_timestamps(datetime_to_timestamp(start), datetime_to_timestamp(end))
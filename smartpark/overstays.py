@@ -0,0 +1,57 @@
+from typing import Dict, List
+
+from smartpark.car import Car
+from smartpark.timing_wheel import TimingWheel
+
+
+def create_overstays_topic(display_topic: str) -> str:
+    """Create the Topic of the Overstay Events, published by the Car Park next to its Display Messages"""
+    return f"{display_topic}/overstays"
+
+
+def encode_overstay(car: Car) -> str:
+    """Encode an Overstay Event.
+
+    Format of Message String: "<license-plate>;<entry-time>"
+    """
+    return f"{car.license_plate};{car.entry_time.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class OverstayMonitor:
+    """Detection of Cars staying longer than 'max_stay' seconds in the Car Park.
+
+    Register with CarPark.register_car_listener(): the deadline of each car is scheduled in a TimingWheel when it
+    enters and cancelled when it exits, so that check() only pops the cars whose deadline passed, instead of scanning
+    every car. Each car is reported once.
+    """
+    def __init__(self, max_stay: int, tick: float = 1.0, num_slots: int = TimingWheel.DEFAULT_NUM_SLOTS):
+        if max_stay <= 0:
+            raise ValueError("max_stay must be positive")
+
+        self._max_stay = max_stay
+        self._wheel: TimingWheel | None = None  # Created on the first car, starting at its entry time
+        self._tick = tick
+        self._num_slots = num_slots
+        self._cars: Dict[str, Car] = {}  # License Plate -> Car with a Deadline
+
+    def __len__(self) -> int:
+        """Number of Cars with a Deadline"""
+        return len(self._cars)
+
+    def on_car_added(self, car: Car):
+        if self._wheel is None:
+            self._wheel = TimingWheel(self._tick, self._num_slots, start=car.entry_timestamp)
+
+        self._wheel.schedule(car.license_plate, car.entry_timestamp + self._max_stay)
+        self._cars[car.license_plate] = car
+
+    def on_car_removed(self, car: Car):
+        if self._cars.pop(car.license_plate, None) is not None:
+            self._wheel.cancel(car.license_plate)
+
+    def check(self, timestamp: int) -> List[Car]:
+        """Returns the Cars whose Maximum Stay passed at 'timestamp' (see Car.entry_timestamp), not reported yet"""
+        if self._wheel is None:
+            return []
+
+        return [self._cars.pop(license_plate) for license_plate in self._wheel.advance(timestamp)]
@@ -0,0 +1,161 @@
+from typing import Dict, List
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+import cProfile
+import random
+import signal
+import sys
+import threading
+import time
+
+from smartpark.tracing import Tracer
+from smartpark.utils import create_path_if_not_exists
+from smartpark.project_paths import LOG_DIR
+
+
+class Profiler:
+    """Profiling Hooks that can be switched on and off at runtime.
+
+    When enabled:
+        - Spans: the duration of each decorated stage is recorded in a Latency Histogram
+        - cProfile: a sample ('sample_rate') of the root stage calls is captured with cProfile
+        - Stacks: a background thread samples the stacks of all the threads every 'stack_interval' seconds
+
+    On stop(), the captures are written under LOG_DIR/profiling as .pstats, .collapsed (flame graph input) and
+    .spans.json files. When disabled, a decorated stage only costs one attribute check.
+    """
+    def __init__(self):
+        self.enabled = False
+
+        self._spans = Tracer()
+        self._sample_rate = 0.0
+        self._profile: cProfile.Profile | None = None
+        self._capture_lock = threading.Lock()  # Only one cProfile capture at a time
+
+        self._stack_interval = 0.005
+        self._stacks: Counter = Counter()
+        self._sampler_thread: threading.Thread | None = None
+
+        self._lock = threading.Lock()
+
+    def start(self, sample_rate: float = 0.1, stack_interval: float | None = 0.005):
+        """Start Profiling. 'stack_interval=None' disables the Stack Sampler."""
+        with self._lock:
+            if self.enabled:
+                return
+
+            self._spans = Tracer()
+            self._sample_rate = sample_rate
+            self._profile = cProfile.Profile()
+            self._stacks = Counter()
+
+            self.enabled = True
+
+            if stack_interval is not None:
+                self._stack_interval = stack_interval
+                self._sampler_thread = threading.Thread(target=self._sample_stacks, daemon=True)
+                self._sampler_thread.start()
+
+    def stop(self, name: str = "smartpark") -> List[str]:
+        """Stop Profiling and Write the Captures. Returns the paths of the written files."""
+        with self._lock:
+            if not self.enabled:
+                return []
+
+            self.enabled = False
+
+            if self._sampler_thread is not None:
+                self._sampler_thread.join()
+                self._sampler_thread = None
+
+            return self._write(name)
+
+    def toggle(self, name: str = "smartpark", **start_kwargs) -> List[str]:
+        if self.enabled:
+            return self.stop(name)
+        self.start(**start_kwargs)
+        return []
+
+    def span(self, stage: str, capture: bool = False):
+        """Decorator recording the duration of a Stage. Root Stages (capture=True) are sampled with cProfile."""
+        def inner(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+
+                profile = None
+                if capture and random.random() < self._sample_rate and self._capture_lock.acquire(blocking=False):
+                    profile = self._profile
+
+                start = time.perf_counter()
+                if profile is not None:
+                    profile.enable()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    if profile is not None:
+                        profile.disable()
+                        self._capture_lock.release()
+                    self._spans.record(stage, time.perf_counter() - start)
+            return wrapper
+        return inner
+
+    def _sample_stacks(self):
+        """Sample the Stacks of all the other Threads, in the collapsed format 'outer;...;inner'"""
+        own_thread_id = threading.get_ident()
+
+        while self.enabled:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_filename.split('/')[-1]}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+
+                self._stacks[";".join(reversed(stack))] += 1
+
+            time.sleep(self._stack_interval)
+
+    def _write(self, name: str) -> List[str]:
+        file_prefix = LOG_DIR / 'profiling' / f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        paths = []
+
+        spans_path = f"{file_prefix}.spans.json"
+        self._spans.dump(spans_path)
+        paths.append(spans_path)
+
+        if self._profile is not None and self._profile.getstats():
+            pstats_path = f"{file_prefix}.pstats"
+            create_path_if_not_exists(pstats_path)
+            self._profile.dump_stats(pstats_path)
+            paths.append(pstats_path)
+
+        if len(self._stacks) > 0:
+            collapsed_path = f"{file_prefix}.collapsed"
+            create_path_if_not_exists(collapsed_path)
+            with open(collapsed_path, "w") as file:
+                for stack, count in self._stacks.most_common():
+                    file.write(f"{stack} {count}\n")
+            paths.append(collapsed_path)
+
+        return paths
+
+    def spans(self) -> Dict[str, dict]:
+        """Returns the Summary of every Span recorded since start()"""
+        return self._spans.snapshot()
+
+    def install_signal_handler(self, name: str = "smartpark", signal_number: int | None = None):
+        """Toggle Profiling on a Signal (SIGUSR1 by default). Must be called from the main thread."""
+        if signal_number is None:
+            if not hasattr(signal, "SIGUSR1"):  # e.g. Windows
+                return
+            signal_number = signal.SIGUSR1
+
+        signal.signal(signal_number, lambda signum, frame: threading.Thread(target=self.toggle, args=(name,)).start())
+
+
+PROFILER = Profiler()  # Profiler of the current process
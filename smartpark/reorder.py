@@ -0,0 +1,83 @@
+from typing import Any, Callable, List
+from collections import deque
+import heapq
+import itertools
+import threading
+import time
+
+
+class ReorderBuffer:
+    """Reorder Buffer of Events by their Sensor Time, for sensors publishing over different network paths.
+
+    Events wait in a heap ordered by sensor time. An event is released, in sensor-time order, once the watermark
+    reaches it: either an event 'max_lateness' seconds (sensor time) newer has arrived, or it waited 'max_lateness'
+    seconds itself (on 'clock'), so a quiet sensor does not hold the others back.
+
+    The watermark is the sensor time of the last released event. An event older than the watermark arrives too late
+    to be reordered: push() rejects it, and the caller applies it at once and reports it.
+    """
+    def __init__(self, max_lateness: float, clock: Callable[[], float] = time.monotonic):
+        if max_lateness < 0:
+            raise ValueError("max_lateness must not be negative")
+
+        self._max_lateness = max_lateness
+        self._clock = clock
+        self._heap: list = []  # (sensor time, arrival order, event)
+        self._arrival_times: deque = deque()  # (arrival time on the clock, sensor time), oldest first
+        self._arrivals = itertools.count()
+        self._max_timestamp = float("-inf")
+        self._watermark = float("-inf")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def watermark(self) -> float:
+        """Sensor Time up to which Events were released"""
+        return self._watermark
+
+    def push(self, timestamp: float, event: Any) -> bool:
+        """Buffer an Event with its Sensor Time. Returns False when it is late (older than the watermark)."""
+        with self._lock:
+            if timestamp < self._watermark:
+                return False
+
+            heapq.heappush(self._heap, (timestamp, next(self._arrivals), event))
+            self._arrival_times.append((self._clock(), timestamp))
+            self._max_timestamp = max(self._max_timestamp, timestamp)
+            return True
+
+    def pop_ready(self) -> List[Any]:
+        """Release the Events reached by the Watermark, in sensor-time order"""
+        with self._lock:
+            release_until = self._max_timestamp - self._max_lateness
+
+            # Events that waited long enough are released, with every older event before them
+            now = self._clock()
+            while len(self._arrival_times) > 0 and now - self._arrival_times[0][0] >= self._max_lateness:
+                release_until = max(release_until, self._arrival_times.popleft()[1])
+
+            return self._pop_until(release_until)
+
+    def pop_all(self) -> List[Any]:
+        """Release every buffered Event, e.g. when stopping"""
+        with self._lock:
+            self._arrival_times.clear()
+            return self._pop_until(float("inf"))
+
+    def _pop_until(self, timestamp: float) -> List[Any]:
+        ready = []
+        while len(self._heap) > 0 and self._heap[0][0] <= timestamp:
+            event_timestamp, _, event = heapq.heappop(self._heap)
+            self._watermark = max(self._watermark, event_timestamp)
+            ready.append(event)
+        return ready
+
+    def next_deadline(self) -> float | None:
+        """Time (on the clock) when the oldest buffered Event has waited long enough, None when empty"""
+        with self._lock:
+            if len(self._heap) == 0:
+                return None
+            # Arrivals of released events may linger at the front: the deadline is then early, never late
+            return self._arrival_times[0][0] + self._max_lateness if len(self._arrival_times) > 0 else self._clock()
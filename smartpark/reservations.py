@@ -0,0 +1,175 @@
+from typing import Dict, List, Tuple
+from datetime import datetime
+import heapq
+import itertools
+import threading
+
+from smartpark.car import Car, datetime_to_timestamp, timestamp_to_datetime
+from smartpark.metrics import REGISTRY
+from smartpark.occupancy_index import OccupancyIndex
+
+
+BOOKINGS = REGISTRY.counter("smartpark_reservations_bookings_total", "Bay reservations booked")
+REJECTIONS = REGISTRY.counter("smartpark_reservations_rejections_total", "Bay reservations rejected, no bay left")
+CLAIMS = REGISTRY.counter("smartpark_reservations_claims_total", "Bay reservations claimed by the arriving car")
+LAPSES = REGISTRY.counter("smartpark_reservations_lapses_total", "Bay reservations ended without being claimed")
+
+
+class Reservation:
+    """A Bay held for a License Plate during [start, end), times in whole seconds (see Car.entry_timestamp)"""
+
+    __slots__ = ("reservation_id", "license_plate", "start_timestamp", "end_timestamp")
+
+    def __init__(self, reservation_id: int, license_plate: str, start_timestamp: int, end_timestamp: int):
+        self.reservation_id = reservation_id
+        self.license_plate = license_plate
+        self.start_timestamp = start_timestamp
+        self.end_timestamp = end_timestamp
+
+    @property
+    def start_time(self) -> datetime:
+        return timestamp_to_datetime(self.start_timestamp)
+
+    @property
+    def end_time(self) -> datetime:
+        return timestamp_to_datetime(self.end_timestamp)
+
+    def __repr__(self):
+        return f"Reservation({self.reservation_id}, {self.license_plate}, {self.start_time} - {self.end_time})"
+
+
+class ReservationBook:
+    """Bay Reservations of a Car Park, with Capacity Checks against the overlapping Reservations.
+
+    The reservations are a sweep line: +1 at every start and -1 at every end, kept in an OccupancyIndex. The bays
+    held at a time are the sum of the changes up to it, and the most bays held over a time range is its peak; both
+    are O(log n) expected, so booking stays fast with many future reservations.
+
+    A reservation is claimed by the first car of its license plate entering the car park while it is active: from
+    then on, the car takes the bay and the reservation stops holding it. Unclaimed reservations lapse at their end.
+
+    Ended reservations are forgotten by expire(), called with the current time on each arriving car (and on each
+    booking by the Car Park), together with their past in the index: the book only grows with the future bookings.
+    """
+    def __init__(self, total_bays: int, seed: int | None = None):
+        self._total_bays = total_bays
+        self._index = OccupancyIndex(seed)
+        self._reservations: Dict[int, Reservation] = {}
+        self._by_license_plate: Dict[str, List[Reservation]] = {}
+        self._ends: List[Tuple[int, int]] = []  # Heap of (end, reservation id) of every booking, to expire them
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()  # The capacity check and the booking are one step
+
+    def __len__(self) -> int:
+        """Number of booked Reservations, not claimed or cancelled"""
+        return len(self._reservations)
+
+    def get_reservation(self, reservation_id: int) -> Reservation | None:
+        return self._reservations.get(reservation_id, None)
+
+    def get_reservations_by_license_plate(self, license_plate: str) -> List[Reservation]:
+        return list(self._by_license_plate.get(license_plate, []))
+
+    def held_bays(self, time: datetime) -> int:
+        """Number of Bays held by Reservations at a Time"""
+        return self._index.occupancy_at_timestamp(datetime_to_timestamp(time))
+
+    def available_bays(self, start: datetime, end: datetime) -> int:
+        """Number of Bays that can still be reserved for the whole of [start, end)"""
+        start, end = self._to_range(start, end)
+        return max(0, self._total_bays - self._index.peak_occupancy_timestamps(start, end - 1))
+
+    def book(self, license_plate: str, start: datetime, end: datetime, reserved_bays: int = 0) -> Reservation | None:
+        """Reserve a Bay for [start, end). Returns None when no bay is left for the whole range.
+
+        'reserved_bays' are bays taken in the range besides the reservations, e.g. by the parked cars for a
+        reservation starting now.
+        """
+        start, end = self._to_range(start, end)
+
+        with self._lock:
+            if self._index.peak_occupancy_timestamps(start, end - 1) + reserved_bays >= self._total_bays:
+                REJECTIONS.labels().inc()
+                return None
+
+            reservation = Reservation(next(self._ids), license_plate, start, end)
+            self._add(reservation)
+            BOOKINGS.labels().inc()
+            return reservation
+
+    def cancel(self, reservation_id: int) -> bool:
+        """Cancel a Reservation. Returns False when it is not booked (e.g. already claimed)."""
+        with self._lock:
+            reservation = self._reservations.get(reservation_id, None)
+            if reservation is None:
+                return False
+
+            self._remove(reservation)
+            self._index.add_change(reservation.start_timestamp, -1)
+            self._index.add_change(reservation.end_timestamp, 1)
+            return True
+
+    def expire(self, time: int) -> int:
+        """Forget the Reservations ended at a Time (seconds), claimed or not. Returns the number that lapsed unclaimed.
+
+        The times before the last end are not queried afterwards (see OccupancyIndex.compact).
+        """
+        if len(self._ends) == 0 or self._ends[0][0] > time:  # Nothing ended, without the lock
+            return 0
+
+        with self._lock:
+            lapsed, last_end = 0, None
+            while len(self._ends) > 0 and self._ends[0][0] <= time:
+                last_end, reservation_id = heapq.heappop(self._ends)
+                reservation = self._reservations.get(reservation_id, None)
+                if reservation is not None:
+                    self._remove(reservation)
+                    lapsed += 1
+
+            if last_end is not None:
+                self._index.compact(last_end)
+            if lapsed > 0:
+                LAPSES.labels().inc(lapsed)
+            return lapsed
+
+    def claim(self, license_plate: str, time: int) -> Reservation | None:
+        """Claim the Reservation of a License Plate active at a Time (seconds), if any: it stops holding its bay"""
+        with self._lock:
+            for reservation in self._by_license_plate.get(license_plate, []):
+                if reservation.start_timestamp <= time < reservation.end_timestamp:
+                    self._remove(reservation)
+                    self._index.add_change(time, -1)  # Ends the reservation now, the car holds the bay
+                    self._index.add_change(reservation.end_timestamp, 1)
+                    CLAIMS.labels().inc()
+                    return reservation
+            return None
+
+    def on_car_added(self, car: Car):
+        """Car Listener of a Car Park, see CarPark.register_car_listener()"""
+        self.expire(car.entry_timestamp)
+        self.claim(car.license_plate, car.entry_timestamp)
+
+    def on_car_removed(self, car: Car):
+        pass
+
+    @staticmethod
+    def _to_range(start: datetime, end: datetime):
+        start, end = datetime_to_timestamp(start), datetime_to_timestamp(end)
+        if end <= start:
+            raise ValueError("end must be after start")
+        return start, end
+
+    def _add(self, reservation: Reservation):
+        self._reservations[reservation.reservation_id] = reservation
+        self._by_license_plate.setdefault(reservation.license_plate, []).append(reservation)
+        heapq.heappush(self._ends, (reservation.end_timestamp, reservation.reservation_id))
+        self._index.add_change(reservation.start_timestamp, 1)
+        self._index.add_change(reservation.end_timestamp, -1)
+
+    def _remove(self, reservation: Reservation):
+        del self._reservations[reservation.reservation_id]
+
+        reservations = self._by_license_plate[reservation.license_plate]
+        reservations.remove(reservation)
+        if len(reservations) == 0:
+            del self._by_license_plate[reservation.license_plate]
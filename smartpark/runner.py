@@ -0,0 +1,248 @@
+"""In-process Role Runner: runs any mix of Sensor, Car Park and Display Roles as threads of a single interpreter.
+
+Tk needs the main thread: the first GUI Role runs there, any other GUI Role in its own process.
+
+Usage:
+    python -m smartpark.runner [--config <path>] [--car-park <name>] [<role>[:<type>[:<name>]] ...]
+
+Examples:
+    python -m smartpark.runner sensor:tk carpark display:tk
+    python -m smartpark.runner sensor:random carpark display:console display:console:display2
+    python -m smartpark.runner --file tests/sample_signals.txt sensor:file carpark display:console
+
+Device Types are only imported when a Role uses them, e.g. tkinter is not loaded by headless Roles.
+"""
+from typing import Dict, List
+from collections.abc import Iterator
+import argparse
+import importlib
+import multiprocessing
+import threading
+import time
+
+from smartpark.config import Config
+from smartpark.project_paths import CONFIG_DIR
+
+
+SENSOR = "sensor"
+CAR_PARK = "carpark"
+DISPLAY = "display"
+
+# Device Types of each Role as "<module>:<class>", imported on first use
+ROLE_TYPES: Dict[str, Dict[str, str]] = {
+    SENSOR: {"tk": "smartpark.sensor:TkDetector",
+             "cli": "smartpark.sensor:CLIDetector",
+             "random": "smartpark.sensor:RandomDetector",
+             "file": "smartpark.sensor:FileDetector"
+             },
+    CAR_PARK: {"simulated": "smartpark.carpark:SimulatedCarPark"},
+    DISPLAY: {"tk": "smartpark.display:TkGUIDisplay",
+              "console": "smartpark.display:ConsoleDisplay"
+              }
+}
+DEFAULT_TYPES = {SENSOR: "random", CAR_PARK: "simulated", DISPLAY: "console"}
+GUI_TYPES = ["tk"]
+
+START_METHODS = {SENSOR: "start_sensing", CAR_PARK: "start_serving", DISPLAY: "start_listening"}
+
+
+def import_type(type_path: str):
+    """Import a Class given as "<module>:<class>" """
+    module_name, _, class_name = type_path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class Role:
+    """A Sensor, Car Park or Display to run in the Role Runner.
+
+    Format of a Role Spec: "<role>[:<type>[:<name>]]", e.g. "sensor:random", "carpark", "display:tk:display2"
+        - role: "sensor", "carpark" or "display"
+        - type: Device Type of the Role (see ROLE_TYPES), e.g. "tk" or "console" for a Display
+        - name: Display Name, or "<entry-sensor-name>,<exit-sensor-name>" for a Sensor. Defaults to the first
+          Display, or the first entry and exit Sensors of the Car Park.
+    """
+    def __init__(self, role: str, device_type: str | None = None, name: str | None = None, **kwargs):
+        if role not in ROLE_TYPES:
+            raise ValueError(f"Unknown role '{role}', expected one of {list(ROLE_TYPES.keys())}")
+
+        device_type = DEFAULT_TYPES[role] if device_type is None else device_type
+        if device_type not in ROLE_TYPES[role]:
+            raise ValueError(f"Unknown {role} type '{device_type}', expected one of {list(ROLE_TYPES[role].keys())}")
+
+        self.role = role
+        self.device_type = device_type
+        self.name = name
+        self.kwargs = kwargs  # Extra arguments of the Device constructor, e.g. the file path of a FileDetector
+
+    @classmethod
+    def from_spec(cls, spec: str, **kwargs):
+        """Construct Role from a Role Spec"""
+        spec_split = spec.split(":", 2)
+        return cls(*[item if item != "" else None for item in spec_split], **kwargs)
+
+    @property
+    def is_gui(self) -> bool:
+        return self.device_type in GUI_TYPES
+
+    def __str__(self):
+        return ":".join([self.role, self.device_type] + ([self.name] if self.name is not None else []))
+
+    def create(self, config: Config, car_park_name: str):
+        """Create the Device of the Role"""
+        device_type = import_type(ROLE_TYPES[self.role][self.device_type])
+
+        if self.role == SENSOR:
+            entry_sensor_config, exit_sensor_config = self._get_sensor_configs(config, car_park_name)
+            return device_type(entry_sensor_config, exit_sensor_config, **self.kwargs)
+
+        if self.role == CAR_PARK:
+            from smartpark.carpark import create_car_park_from_config_path
+            return create_car_park_from_config_path(device_type, config.config_file_path, car_park_name,
+                                                    **self.kwargs)
+
+        from smartpark.display import create_display_from_config_path
+
+        display_name = self.name if self.name is not None else config.get_display_configs(car_park_name)[0]["name"]
+        kwargs = self.kwargs
+        if self.device_type == "tk" and "window_title" not in kwargs:  # A parameter of the Tk Display
+            kwargs = kwargs | {"window_title": config.get_car_park_config(car_park_name)["location"]}
+
+        return create_display_from_config_path(device_type, config.config_file_path, car_park_name, display_name,
+                                               **kwargs)
+
+    def _get_sensor_configs(self, config: Config, car_park_name: str):
+        """Returns the (entry, exit) Sensor Configs of the Role"""
+        if self.name is not None:
+            entry_sensor_name, _, exit_sensor_name = self.name.partition(",")
+            return (config.get_sensor_config_dict(car_park_name, entry_sensor_name, "entry"),
+                    config.get_sensor_config_dict(car_park_name, exit_sensor_name or entry_sensor_name, "exit"))
+
+        sensor_configs = config.get_sensor_configs(car_park_name)
+        return ([sensor_config for sensor_config in sensor_configs if sensor_config["topic-qualifier"] == "entry"][0],
+                [sensor_config for sensor_config in sensor_configs if sensor_config["topic-qualifier"] == "exit"][0])
+
+    def run(self, config: Config, car_park_name: str, ready=None):
+        """Create the Device and Run its Event Loop. Blocking, until the Device quits.
+
+        'ready' (a threading or multiprocessing Event) is set once the Device is created, i.e. it subscribed.
+        """
+        device = self.create(config, car_park_name)
+        if ready is not None:
+            ready.set()
+        self.start(device)
+
+    def start(self, device):
+        """Run the Event Loop of a Device of the Role. Blocking, until the Device quits."""
+        try:
+            result = getattr(device, START_METHODS[self.role])()
+
+            if isinstance(result, Iterator):  # e.g. FileDetector yields the replayed events
+                for _ in result:
+                    pass
+        except SystemExit:  # Devices call exit() on the "quit" message
+            pass
+
+
+def run_role(role: Role, config_path: str, car_park_name: str, ready=None):
+    """Run a Role in a Child Process"""
+    role.run(Config(config_path), car_park_name, ready)
+
+
+class RoleRunner:
+    """Run any mix of Roles as threads of the current interpreter, instead of one process per Role.
+
+    Car Parks and Displays are started first: the Sensors start once they all subscribed (up to 'ready_timeout'
+    seconds, e.g. for a child process importing Tk), and 'sensor_delay' seconds more for their subscriptions to reach
+    the broker. The first GUI Role runs in the main thread (Tk requires it), the other GUI Roles each in their own
+    (daemon) process, and the headless Roles in daemon threads. The runner returns when all the Car Parks and
+    Displays have quit (or all the Sensors, when there are only Sensors).
+    """
+    def __init__(self, config_path: str, car_park_name: str, roles: List[Role], sensor_delay: float = 0.5,
+                 ready_timeout: float = 30.0):
+        self._config = Config(config_path)
+        self._car_park_name = car_park_name
+        self._roles = roles
+        self._sensor_delay = sensor_delay
+        self._ready_timeout = ready_timeout
+
+    def run(self):
+        main_role = next((role for role in self._roles if role.is_gui), None)
+        workers: Dict[Role, threading.Thread | multiprocessing.Process] = {}
+        ready_events = {}
+        context = multiprocessing.get_context("spawn")  # A fresh interpreter, without the threads of this one
+
+        # The Device of the main thread is created first, and runs once the other Roles started
+        main_device = None
+        if main_role is not None:
+            main_device = main_role.create(self._config, self._car_park_name)
+
+        sensors_started = False
+        for role in sorted(self._roles, key=lambda r: r.role == SENSOR):  # Stable sort, Sensors last
+            if role.role == SENSOR and not sensors_started:
+                self._wait_ready(workers, ready_events)
+                time.sleep(self._sensor_delay)
+                sensors_started = True
+
+            if role is main_role:
+                continue
+
+            if role.is_gui:
+                ready_events[role] = context.Event()
+                workers[role] = context.Process(target=run_role, name=str(role), daemon=True,
+                                                args=(role, self._config.config_file_path, self._car_park_name,
+                                                      ready_events[role]))
+            else:
+                ready_events[role] = threading.Event()
+                workers[role] = threading.Thread(target=role.run, name=str(role), daemon=True,
+                                                 args=(self._config, self._car_park_name, ready_events[role]))
+            workers[role].start()
+
+        if main_role is not None:
+            main_role.start(main_device)
+
+        awaited_workers = [worker for role, worker in workers.items() if role.role != SENSOR] or \
+            list(workers.values())
+
+        try:
+            for worker in awaited_workers:
+                while worker.is_alive():
+                    worker.join(timeout=0.5)  # With a timeout, so that Ctrl+C is not blocked
+        except KeyboardInterrupt:
+            pass
+
+    def _wait_ready(self, workers: Dict[Role, threading.Thread | multiprocessing.Process], ready_events: dict):
+        """Wait until the started Roles created their Devices, or quit, or the ready timeout"""
+        deadline = time.monotonic() + self._ready_timeout
+        for role, ready in ready_events.items():
+            while not ready.wait(timeout=0.1) and workers[role].is_alive() and time.monotonic() < deadline:
+                pass
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Run SmartPark Roles in a single process")
+    parser.add_argument("roles", nargs="*", default=["sensor:tk", "carpark", "display:tk"],
+                        help='Roles as "<role>[:<type>[:<name>]]" (default: sensor:tk carpark display:tk)')
+    parser.add_argument("--config", default=str(CONFIG_DIR / 'sample_smartpark_config.toml'))
+    parser.add_argument("--car-park", default=None, help="Car Park Name (default: the first in the config)")
+    parser.add_argument("--file", default=None, help="Signals File of the 'file' Sensors")
+    parser.add_argument("--replay-mode", default="max-throughput", help="Replay Mode of the 'file' Sensors")
+    parser.add_argument("--sensor-delay", type=float, default=0.5, help="Seconds before starting the Sensors")
+    args = parser.parse_args(argv)
+
+    roles = []
+    for spec in args.roles:
+        role = Role.from_spec(spec)
+        if role.role == SENSOR and role.device_type == "file":
+            if args.file is None:
+                parser.error("--file is required by the 'file' sensors")
+            role.kwargs = {"enter_exit_temperature_filepath": args.file, "replay_mode": args.replay_mode}
+        roles.append(role)
+
+    car_park_name = args.car_park if args.car_park is not None else Config(args.config).get_car_park_names()[0]
+
+    RoleRunner(args.config, car_park_name, roles, sensor_delay=args.sensor_delay).run()
+    print("Closing Car Park Simulation Program")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,139 @@
 from typing import Generator, Type, TypeVar
+from datetime import datetime
 import time
+import uuid
+import itertools
+import threading
 from abc import ABC, abstractmethod
-import tkinter as tk
 import random
 
+import paho.mqtt.client as paho
+
 from smartpark.config import Config
 from smartpark.mqtt_device import MqttDevice
 from smartpark.logger import class_logger
+from smartpark.sensor_message import SensorMessage
+from smartpark.telemetry import TemperatureFilter, create_telemetry_topic
+from smartpark.heartbeat import create_heartbeat_topic
+from smartpark.tracing import TRACER
+from smartpark.metrics import REGISTRY, start_metrics_server
 from smartpark.project_paths import LOG_DIR, CONFIG_DIR
 
 
+DETECTIONS = REGISTRY.counter("smartpark_sensor_detections_total", "Detections published", ["sensor"])
+TELEMETRY_MESSAGES = REGISTRY.counter("smartpark_sensor_telemetry_messages_total", "Telemetry messages published",
+                                      ["sensor"])
+HEARTBEATS = REGISTRY.counter("smartpark_sensor_heartbeats_total", "Heartbeats published", ["sensor"])
+PUBLISH_FAILURES = REGISTRY.counter("smartpark_sensor_publish_failures_total", "Failed publishes of detections",
+                                    ["sensor"])
+
+
 class Sensor(MqttDevice):
-    """Base Class for Sensors. It follows the Publisher Pattern, but can include (infinite) event loop."""
+    """Base Class for Sensors. It follows the Publisher Pattern, but can include (infinite) event loop.
+
+    Every Detection carries an Event ID and a Sequence Number, so that the Car Park can drop duplicates (e.g. QoS 1
+    redeliveries), and its Time of Detection, so that the Car Park can apply events in order. With 'trace = true' in
+    the Sensor configuration, the Detection is also traced up to the Displays.
+
+    With 'telemetry = true', the temperature is not sent with every Detection but on the Telemetry Topic, filtered
+    on the device (see TemperatureFilter): the reading of each Detection is a sample, and so is a periodic reading
+    every 'telemetry_sample_interval' seconds, if given. The Car Park keeps the latest value of each Sensor, retained
+    by the broker for a car park (re)starting.
+
+    With 'heartbeat_interval = <seconds>', a Heartbeat is published periodically on the Heartbeat Topic, so that the
+    Car Park can tell a silent sensor from a quiet entrance (see SensorLivenessMonitor).
+    """
+    def __init__(self, config: dict, *args, **kwargs):
+        super().__init__(config, *args, **kwargs)
+        self._trace_enabled: bool = config.get("trace", False)
+        self._seq = itertools.count(1)
+
+        # Optional Temperature Telemetry, i.e. telemetry = true
+        self._temperature_filter: TemperatureFilter | None = None
+        if config.get("telemetry", False):
+            self._temperature_filter = TemperatureFilter(config.get("telemetry_deadband", 0.5),
+                                                         config.get("telemetry_max_interval", 60.0),
+                                                         config.get("telemetry_window", 5))
+            self.telemetry_topic: str = create_telemetry_topic(self.topic_address)
+            self._telemetry_lock = threading.Lock()
+
+            if config.get("telemetry_sample_interval", None) is not None:
+                threading.Thread(target=self._sample_temperature_loop, args=(config["telemetry_sample_interval"],),
+                                 name=f"telemetry-{self.name}", daemon=True).start()
+
+        # Optional Heartbeats, i.e. heartbeat_interval = <seconds>
+        self.heartbeat_topic: str = create_heartbeat_topic(self.topic_address)
+        if config.get("heartbeat_interval", None) is not None:
+            threading.Thread(target=self._heartbeat_loop, args=(config["heartbeat_interval"],),
+                             name=f"heartbeat-{self.name}", daemon=True).start()
+
+        if config.get("metrics_port", None) is not None:  # Optional Metrics Endpoint
+            start_metrics_server(config["metrics_port"])
+
+    @property
+    def trace_enabled(self) -> bool:
+        return self._trace_enabled
+
     @property
     def temperature(self):
         """Returns the current temperature"""
         # Can get from random number generator, file, or API.
         return self.temperature_generator()
 
-    def on_detection(self, message: str):
-        """Publish Message to CarPark"""
-        self.client.publish(self.topic_address, message)
+    def on_detection(self, message: str) -> int:
+        """Publish Message to CarPark. Returns the paho result code."""
+        DETECTIONS.labels(self.topic_address).inc()
+
+        sensor_message = SensorMessage.from_payload(message)
+        if self._temperature_filter is not None:  # The reading goes to the Telemetry Topic, if at all
+            self.record_temperature(float(sensor_message.temperature))
+            sensor_message.temperature = ""
+
+        sensor_message.metadata[SensorMessage.EVENT_ID] = uuid.uuid4().hex
+        sensor_message.metadata[SensorMessage.SEQUENCE] = f"{next(self._seq)}"
+        sensor_message.metadata[SensorMessage.TIMESTAMP] = f"{time.time()}"
+
+        if not self._trace_enabled:
+            return self._publish(sensor_message.to_payload())
+
+        sensor_message.metadata[SensorMessage.TRACE] = "1"
+
+        publish_start = time.monotonic()
+        rc = self._publish(sensor_message.to_payload())
+        TRACER.record("sensor.publish", time.monotonic() - publish_start)
+        TRACER.dump_on_exit(LOG_DIR / 'tracing' / f"sensor-{self.name}.json")
+        return rc
+
+    def record_temperature(self, reading: float):
+        """Add a Temperature Reading to the Telemetry, published when outside the deadband"""
+        with self._telemetry_lock:
+            value = self._temperature_filter.update(reading)
+
+            if value is not None:
+                TELEMETRY_MESSAGES.labels(self.topic_address).inc()
+                # Retained, so that a car park (re)starting has the temperature of the detections sent without one
+                self.client.publish(self.telemetry_topic, f"{value:.2f}", retain=True)
+
+    def _sample_temperature_loop(self, sample_interval: float):
+        while True:
+            time.sleep(sample_interval)
+            self.record_temperature(float(self.temperature))
+
+    def send_heartbeat(self):
+        """Publish a Heartbeat with the Sensor Time"""
+        HEARTBEATS.labels(self.topic_address).inc()
+        self.client.publish(self.heartbeat_topic, f"{time.time()}")
+
+    def _heartbeat_loop(self, heartbeat_interval: float):
+        while True:
+            self.send_heartbeat()
+            time.sleep(heartbeat_interval)
+
+    def _publish(self, message: str) -> int:
+        rc = self.client.publish(self.topic_address, message).rc
+        if rc != paho.MQTT_ERR_SUCCESS:
+            PUBLISH_FAILURES.labels(self.topic_address).inc()
+        return rc
 
     def temperature_generator(self) -> float | int:
         """Override and Implement How a Temperature is Generated. e.g. Random number generator, File, or API"""
@@ -84,6 +197,8 @@ class CLIDetector(Detector):
 @class_logger(LOG_DIR / 'sensor' / 'tk_detector' / 'sensor.log', 'tk_detector_logger')
 class TkDetector(Detector):
     def __init__(self, entry_sensor_config, exit_sensor_config):
+        import tkinter as tk  # Imported here, so that headless Detectors do not load tkinter
+
         self.entry_sensor = EntrySensor(entry_sensor_config)
         self.exit_sensor = ExitSensor(exit_sensor_config)
 
@@ -137,56 +252,113 @@ class FileSensor(Sensor):
 
 
 class FileEntrySensor(FileSensor):
-    def on_car_entry(self):
-        self.on_detection(f"Enter,{self.temperature}")
+    def on_car_entry(self, temperature: float | int | None = None):
+        # The temperature of the replayed line is used when given, otherwise from the registered generator
+        self.on_detection(f"Enter,{self.temperature if temperature is None else temperature}")
 
 
 class FileExitSensor(FileSensor):
-    def on_car_exit(self):
-        self.on_detection(f"Exit,{self.temperature}")
+    def on_car_exit(self, temperature: float | int | None = None):
+        self.on_detection(f"Exit,{self.temperature if temperature is None else temperature}")
 
 
 class FileDetector(Detector):
+    """Replay Entry/Exit Events from a File in a single streaming pass.
+
+    Format of each Line: "<Enter|Exit>,<temperature>[,<timestamp>]"
+
+    The optional timestamp is either "%Y-%m-%d %H:%M:%S" or seconds since epoch. Replay Modes:
+        - "max-throughput": Publish the lines as fast as possible (default)
+        - "real-time": Keep the original spacing of the timestamps
+        - "accelerated": Keep the spacing of the timestamps, divided by 'speed' (i.e. N x faster)
+
+    Lines without a timestamp are published without pacing. Any other signal (e.g. "Quit") stops the replay.
+    """
+
+    REPLAY_MAX_THROUGHPUT = "max-throughput"
+    REPLAY_REAL_TIME = "real-time"
+    REPLAY_ACCELERATED = "accelerated"
+
     def __init__(self, entry_sensor_config: dict, exit_sensor_config: dict,
-                 enter_exit_temperature_filepath: str
+                 enter_exit_temperature_filepath: str,
+                 replay_mode: str = REPLAY_MAX_THROUGHPUT, speed: float = 1.0, buffer_size: int = 1024 * 1024
                  ):
-        # Format: "<Enter|Exit>,<temperature>"
+        if replay_mode not in [self.REPLAY_MAX_THROUGHPUT, self.REPLAY_REAL_TIME, self.REPLAY_ACCELERATED]:
+            raise ValueError(f"Unknown replay_mode '{replay_mode}'")
 
-        # Note: Could have implemented alone without FileSensor.
+        if speed <= 0:
+            raise ValueError("speed must be positive")
 
         self._file_path = enter_exit_temperature_filepath
+        self._replay_mode = replay_mode
+        self._speed = speed if replay_mode == self.REPLAY_ACCELERATED else 1.0
+        self._buffer_size = buffer_size
 
-        # Need to be instantiated outside, then attach to file entry and exit sensors
-        temperature_generator = FileSensor.create_temperature_generator(self._file_path)
-
+        # Each detection carries the temperature of its own line, no generator is shared between the sensors.
         self.entry_sensor = FileEntrySensor(entry_sensor_config)
         self.exit_sensor = FileExitSensor(exit_sensor_config)
 
-        self.entry_sensor.register_temperature_generator(temperature_generator)
-        self.exit_sensor.register_temperature_generator(temperature_generator)
+    @staticmethod
+    def parse_timestamp(timestamp: str) -> float | None:
+        """Convert the optional Timestamp of a Line to seconds since epoch"""
+        timestamp = timestamp.strip()
+
+        if timestamp == "":
+            return None
+
+        try:
+            return float(timestamp)
+        except ValueError:
+            return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timestamp()
+
+    def read_lines(self):
+        """Stream the File line by line through a buffered reader. Yields (signal, temperature, timestamp)."""
+        return self.read_lines_from(self._file_path, self._buffer_size)
+
+    @classmethod
+    def read_lines_from(cls, file_path: str, buffer_size: int = 1024 * 1024):
+        """Stream any File in the FileDetector format. Yields (signal, temperature, timestamp)."""
+        with open(file_path, 'r', buffering=buffer_size) as file:
+            for line in file:
+                line = line.strip()
+
+                if line == "":
+                    continue
+
+                line_split = line.split(',')
+                temperature = line_split[1] if len(line_split) > 1 else ""
+                timestamp = cls.parse_timestamp(line_split[2]) if len(line_split) > 2 else None
+
+                yield line_split[0], temperature, timestamp
 
     def start_sensing(self, use_quit=True):
-        with open(self._file_path, 'r') as file:
-            for line in file.readlines():
-                line = line.strip()
-                enter_or_exit, temperature = line.split(',')
+        first_timestamp: float | None = None
+        replay_start = time.monotonic()
 
-                # rnd_time_interval = random.uniform(0.05, 0.55)
-                # time.sleep(rnd_time_interval)
-                # time.sleep(1)
+        for enter_or_exit, temperature, timestamp in self.read_lines():
+            if enter_or_exit not in ['Enter', 'Exit']:
+                if use_quit:
+                    self.entry_sensor.client.publish("quit", "quit")
+                    self.exit_sensor.client.publish("quit", "quit")
+                print("Done Sensing from File!")
+                break
 
-                if enter_or_exit == 'Enter':
-                    self.entry_sensor.on_car_entry()
-                elif enter_or_exit == 'Exit':
-                    self.exit_sensor.on_car_exit()
-                else:
-                    if use_quit:
-                        self.entry_sensor.client.publish("quit", "quit")
-                        self.exit_sensor.client.publish("quit", "quit")
-                    print("Done Sensing from File!")
-                    break
+            if self._replay_mode != self.REPLAY_MAX_THROUGHPUT and timestamp is not None:
+                if first_timestamp is None:
+                    first_timestamp, replay_start = timestamp, time.monotonic()
+
+                delay = (timestamp - first_timestamp) / self._speed - (time.monotonic() - replay_start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            temperature = float(temperature)
+
+            if enter_or_exit == 'Enter':
+                self.entry_sensor.on_car_entry(temperature)
+            else:
+                self.exit_sensor.on_car_exit(temperature)
 
-                yield enter_or_exit, float(temperature)
+            yield enter_or_exit, temperature
 
 
 @class_logger(LOG_DIR / 'sensor' / 'random_detector' / 'sensor.log', 'random_detector_logger')
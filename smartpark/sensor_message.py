@@ -0,0 +1,72 @@
+from typing import Dict
+
+
+class SensorMessage:
+    """Message from a Sensor to the Car Park.
+
+    Format of Message String: "<Enter|Exit>,<temperature>[,<key>=<value>,...]"
+
+    The optional key-value pairs are Metadata, e.g. the Trace of an Event:
+        - id: Event ID assigned by the Sensor
+        - seq: Sequence Number of the Event, counted by the Sensor from 1
+        - ts: Time of Detection in seconds since epoch
+        - trace: "1" when the Event is traced from Sensor to Display (see create_trace_field)
+    """
+
+    EVENT_ID = "id"
+    SEQUENCE = "seq"
+    TIMESTAMP = "ts"
+    TRACE = "trace"
+
+    def __init__(self, signal: str, temperature: float | int | str | None, metadata: Dict[str, str] | None = None):
+        self.signal = signal
+        self.temperature = temperature
+        self.metadata: Dict[str, str] = {} if metadata is None else metadata
+
+    @classmethod
+    def from_payload(cls, msg: str):
+        """Construct SensorMessage from a Message String. Raises ValueError when the format is invalid."""
+        msg_split = msg.split(",")
+
+        if len(msg_split) < 2:
+            raise ValueError(f"Invalid Sensor Message '{msg}'")
+
+        metadata = {}
+        for item in msg_split[2:]:
+            key, sep, value = item.partition("=")
+            if sep == "":
+                raise ValueError(f"Invalid Sensor Message Metadata '{item}'")
+            metadata[key] = value
+
+        if not metadata.get(cls.SEQUENCE, "0").isdigit():
+            raise ValueError(f"Invalid Sensor Message Sequence Number '{metadata[cls.SEQUENCE]}'")
+
+        try:
+            float(metadata.get(cls.TIMESTAMP, "0"))
+        except ValueError:
+            raise ValueError(f"Invalid Sensor Message Timestamp '{metadata[cls.TIMESTAMP]}'")
+
+        return cls(msg_split[0], msg_split[1], metadata)
+
+    def to_payload(self) -> str:
+        """Convert to a Message String"""
+        return ",".join([self.signal, str(self.temperature)] + [f"{k}={v}" for k, v in self.metadata.items()])
+
+    @property
+    def event_id(self) -> str | None:
+        return self.metadata.get(self.EVENT_ID, None)
+
+    @property
+    def seq(self) -> int | None:
+        seq = self.metadata.get(self.SEQUENCE, None)
+        return None if seq is None else int(seq)
+
+    @property
+    def traced(self) -> bool:
+        return self.metadata.get(self.TRACE, None) == "1"
+
+    @property
+    def timestamp(self) -> float | None:
+        """Time of Detection in seconds since epoch, if given by the Sensor"""
+        timestamp = self.metadata.get(self.TIMESTAMP, None)
+        return None if timestamp is None else float(timestamp)
@@ -0,0 +1,181 @@
+"""Discrete-Event Simulation of a Car Park in virtual time, without MQTT.
+
+Usage:
+    python -m smartpark.simulation [--bays <bays>] [--days <days>] [--arrival-rate <cars/hour>]
+
+Arrivals and departures are events in a heap ordered by virtual time: the engine jumps from one event to the next,
+so a week of traffic takes seconds. The events drive the real CarPark (add_car, park_car, unpark_car, remove_car),
+with its clock set to the virtual time, so that the same state transitions as in production are simulated.
+"""
+from typing import Any, Callable
+from datetime import datetime, timedelta
+import argparse
+import heapq
+import itertools
+import math
+import random
+
+from smartpark.car import Car
+from smartpark.carpark import CarPark
+
+
+class VirtualClock:
+    """Clock of the Simulation, moved forward by the EventScheduler. Call it for the current virtual time."""
+    def __init__(self, start: datetime):
+        self._now = start
+
+    def __call__(self) -> datetime:
+        return self._now
+
+    def advance_to(self, time: datetime):
+        if time < self._now:
+            raise ValueError("The virtual clock cannot go back in time")
+        self._now = time
+
+
+class EventScheduler:
+    """Heap-Scheduled Discrete-Event Engine: actions run in time order, each at its virtual time.
+
+    Actions scheduled at the same time run in the order they were scheduled. An action may schedule further actions.
+    """
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self._heap: list = []  # (time, scheduling order, action, args)
+        self._order = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, time: datetime, action: Callable, *args: Any):
+        """Schedule an Action at a virtual Time, not before now"""
+        heapq.heappush(self._heap, (max(time, self.clock()), next(self._order), action, args))
+
+    def schedule_after(self, seconds: float, action: Callable, *args: Any):
+        self.schedule(self.clock() + timedelta(seconds=seconds), action, *args)
+
+    def run(self, until: datetime) -> int:
+        """Run the Actions up to 'until', then move the clock there. Returns the number of actions run."""
+        num_actions = 0
+        while len(self._heap) > 0 and self._heap[0][0] <= until:
+            time, _, action, args = heapq.heappop(self._heap)
+            self.clock.advance_to(time)
+            action(*args)
+            num_actions += 1
+
+        self.clock.advance_to(max(until, self.clock()))
+        return num_actions
+
+
+def exponential_dwell_time(mean: float) -> Callable[[random.Random], float]:
+    """Dwell Times (seconds) of an Exponential Distribution"""
+    return lambda rng: rng.expovariate(1 / mean)
+
+
+def lognormal_dwell_time(median: float, sigma: float = 0.8) -> Callable[[random.Random], float]:
+    """Dwell Times (seconds) of a Log-Normal Distribution, e.g. mostly short stays with a long tail"""
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+class CarParkSimulation:
+    """Simulated Traffic of a Car Park, driven by an EventScheduler on the Car Park's virtual clock.
+
+    Cars arrive as a Poisson process of 'arrival_rate' cars per hour, either constant or a function of the virtual
+    time (e.g. a daily profile). An arriving car enters the car park and parks when a bay is available; otherwise it
+    is turned away, i.e. it exits at once. A parked car leaves after a dwell time drawn from 'dwell_time'.
+
+    Create the Car Park with the clock of the simulation and without connecting, e.g.:
+        clock = VirtualClock(datetime(2026, 1, 5))
+        car_park = CarPark(config, clock=clock, connect=False)
+        report = CarParkSimulation(car_park, clock, arrival_rate=300).run(timedelta(days=7))
+    """
+    def __init__(self, car_park: CarPark, clock: VirtualClock, arrival_rate: float | Callable[[datetime], float],
+                 dwell_time: Callable[[random.Random], float] = lognormal_dwell_time(2 * 3600),
+                 temperature: float = 20.0, seed: int | None = None):
+        self.car_park = car_park
+        self.scheduler = EventScheduler(clock)
+        self._arrival_rate = arrival_rate if callable(arrival_rate) else lambda time: arrival_rate
+        self._dwell_time = dwell_time
+        self._random = random.Random(seed)
+        self._license_plates = itertools.count(1)
+
+        self.car_park.temperature = temperature
+
+        self._started = False
+        self._arrivals = 0
+        self._turned_away = 0
+        self._departures = 0
+        self._peak_parked_cars = 0
+
+    def _schedule_next_arrival(self):
+        rate = self._arrival_rate(self.scheduler.clock())
+        # With no arrivals at the moment, e.g. at night in a daily profile, the rate is checked again in a minute
+        gap = self._random.expovariate(rate / 3600) if rate > 0 else 60.0
+        self.scheduler.schedule_after(gap, self._on_arrival, rate > 0)
+
+    def _on_arrival(self, is_arrival: bool = True):
+        self._schedule_next_arrival()
+        if not is_arrival:
+            return
+
+        self._arrivals += 1
+        car = Car(f"SIM-{next(self._license_plates)}", "ModelA")
+        self.car_park.add_car(car)
+
+        if self.car_park.available_bays > 0:
+            self.car_park.park_car(car)
+            self._peak_parked_cars = max(self._peak_parked_cars, self.car_park.parked_cars)
+            self.scheduler.schedule_after(self._dwell_time(self._random), self._on_departure, car)
+        else:
+            self._turned_away += 1
+            self.car_park.remove_car(car)
+
+    def _on_departure(self, car: Car):
+        self._departures += 1
+        self.car_park.remove_car(car)  # Un-parks the car first
+
+    def _check_overstays(self, interval: float):
+        self.car_park.check_overstays()
+        self.scheduler.schedule_after(interval, self._check_overstays, interval)
+
+    def run(self, duration: timedelta, overstay_check_interval: float = 60.0) -> dict:
+        """Simulate 'duration' of virtual time. Returns the Report. Can be called again to continue."""
+        if not self._started:
+            self._started = True
+            self._schedule_next_arrival()
+            if self.car_park.overstays is not None:
+                self.scheduler.schedule_after(overstay_check_interval, self._check_overstays, overstay_check_interval)
+
+        num_events = self.scheduler.run(self.scheduler.clock() + duration)
+
+        return {"Virtual Time": self.scheduler.clock(),
+                "Events": num_events,
+                "Arrivals": self._arrivals,
+                "Turned Away": self._turned_away,
+                "Departures": self._departures,
+                "Cars": self.car_park.total_cars,
+                "Peak Parked Cars": self._peak_parked_cars
+                }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the Traffic of a Car Park in virtual time")
+    parser.add_argument("--bays", type=int, default=2000)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--arrival-rate", type=float, default=400, help="Cars per hour")
+    parser.add_argument("--dwell-time", type=float, default=2 * 3600, help="Median dwell time in seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    clock = VirtualClock(datetime.now().replace(hour=0, minute=0, second=0, microsecond=0))
+    car_park = CarPark({"name": "simulation", "location": "Simulation", "topic-root": "simulation",
+                        "host": "localhost", "port": 1883, "total_bays": args.bays}, clock=clock, connect=False)
+    simulation = CarParkSimulation(car_park, clock, args.arrival_rate, lognormal_dwell_time(args.dwell_time),
+                                   seed=args.seed)
+
+    report = simulation.run(timedelta(days=args.days))
+    for k, v in report.items():
+        print(f"{k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+from typing import Callable
+from collections import deque
+import time
+
+
+def create_telemetry_topic(sensor_topic: str) -> str:
+    """Create the Telemetry Topic of a Sensor, e.g. "<topic-root>/<location>/<name>/entry/telemetry".
+
+    Format of Message String: "<temperature>"
+    """
+    return f"{sensor_topic}/telemetry"
+
+
+class TemperatureFilter:
+    """On-Device Filtering of Temperature Readings before they are published as Telemetry.
+
+    Readings are averaged over a ring buffer of the last 'window' readings. The average is published only when it
+    moved by at least 'deadband' since the last published value, or when 'max_interval' seconds passed since then
+    (on 'clock'), so that a steady temperature costs one message per interval instead of one per reading.
+    """
+    def __init__(self, deadband: float = 0.5, max_interval: float = 60.0, window: int = 5,
+                 clock: Callable[[], float] = time.monotonic):
+        if deadband < 0 or max_interval <= 0 or window < 1:
+            raise ValueError("deadband must not be negative, max_interval and window must be positive")
+
+        self._deadband = deadband
+        self._max_interval = max_interval
+        self._clock = clock
+
+        self._readings: deque = deque(maxlen=window)
+        self._last_value: float | None = None
+        self._last_time = 0.0
+
+    @property
+    def average(self) -> float | None:
+        """Average of the Readings in the Ring Buffer"""
+        return sum(self._readings) / len(self._readings) if len(self._readings) > 0 else None
+
+    @property
+    def last_value(self) -> float | None:
+        """Last Value to be published"""
+        return self._last_value
+
+    def update(self, reading: float) -> float | None:
+        """Add a Reading. Returns the Value to publish, or None when it is within the deadband."""
+        self._readings.append(reading)
+
+        average, now = self.average, self._clock()
+        if self._last_value is not None and abs(average - self._last_value) < self._deadband \
+                and now - self._last_time < self._max_interval:
+            return None
+
+        self._last_value, self._last_time = average, now
+        return average
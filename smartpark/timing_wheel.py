@@ -0,0 +1,80 @@
+from typing import Dict, Hashable, List, Tuple
+import math
+import threading
+
+
+class TimingWheel:
+    """Hashed Timing Wheel of Deadlines, e.g. the maximum stay of each parked car.
+
+    Time is cut in ticks of 'tick' seconds, and a deadline goes to the slot of its tick modulo 'num_slots'. Scheduling
+    and cancelling are O(1); advancing visits one slot per elapsed tick, and only pops the deadlines of the current
+    round from it, so each deadline costs O(1) amortized when the slots span most of the typical delay (a deadline
+    further away than tick * num_slots is visited once per round before it expires).
+
+    Deadlines are in the caller's time unit, e.g. seconds since EPOCH (see Car.entry_timestamp) or a monotonic clock.
+    """
+    DEFAULT_NUM_SLOTS = 4096
+
+    def __init__(self, tick: float = 1.0, num_slots: int = DEFAULT_NUM_SLOTS, start: float = 0.0):
+        if tick <= 0 or num_slots < 1:
+            raise ValueError("tick and num_slots must be positive")
+
+        self._tick = tick
+        self._slots: List[Dict[Hashable, int]] = [{} for _ in range(num_slots)]  # Key -> Tick of its Deadline
+        self._deadlines: Dict[Hashable, Tuple[float, int]] = {}  # Key -> (Deadline, Tick of its Slot)
+        self._current_tick = math.floor(start / tick)  # Last Tick advanced to
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def get_deadline(self, key: Hashable) -> float | None:
+        return self._deadlines[key][0] if key in self._deadlines else None
+
+    def schedule(self, key: Hashable, deadline: float):
+        """Schedule the Deadline of a Key, replacing its previous one. A past deadline expires on the next advance."""
+        with self._lock:
+            self._remove(key)
+
+            deadline_tick = max(math.ceil(deadline / self._tick), self._current_tick + 1)
+            self._slots[deadline_tick % len(self._slots)][key] = deadline_tick
+            self._deadlines[key] = (deadline, deadline_tick)
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel the Deadline of a Key. Returns False if it has none, e.g. it already expired."""
+        with self._lock:
+            return self._remove(key)
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._deadlines.pop(key, None)
+        if entry is None:
+            return False
+
+        del self._slots[entry[1] % len(self._slots)][key]
+        return True
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Advance the Wheel to 'now'. Returns the Keys whose Deadline passed, in tick order."""
+        with self._lock:
+            target_tick = math.floor(now / self._tick)
+            if target_tick <= self._current_tick:
+                return []
+
+            # After a long pause, every slot is visited once
+            first_tick = max(self._current_tick + 1, target_tick - len(self._slots) + 1)
+            expired = []
+            for tick in range(first_tick, target_tick + 1):
+                slot = self._slots[tick % len(self._slots)]
+                if len(slot) == 0:
+                    continue
+                due = [key for key, deadline_tick in slot.items() if deadline_tick <= target_tick]
+                for key in due:
+                    del slot[key]
+                    del self._deadlines[key]
+                expired.extend(due)
+
+            self._current_tick = target_tick
+            return expired
@@ -0,0 +1,166 @@
+from typing import Dict, Tuple
+import atexit
+import json
+import threading
+import time
+
+from smartpark.utils import create_path_if_not_exists
+
+
+TRACE_FIELD_SEP = "|"
+
+
+def create_trace_field(event_id: str, sensor_timestamp: float) -> str:
+    """Create the Trace Field appended to Display Messages: "<event-id>|<sensor-time>|<car-park-time>" (epoch)"""
+    return TRACE_FIELD_SEP.join([event_id, f"{sensor_timestamp}", f"{time.time()}"])
+
+
+def parse_trace_field(trace_field: str) -> Tuple[str, float, float]:
+    """Returns (event-id, sensor-time, car-park-time) from a Trace Field"""
+    event_id, sensor_timestamp, car_park_timestamp = trace_field.split(TRACE_FIELD_SEP)
+    return event_id, float(sensor_timestamp), float(car_park_timestamp)
+
+
+class LatencyHistogram:
+    """Latency Histogram with fixed log-linear (HDR-style) Buckets.
+
+    Values are recorded in microseconds. Values below 2 * 2**precision_bits are exact, larger values fall into one of
+    2**precision_bits buckets per power of two, i.e. the relative error is at most 1 / 2**precision_bits. Recording
+    is O(1) and the memory is fixed, regardless of the number of recorded values. Values may be recorded from many
+    threads, e.g. several roles in one process (see RoleRunner).
+    """
+    def __init__(self, max_seconds: float = 3600.0, precision_bits: int = 4):
+        self._precision_bits = precision_bits
+        self._sub_buckets = 1 << precision_bits
+        self._max_value = int(max_seconds * 1_000_000)
+
+        self._counts = [0] * (self._index(self._max_value) + 1)
+        self._total = 0
+        self._sum = 0
+        self._max = 0
+        self._lock = threading.Lock()
+
+    def _index(self, value: int) -> int:
+        """Bucket Index of a Value in microseconds"""
+        if value < 2 * self._sub_buckets:
+            return value
+
+        shift = value.bit_length() - self._precision_bits - 1
+        return (shift + 1) * self._sub_buckets + (value >> shift) - self._sub_buckets
+
+    def _upper_bound(self, index: int) -> int:
+        """Upper Bound (exclusive) of a Bucket in microseconds"""
+        if index < 2 * self._sub_buckets:
+            return index + 1
+
+        shift = index // self._sub_buckets - 1
+        return (index % self._sub_buckets + self._sub_buckets + 1) << shift
+
+    @property
+    def count(self) -> int:
+        return self._total
+
+    @property
+    def sum(self) -> float:
+        """Sum of all the Recorded Values in seconds"""
+        return self._sum / 1_000_000
+
+    @property
+    def max(self) -> float:
+        return self._max / 1_000_000
+
+    def record(self, seconds: float):
+        """Record a Latency in seconds. Negative values (e.g. clock skew between devices) are recorded as 0."""
+        value = min(max(int(seconds * 1_000_000), 0), self._max_value)
+
+        index = self._index(value)
+        with self._lock:
+            self._counts[index] += 1
+            self._total += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def percentile(self, q: float) -> float:
+        """Returns the q-th Percentile (0 <= q <= 100) in seconds, as the upper bound of its Bucket"""
+        with self._lock:
+            counts, total, max_value = list(self._counts), self._total, self._max
+        if total == 0:
+            return 0.0
+
+        rank = max(1, round(q / 100 * total))
+        cumulative = 0
+        for index, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(self._upper_bound(index), max_value) / 1_000_000
+
+        return max_value / 1_000_000
+
+    def buckets(self) -> Dict[float, int]:
+        """Returns the non-empty Buckets as {upper-bound in seconds: count}"""
+        with self._lock:
+            counts = list(self._counts)
+        return {self._upper_bound(index) / 1_000_000: count for index, count in enumerate(counts) if count > 0}
+
+    def summary(self) -> dict:
+        return {"count": self.count,
+                "mean": self.sum / self.count if self.count > 0 else 0.0,
+                "p50": self.percentile(50),
+                "p90": self.percentile(90),
+                "p99": self.percentile(99),
+                "max": self.max
+                }
+
+
+class Tracer:
+    """Collection of Latency Histograms, one per Stage of the path from Sensor to Display.
+
+    Stages:
+        - "sensor.publish": Time spent publishing a Detection
+        - "sensor_to_car_park": Detection to the Car Park receiving the Event
+        - "car_park.handle": Time spent by the Car Park handling the Event
+        - "car_park_to_display": Car Park publishing to the Display receiving the Message
+        - "sensor_to_display": Detection to the Display showing the Event, i.e. Display Freshness
+    """
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._dump_path: str | None = None
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        """Get or Create the Histogram of a Stage"""
+        histogram = self._histograms.get(stage, None)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+    def record(self, stage: str, seconds: float):
+        self.histogram(stage).record(seconds)
+
+    def stages(self):
+        return list(self._histograms.keys())
+
+    def snapshot(self) -> dict:
+        """Returns the Summary of every Stage"""
+        return {stage: histogram.summary() for stage, histogram in list(self._histograms.items())}
+
+    def dump(self, file_path: str):
+        """Write the Summary and Buckets of every Stage as JSON"""
+        create_path_if_not_exists(file_path)
+
+        out_dict = {stage: histogram.summary() | {"buckets": histogram.buckets()}
+                    for stage, histogram in list(self._histograms.items())}
+
+        with open(file_path, "w") as file:
+            json.dump(out_dict, file, indent=4)
+
+    def dump_on_exit(self, file_path: str):
+        """Dump the Histograms when the process exits. The last given path is used."""
+        if self._dump_path is None:
+            atexit.register(lambda: self.dump(self._dump_path))
+        self._dump_path = file_path
+
+
+TRACER = Tracer()  # Tracer of the current process
@@ -0,0 +1,227 @@
+from typing import Iterator, List
+from datetime import datetime
+import atexit
+import queue
+import sqlite3
+import threading
+
+from smartpark.car import Car, datetime_to_timestamp
+from smartpark.logger import get_logger
+from smartpark.metrics import REGISTRY
+from smartpark.utils import create_path_if_not_exists
+from smartpark.project_paths import LOG_DIR
+
+
+WRITES = REGISTRY.counter("smartpark_visit_store_writes_total", "Entries and exits written to the visit store")
+WRITE_ERRORS = REGISTRY.counter("smartpark_visit_store_write_errors_total", "Failed writes to the visit store")
+BATCHES = REGISTRY.counter("smartpark_visit_store_batches_total", "Transactions committed by the visit store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS visits (
+    id INTEGER PRIMARY KEY,
+    license_plate TEXT NOT NULL,
+    car_model TEXT NOT NULL,
+    entry_time INTEGER NOT NULL,
+    entry_temperature REAL,
+    exit_time INTEGER,
+    exit_temperature REAL
+);
+CREATE INDEX IF NOT EXISTS visits_license_plate ON visits (license_plate);
+CREATE INDEX IF NOT EXISTS visits_entry_time ON visits (entry_time);
+CREATE INDEX IF NOT EXISTS visits_exit_time ON visits (exit_time);
+CREATE INDEX IF NOT EXISTS visits_car_model ON visits (car_model, entry_time);
+
+-- Longest closed Visit, which bounds the entry times scanned by the time window queries
+CREATE TABLE IF NOT EXISTS max_stay (id INTEGER PRIMARY KEY CHECK (id = 0), seconds INTEGER NOT NULL);
+INSERT OR IGNORE INTO max_stay VALUES (0, COALESCE((SELECT MAX(exit_time - entry_time) FROM visits), 0));
+CREATE TRIGGER IF NOT EXISTS visits_max_stay_update AFTER UPDATE OF exit_time ON visits
+WHEN NEW.exit_time - NEW.entry_time > (SELECT seconds FROM max_stay WHERE id = 0)
+BEGIN
+    UPDATE max_stay SET seconds = NEW.exit_time - NEW.entry_time WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS visits_max_stay_insert AFTER INSERT ON visits
+WHEN NEW.exit_time - NEW.entry_time > (SELECT seconds FROM max_stay WHERE id = 0)
+BEGIN
+    UPDATE max_stay SET seconds = NEW.exit_time - NEW.entry_time WHERE id = 0;
+END;
+"""
+
+_COLUMNS = "license_plate, car_model, entry_time, entry_temperature, exit_time, exit_temperature"
+
+_INSERT_ENTRY = "INSERT INTO visits (license_plate, car_model, entry_time, entry_temperature) VALUES (?, ?, ?, ?)"
+_UPDATE_EXIT = """
+UPDATE visits SET exit_time = ?, exit_temperature = ?
+WHERE id = (SELECT id FROM visits WHERE license_plate = ? AND exit_time IS NULL ORDER BY id DESC LIMIT 1)
+"""
+
+
+class VisitStore:
+    """Durable History of Car Visits (entry and exit) in a local SQLite Database.
+
+    Writes are queued and committed by a background thread, in one transaction per batch of queued events, so that
+    the event handling of the Car Park never waits on the disk. The database is in WAL mode: queries run on their
+    own connection (one per thread) and are not blocked by the writer. Use flush() to wait for the queued writes.
+
+    Times are stored as whole seconds (see Car.entry_timestamp) and indexed, as are the license plates and car models.
+    A Visit is returned as an un-parked Car; its exit time is None while the Car is in the Car Park.
+    """
+    def __init__(self, db_path: str, max_batch_size: int = 1000):
+        self._db_path = str(db_path)
+        self._max_batch_size = max_batch_size
+
+        create_path_if_not_exists(LOG_DIR / 'car_park' / 'visit_store.log')
+        self.logger = get_logger(LOG_DIR / 'car_park' / 'visit_store.log', 'visit_store_logger')
+
+        create_path_if_not_exists(self._db_path)
+        connection = self._connect()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        connection.close()
+
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._local = threading.local()
+        self._closed = False
+
+        self._writer_thread = threading.Thread(target=self._write_loop, name="visit-store-writer", daemon=True)
+        self._writer_thread.start()
+        atexit.register(self.close)  # Queued writes are not lost when the process exits
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._db_path)
+        connection.execute("PRAGMA synchronous=NORMAL")  # Durable in WAL mode, without a sync on every commit
+        return connection
+
+    # ----- Writes -----
+
+    def record_entry(self, car: Car):
+        """Queue the Entry of a Car"""
+        self._queue.put((_INSERT_ENTRY, (car.license_plate, car.car_model, car.entry_timestamp,
+                                         car.entry_temperature)))
+
+    def record_exit(self, car: Car):
+        """Queue the Exit of a Car, which closes its latest open Visit"""
+        self._queue.put((_UPDATE_EXIT, (car.exit_timestamp, car.exit_temperature, car.license_plate)))
+
+    def on_car_added(self, car: Car):
+        """Car Listener of a Car Park, see CarPark.register_car_listener()"""
+        self.record_entry(car)
+
+    def on_car_removed(self, car: Car):
+        self.record_exit(car)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until all the queued Writes are committed. Returns False on timeout."""
+        if self._closed:
+            return True
+
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        return flushed.wait(timeout)
+
+    def close(self):
+        """Commit the queued Writes and Stop the Writer"""
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put(None)
+        self._writer_thread.join()
+
+    def _write_loop(self):
+        connection = self._connect()
+
+        while True:
+            # Block for the first item, then take whatever else is queued: the batches grow with the load
+            batch = [self._queue.get()]
+            while len(batch) < self._max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            writes = [item for item in batch if isinstance(item, tuple)]
+            if len(writes) > 0:
+                self._write_batch(connection, writes)
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+            if None in batch:
+                connection.close()
+                return
+
+    def _write_batch(self, connection: sqlite3.Connection, writes: list):
+        try:
+            with connection:  # One transaction per batch
+                for statement, parameters in writes:
+                    connection.execute(statement, parameters)
+            WRITES.labels().inc(len(writes))
+            BATCHES.labels().inc()
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to write {len(writes)} visits - {e}")
+            WRITE_ERRORS.labels().inc(len(writes))
+
+    # ----- Queries -----
+
+    def _read_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def _query(self, where: str, parameters: tuple = ()) -> List[Car]:
+        rows = self._read_connection().execute(f"SELECT {_COLUMNS} FROM visits WHERE {where} ORDER BY id",
+                                               parameters).fetchall()
+        return [self._row_to_car(row) for row in rows]
+
+    @staticmethod
+    def _row_to_car(row: tuple) -> Car:
+        license_plate, car_model, entry_time, entry_temperature, exit_time, exit_temperature = row
+
+        car = Car(license_plate, car_model)
+        car.entry_timestamp = entry_time
+        car.entry_temperature = entry_temperature
+        car.exit_timestamp = exit_time
+        car.exit_temperature = exit_temperature
+        return car
+
+    def get_visits_by_license_plate(self, license_plate: str) -> List[Car]:
+        return self._query("license_plate = ?", (license_plate,))
+
+    def get_visits_in_window(self, start: datetime, end: datetime) -> List[Car]:
+        """Get the Visits overlapping [start, end], i.e. Cars in the Car Park at any time of the window"""
+        start, end = datetime_to_timestamp(start), datetime_to_timestamp(end)
+
+        # Two index range scans: closed Visits cannot have entered more than the longest stay before the window, and
+        # open Visits are found by their missing exit time
+        return self._query("id IN (SELECT id FROM visits WHERE entry_time BETWEEN "
+                           "? - (SELECT seconds FROM max_stay WHERE id = 0) AND ? AND exit_time >= ? "
+                           "UNION SELECT id FROM visits WHERE exit_time IS NULL AND entry_time <= ?)",
+                           (start, end, start, end))
+
+    def get_visits_by_car_model(self, car_model: str, start: datetime | None = None,
+                                end: datetime | None = None) -> List[Car]:
+        """Get the Visits of a Car Model, optionally only those entered in [start, end]"""
+        start = -2 ** 63 if start is None else datetime_to_timestamp(start)
+        end = 2 ** 63 - 1 if end is None else datetime_to_timestamp(end)
+        return self._query("car_model = ? AND entry_time BETWEEN ? AND ?", (car_model, start, end))
+
+    def get_open_visits(self) -> List[Car]:
+        """Get the Visits without an Exit, i.e. the Cars still in the Car Park"""
+        return self._query("exit_time IS NULL")
+
+    def iter_visits(self, batch_size: int = 10000) -> Iterator[Car]:
+        """Stream all the Visits in order of entry, e.g. to rebuild an index from the history"""
+        cursor = self._read_connection().execute(f"SELECT {_COLUMNS} FROM visits ORDER BY entry_time")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if len(rows) == 0:
+                return
+            for row in rows:
+                yield self._row_to_car(row)
@@ -0,0 +1,100 @@
+from typing import Dict, List
+import bisect
+import threading
+
+
+def create_zone_topic(display_topic: str, zone_path: str) -> str:
+    """Create the Topic of the Availability of a Zone, e.g. "<display-topic>/zones/level1/ev".
+
+    Messages are retained, so a Display subscribing to one zone (or to "<display-topic>/zones/#") gets the current
+    availability at once. Format of Message String: "<available-bays>;<bays>"
+    """
+    return f"{display_topic}/zones/{zone_path}"
+
+
+class ZoneTree:
+    """Hierarchical Zones of a Car Park, with Occupancy Counters rolled up the Hierarchy.
+
+    Zones are given flattened, parents before their children (see flatten_zone_configs). Cars are parked in the
+    zones without sub-zones (leaves); parking or un-parking a car updates the counters of its zone and of every
+    ancestor, in O(depth), so the availability of any zone is read without scanning the cars.
+
+    The bays of a car park with zones are numbered zone by zone, following the leaves in configuration order.
+    """
+    def __init__(self, zone_configs: List[dict]):
+        self._paths: List[str] = [zone_config["path"] for zone_config in zone_configs]
+        self._ids: Dict[str, int] = {path: zone_id for zone_id, path in enumerate(self._paths)}
+        self._parents: List[int | None] = [None if zone_config["parent"] is None else self._ids[zone_config["parent"]]
+                                           for zone_config in zone_configs]
+        self._capacities: List[int] = [zone_config["bays"] for zone_config in zone_configs]
+        self._occupied: List[int] = [0] * len(zone_configs)
+
+        self._children: List[List[int]] = [[] for _ in zone_configs]
+        for zone_id, parent_id in enumerate(self._parents):
+            if parent_id is not None:
+                self._children[parent_id].append(zone_id)
+        self._top_zones = [zone_id for zone_id, parent_id in enumerate(self._parents) if parent_id is None]
+
+        # First bay of each leaf, in order, to find the zone of a bay
+        self._leaves = [zone_id for zone_id in range(len(self._paths)) if len(self._children[zone_id]) == 0]
+        self._leaf_first_bays = []
+        first_bay = 0
+        for zone_id in self._leaves:
+            self._leaf_first_bays.append(first_bay)
+            first_bay += self._capacities[zone_id]
+
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def get_zone_id(self, path: str) -> int:
+        """Get the Zone ID of a Path, e.g. "level1/ev". Raises ValueError when there is no such zone."""
+        zone_id = self._ids.get(path, None)
+        if zone_id is None:
+            raise ValueError(f"Unknown zone '{path}'")
+        return zone_id
+
+    def get_path(self, zone_id: int) -> str:
+        return self._paths[zone_id]
+
+    def get_capacity(self, zone_id: int) -> int:
+        return self._capacities[zone_id]
+
+    def get_occupied(self, zone_id: int) -> int:
+        return self._occupied[zone_id]
+
+    def get_available(self, zone_id: int) -> int:
+        return self._capacities[zone_id] - self._occupied[zone_id]
+
+    def get_zone_of_bay(self, bay_id: int) -> int:
+        """Get the Zone (leaf) of a Bay, bays being numbered zone by zone"""
+        return self._leaves[bisect.bisect_right(self._leaf_first_bays, bay_id) - 1]
+
+    def find_free_zone(self, zone_id: int | None = None) -> int | None:
+        """Find a Zone without sub-zones and with a free bay, in a zone or anywhere. Returns None when full."""
+        with self._lock:
+            candidates = self._top_zones if zone_id is None else [zone_id]
+            while True:
+                zone_id = next((candidate for candidate in candidates
+                                if self._capacities[candidate] > self._occupied[candidate]), None)
+                if zone_id is None or len(self._children[zone_id]) == 0:
+                    return zone_id
+                candidates = self._children[zone_id]
+
+    def occupy(self, zone_id: int) -> List[int]:
+        """Count a parked Car in a Zone and its ancestors. Returns the updated zones."""
+        return self._add(zone_id, 1)
+
+    def release(self, zone_id: int) -> List[int]:
+        """Count an un-parked Car out of a Zone and its ancestors. Returns the updated zones."""
+        return self._add(zone_id, -1)
+
+    def _add(self, zone_id: int | None, count: int) -> List[int]:
+        updated_zones = []
+        with self._lock:
+            while zone_id is not None:
+                self._occupied[zone_id] += count
+                updated_zones.append(zone_id)
+                zone_id = self._parents[zone_id]
+        return updated_zones
@@ -0,0 +1,53 @@
+"""Shared Test Helpers: offline Devices from a minimal Configuration, and Fakes"""
+from typing import List, Tuple
+
+import paho.mqtt.client as paho
+
+from smartpark.carpark import SimulatedCarPark
+from smartpark.mqtt_device import MqttDevice
+from smartpark.sensor import EntrySensor
+
+
+DEVICE_CONFIG = {"location": "L1", "topic-root": "carpark", "host": "localhost", "port": 1883}
+
+
+class FakeClock:
+    """Clock moved by hand, in seconds"""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def record_publishes(device: MqttDevice) -> List[Tuple[str, str]]:
+    """Record the Publications of a Device instead of sending them. Returns the list of (topic, payload)."""
+    published = []
+
+    def publish(topic: str, payload: str | None = None, *args, **kwargs) -> paho.MQTTMessageInfo:
+        published.append((topic, payload))
+        return paho.MQTTMessageInfo(0)
+
+    device.client.publish = publish
+    return published
+
+
+class RecordingEntrySensor(EntrySensor):
+    """Entry Sensor recording its publications instead of sending them, at a constant temperature"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.published = record_publishes(self)
+
+    def temperature_generator(self):
+        return 25
+
+
+def create_sensor(sensor_type=RecordingEntrySensor, name: str = "sensor1", topic_qualifier: str = "entry", **config):
+    """Offline Sensor, with the optional settings in 'config'"""
+    return sensor_type(DEVICE_CONFIG | {"name": name, "topic-qualifier": topic_qualifier} | config, connect=False)
+
+
+def create_car_park(name: str, total_bays: int = 5, car_park_type=SimulatedCarPark, **config):
+    """Offline Car Park, with the optional settings in 'config'. A 'clock' is passed to the constructor."""
+    kwargs = {"clock": config.pop("clock")} if "clock" in config else {}
+    return car_park_type(DEVICE_CONFIG | {"name": name, "total_bays": total_bays} | config, connect=False, **kwargs)
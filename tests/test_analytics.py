@@ -0,0 +1,86 @@
+import unittest
+import json
+import random
+import statistics
+from datetime import datetime, timedelta
+
+from smartpark.analytics import KLLSketch, EWMARate, RunningStats
+from smartpark.carpark import CarPark
+from smartpark.simulation import VirtualClock, CarParkSimulation, exponential_dwell_time
+
+from helpers import create_car_park
+
+
+class TestSketches(unittest.TestCase):
+    def test_kll_quantiles(self):
+        rng = random.Random(0)
+        values = [rng.uniform(0, 1000) for _ in range(100000)]
+
+        sketch = KLLSketch(k=200, seed=0)
+        for value in values:
+            sketch.update(value)
+
+        self.assertEqual(len(sketch), len(values))
+        self.assertLess(sum(len(c) for c in sketch._compactors), 1000)  # Constant memory
+        for fraction, quantile in zip([0.1, 0.5, 0.9], sketch.quantiles([0.1, 0.5, 0.9])):
+            self.assertAlmostEqual(quantile, fraction * 1000, delta=25)
+
+        # Merging the sketches of two halves is as good as one sketch
+        first, second = KLLSketch(seed=1), KLLSketch(seed=2)
+        for i, value in enumerate(values):
+            (first if i % 2 == 0 else second).update(value)
+        first.merge(second)
+        self.assertEqual(len(first), len(values))
+        self.assertAlmostEqual(first.quantiles([0.5])[0], 500, delta=25)
+
+        self.assertEqual(KLLSketch().quantiles([0.5]), [None])
+
+    def test_ewma_rate(self):
+        rate = EWMARate(horizons=[60, 3600])
+        for second in range(0, 7200, 10):  # One event every 10 s, i.e. 360 per hour
+            rate.update(second)
+
+        rates = rate.rates(7200)
+        self.assertAlmostEqual(rates[60], 360, delta=60)
+        self.assertAlmostEqual(rates[3600], 360 * (1 - 2.718 ** -2), delta=20)  # Still warming up
+        self.assertLess(rate.rates(7800)[60], 1)  # Quiet for 10 minutes
+
+    def test_running_stats(self):
+        values = [20.5, 22.0, 25.5, 19.0, 30.0]
+        stats, first, second = RunningStats(), RunningStats(), RunningStats()
+        for i, value in enumerate(values):
+            stats.update(value)
+            (first if i < 2 else second).update(value)
+        first.merge(second)
+
+        for running_stats in [stats, first]:
+            self.assertAlmostEqual(running_stats.mean, statistics.mean(values))
+            self.assertAlmostEqual(running_stats.stddev, statistics.stdev(values))
+            self.assertEqual((running_stats.min, running_stats.max), (19.0, 30.0))
+
+
+class TestCarParkAnalytics(unittest.TestCase):
+    def test_simulated_week(self):
+        clock = VirtualClock(datetime(2026, 1, 5))
+        car_park = create_car_park("carpark_analytics", 500, CarPark, clock=clock, analytics=True,
+                                   analytics_interval=3600)
+        simulation = CarParkSimulation(car_park, clock, arrival_rate=60, dwell_time=exponential_dwell_time(3600),
+                                       seed=0)
+        simulation.run(timedelta(days=7))
+
+        summary = json.loads(car_park.publish_analytics())
+        self.assertAlmostEqual(summary["dwell_seconds"]["p50"], 3600 * 0.693, delta=300)  # Median of exponential
+        self.assertEqual(list(summary["dwell_seconds_by_model"].keys()), ["ModelA"])
+        self.assertAlmostEqual(summary["arrivals_per_hour"]["86400s"], 60, delta=10)
+        self.assertEqual(summary["entry_temperature"]["mean"], 20)
+
+        # A quiet day later, whatever the time of the last event, the rates decayed
+        car_park.event_time = clock()
+        clock.advance_to(clock() + timedelta(days=1))
+        summary = json.loads(car_park.publish_analytics())
+        self.assertLess(summary["arrivals_per_hour"]["3600s"], 1e-6)
+        self.assertLess(summary["arrivals_per_hour"]["86400s"], 60 * 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from datetime import datetime
+
+from smartpark.car import Car
+from smartpark.bays import BayMap, decode_bay_state
+
+from helpers import create_car_park
+
+
+class TestBayMap(unittest.TestCase):
+    def test_allocation(self):
+        bays = BayMap([30, 10, 20, 10])
+
+        # Nearest first, ties broken by id
+        self.assertEqual([bays.allocate() for _ in range(4)], [1, 3, 2, 0])
+        self.assertIsNone(bays.allocate())
+        self.assertEqual(bays.free_bays, 0)
+
+        bays.release(2)
+        bays.release(2)
+        bays.release(1)
+        self.assertEqual(bays.free_bays, 2)
+        self.assertEqual(bays.get_occupied_bays(), [0, 3])
+        self.assertEqual(bays.allocate(), 1)
+
+        with self.assertRaises(ValueError):
+            BayMap.from_config(3, [1, 2])
+
+    def test_encoding(self):
+        bays = BayMap.from_config(10)
+        for _ in range(9):
+            bays.allocate()
+        bays.release(4)
+
+        occupied, assigned_bay = decode_bay_state(bays.encode(8))
+        self.assertEqual(occupied, [True] * 4 + [False] + [True] * 4 + [False])
+        self.assertEqual(assigned_bay, 8)
+        self.assertIsNone(decode_bay_state(bays.encode())[1])
+
+
+class TestCarParkBays(unittest.TestCase):
+    def test_park_and_exit(self):
+        car_park = create_car_park("carpark1", 3, bay_assignment=True, bay_distances=[5, 1, 3])
+        car_park.temperature = 25
+        car_park.event_time = datetime(2024, 1, 1, 9)
+
+        cars = [Car("A", "ModelA"), Car("B", "ModelB")]
+        for car in cars:
+            car_park.add_car(car)
+            car_park.park_car(car)
+        self.assertEqual([car.bay_id for car in cars], [1, 2])
+        self.assertEqual(car_park.bays.get_occupied_bays(), [1, 2])
+
+        car_park.remove_car(cars[0])
+        self.assertIsNone(cars[0].bay_id)
+        self.assertEqual(car_park.bays.get_occupied_bays(), [2])
+
+        car = Car("C", "ModelC")
+        car_park.add_car(car)
+        car_park.park_car(car)
+        self.assertEqual(car.bay_id, 1)
+
+        # Parking a parked car keeps its bay, and takes no other
+        self.assertFalse(car_park.park_car(car))
+        self.assertEqual(car.bay_id, 1)
+        self.assertEqual(car_park.bays.get_occupied_bays(), [1, 2])
+        self.assertEqual(car_park.available_bays, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from datetime import datetime
+
+from smartpark.car import Car
+
+
+class TestCar(unittest.TestCase):
+    def setUp(self) -> None:
+        self.car = Car("ABC-123", "ModelA")
+        self.car.entered_car_park(24.5, datetime(2024, 3, 31, 2, 30, 15, 999999))
+        self.car.car_parked()
+
+    def test_compact(self):
+        self.assertFalse(hasattr(self.car, "__dict__"))
+
+        with self.assertRaises(AttributeError):
+            self.car.colour = "red"
+
+        other_car = Car("XYZ-789", "".join(["Model", "A"]))
+        self.assertIs(other_car.car_model, self.car.car_model)
+
+    def test_times(self):
+        # Times are kept to the second, like the JSON and CSV formats
+        self.assertEqual(self.car.entry_time, datetime(2024, 3, 31, 2, 30, 15))
+        # Naive times round-trip exactly, even when they do not exist in the local time zone (e.g. DST changes)
+        self.assertEqual(self.car.entry_timestamp,
+                         (datetime(2024, 3, 31, 2, 30, 15) - datetime(1970, 1, 1)).total_seconds())
+        self.assertIsNone(self.car.exit_time)
+        self.assertIsNone(self.car.exit_timestamp)
+
+        self.car.exited_car_park(25, datetime(2024, 3, 31, 5, 0, 0))
+        self.assertEqual(self.car.exit_time, datetime(2024, 3, 31, 5, 0, 0))
+        self.assertFalse(self.car.is_parked)
+
+    def test_formats(self):
+        self.assertEqual(self.car.to_csv_format(), "ABC-123,ModelA,2024-03-31 02:30:15,null,24.5,null,True")
+
+        for car in [Car.from_json(self.car.to_json_format()), Car.from_csv(self.car.to_csv_format())]:
+            self.assertEqual(car.to_json_format(), self.car.to_json_format())
+            self.assertEqual(car.entry_time, self.car.entry_time)
+            self.assertTrue(car.is_parked)
+
+
+if __name__ == '__main__':
+    unittest.main()
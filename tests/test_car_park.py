@@ -9,6 +9,8 @@ from smartpark.sensor import Detector
 from smartpark.car import Car
 from smartpark.project_paths import PROJECT_ROOT_DIR
 
+from helpers import create_car_park
+
 
 random.seed(0)
 
@@ -121,6 +123,28 @@ class TestCarPark(unittest.TestCase):
 
         self.assertEqual(counter, 30)
 
+    def test_parked_count(self):
+        """Test the Number of Parked Cars kept by the Car Park"""
+        car_park = create_car_park("carpark_count", 3)
+        car_park.temperature = 25
+        cars = [Car("A", "ModelA"), Car("B", "ModelB"), Car("C", "ModelC")]
+
+        car_park.park_car(cars[0])  # Parked before it is added, e.g. loaded from a store: counted once, when added
+        for car in cars:
+            car_park.add_car(car)
+        car_park.park_car(cars[1])
+        car_park.park_car(cars[1])
+        self.assertEqual((car_park.parked_cars, car_park.un_parked_cars, car_park.available_bays), (2, 1, 1))
+
+        cars[2].car_parked()  # Directly, e.g. by a subclass: counted too
+        self.assertEqual((car_park.parked_cars, car_park.un_parked_cars, car_park.available_bays), (3, 0, 0))
+        cars[2].car_unparked()
+
+        car_park.unpark_car(cars[0])
+        car_park.remove_car(cars[0])
+        car_park.remove_car(cars[1])
+        self.assertEqual((car_park.parked_cars, car_park.un_parked_cars, car_park.available_bays), (0, 1, 3))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+
+import paho.mqtt.client as paho
+
+from smartpark.carpark import DUPLICATES
+from smartpark.dedup import EventDeduplicator, SequenceWindow
+from smartpark.sensor_message import SensorMessage
+
+from helpers import create_car_park
+
+
+class TestEventDeduplicator(unittest.TestCase):
+    def test_sequence_window(self):
+        window = SequenceWindow(8)
+        self.assertEqual([window.check(seq) for seq in [1, 3, 2, 3, 1]], [False, False, False, True, True])
+        self.assertFalse(window.check(20))
+        self.assertIsNone(window.check(3))  # Before the window
+        self.assertFalse(window.check(13))
+        self.assertTrue(window.check(13))
+
+    def test_duplicates(self):
+        deduplicator = EventDeduplicator(window_size=4, max_event_ids=2)
+        self.assertFalse(deduplicator.is_duplicate("sensor1", 1, "a"))
+        self.assertFalse(deduplicator.is_duplicate("sensor2", 1, "x"))  # Sensors are independent
+        self.assertTrue(deduplicator.is_duplicate("sensor1", 1, "a"))
+        self.assertTrue(deduplicator.is_duplicate("sensor1", event_id="a"))
+        self.assertFalse(deduplicator.is_duplicate("sensor1"))
+
+        for seq, event_id in [(2, "b"), (3, "c"), (10, "d")]:
+            self.assertFalse(deduplicator.is_duplicate("sensor1", seq, event_id))
+
+        # Before the window, a recent event id is still a duplicate
+        self.assertTrue(deduplicator.is_duplicate("sensor1", 3, "c"))
+
+        # Otherwise the sensor restarted: its window starts over
+        self.assertFalse(deduplicator.is_duplicate("sensor1", 1, "e"))
+        self.assertTrue(deduplicator.is_duplicate("sensor1", 1, "e"))
+        self.assertTrue(deduplicator.is_duplicate("sensor1", 1))
+        self.assertFalse(deduplicator.is_duplicate("sensor1", 2, "g"))
+
+    def test_restart_in_window(self):
+        deduplicator = EventDeduplicator(window_size=64, max_event_ids=64)
+        for seq in range(1, 11):
+            self.assertFalse(deduplicator.is_duplicate("sensor1", seq, f"event{seq}"))
+
+        # The sensor restarted from 1 with new event ids, while its old sequence numbers are still in the window
+        for seq in range(1, 11):
+            self.assertFalse(deduplicator.is_duplicate("sensor1", seq, f"restarted{seq}"))
+            self.assertTrue(deduplicator.is_duplicate("sensor1", seq, f"restarted{seq}"))
+        self.assertTrue(deduplicator.is_duplicate("sensor1", 10))
+        self.assertFalse(deduplicator.is_duplicate("sensor1", 11))
+
+    def test_constant_memory(self):
+        deduplicator = EventDeduplicator(window_size=64, max_event_ids=64)
+        for seq in range(1, 1001):
+            deduplicator.is_duplicate("sensor1", seq, f"event{seq}")
+        size = sys.getsizeof(deduplicator._event_ids["sensor1"])
+
+        for seq in range(1001, 100001):
+            deduplicator.is_duplicate("sensor1", seq, f"event{seq}")
+        self.assertEqual(len(deduplicator._event_ids["sensor1"]), 64)
+        self.assertEqual(sys.getsizeof(deduplicator._event_ids["sensor1"]), size)
+        self.assertLess(deduplicator._windows["sensor1"]._mask.bit_length(), 65)
+
+    def test_invalid_sequence(self):
+        self.assertEqual(SensorMessage.from_payload("Enter,24,seq=7").seq, 7)
+        self.assertRaises(ValueError, lambda: SensorMessage.from_payload("Enter,24,seq=x"))
+
+
+class TestCarParkDuplicates(unittest.TestCase):
+    def test_redelivery(self):
+        car_park = create_car_park("carpark_dedup")
+        duplicates = DUPLICATES.labels("carpark_dedup").value
+
+        for payload in [b"Enter,24,id=a,seq=1", b"Enter,24,id=a,seq=1", b"Enter,25,id=b,seq=2"]:
+            message = paho.MQTTMessage(topic=b"carpark/L1/sensor1/entry")
+            message.payload = payload
+            car_park.on_message(car_park.client, None, message)
+
+        self.assertEqual(car_park.total_cars, 2)
+        self.assertEqual(DUPLICATES.labels("carpark_dedup").value - duplicates, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
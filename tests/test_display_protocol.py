@@ -0,0 +1,51 @@
+import unittest
+
+from smartpark.display_protocol import DeltaEncoder, DeltaDecoder, create_keyframe_request_topic
+
+
+class TestDisplayProtocol(unittest.TestCase):
+    def setUp(self) -> None:
+        self.encoder = DeltaEncoder(keyframe_interval=5)
+        self.decoder = DeltaDecoder()
+        self.fields = ["5", "24.0", "2024-01-01 10:00:00", "0", "0", "0"]
+
+    def test_delta_round_trip(self):
+        """Test Deltas only carry the changed fields and rebuild the full message"""
+        self.assertTrue(self.encoder.encode(self.fields).startswith("K;1;"))
+        self.assertEqual(self.decoder.decode("K;1;" + ";".join(self.fields)), self.fields)
+
+        new_fields = ["4", "24.0", "2024-01-01 10:00:05", "1", "1", "0"]
+        msg = self.encoder.encode(new_fields)
+        self.assertEqual(msg, "D;2;0=4;2=2024-01-01 10:00:05;3=1;4=1")
+        self.assertEqual(self.decoder.decode(msg), new_fields)
+
+    def test_periodic_keyframe(self):
+        """Test a Keyframe is sent every 'keyframe_interval' messages"""
+        kinds = [self.encoder.encode(self.fields)[0] for _ in range(11)]
+        self.assertEqual(kinds, ["K", "D", "D", "D", "D", "K", "D", "D", "D", "D", "K"])
+
+    def test_gap_detection(self):
+        """Test a gap in sequence numbers drops deltas until the next keyframe"""
+        messages = [self.encoder.encode(self.fields[:3] + [str(i), str(i), "0"]) for i in range(5)]
+
+        self.assertIsNotNone(self.decoder.decode(messages[0]))
+        self.assertIsNone(self.decoder.decode(messages[2]))  # messages[1] was lost
+        self.assertTrue(self.decoder.pop_keyframe_request())
+        self.assertIsNone(self.decoder.decode(messages[3]))
+        self.assertFalse(self.decoder.pop_keyframe_request())  # Only requested once per gap
+
+        self.encoder.request_keyframe()
+        keyframe = self.encoder.encode(self.fields)
+        self.assertTrue(keyframe.startswith("K;"))
+        self.assertEqual(self.decoder.decode(keyframe), self.fields)
+        self.assertFalse(self.decoder.awaiting_keyframe)
+
+    def test_legacy_message(self):
+        """Test full messages without the protocol header are passed as-is"""
+        self.assertEqual(self.decoder.decode(";".join(self.fields)), self.fields)
+        self.assertEqual(create_keyframe_request_topic("carpark1/Moondaloop Park/carpark1/display"),
+                         "carpark1/Moondaloop Park/carpark1/display/keyframe")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import threading
+import time
+
+import paho.mqtt.client as paho
+
+from smartpark.executor import KeyedExecutor, get_executor
+
+from helpers import create_car_park
+
+
+class TestKeyedExecutor(unittest.TestCase):
+    def setUp(self) -> None:
+        self.executor = KeyedExecutor(4, name="test-executor")
+
+    def tearDown(self) -> None:
+        self.executor.shutdown()
+
+    def test_key_order(self):
+        handled = {key: [] for key in ["carpark1", "carpark2", "carpark3"]}
+        for i in range(100):
+            for key in handled:
+                self.executor.submit(key, handled[key].append, i)
+        self.executor.shutdown()
+
+        for key in handled:
+            self.assertEqual(handled[key], list(range(100)))
+
+    def test_parallel_keys(self):
+        slow_key = "carpark1"
+        fast_key = next(key for key in ["carpark2", "carpark3", "carpark4", "carpark5"]
+                        if self.executor.get_worker(key) != self.executor.get_worker(slow_key))
+
+        release = threading.Event()
+        handled = threading.Event()
+        self.executor.submit(slow_key, release.wait, 1)  # e.g. slow disk I/O
+        self.executor.submit(fast_key, handled.set)
+
+        self.assertTrue(handled.wait(0.5))  # Not stalled by the slow key
+        release.set()
+
+    def test_errors(self):
+        handled = threading.Event()
+        self.executor.submit("carpark1", lambda: 1 / 0)
+        self.executor.submit("carpark1", exit)
+        self.executor.submit("carpark1", handled.set)
+        self.assertTrue(handled.wait(0.5))  # The worker survives
+
+        with self.assertRaises(ValueError):
+            KeyedExecutor(0)
+
+
+class TestCarParkWorkers(unittest.TestCase):
+    def test_messages(self):
+        car_park = create_car_park("carpark_workers", 100, message_workers=2)
+        self.assertIs(car_park._executor, get_executor(2))
+
+        for payload in [b"Enter,25"] * 5 + [b"Exit,25"] * 2:
+            message = paho.MQTTMessage(topic=b"carpark/L1/sensor1/entry")
+            message.payload = payload
+            car_park.client.on_message(car_park.client, None, message)
+
+        deadline = time.monotonic() + 2
+        while car_park.total_cars != 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(car_park.total_cars, 3)
+
+        with self.assertRaises(ValueError):
+            create_car_park("carpark_workers", 100, message_workers=2, ingress_queue_size=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
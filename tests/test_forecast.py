@@ -0,0 +1,114 @@
+import unittest
+import importlib.util
+import math
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from smartpark.car import datetime_to_timestamp, timestamp_to_datetime
+
+from helpers import create_car_park
+
+
+@unittest.skipIf(importlib.util.find_spec("numpy") is None, "Forecasting requires NumPy")
+class TestOccupancyForecaster(unittest.TestCase):
+    START = datetime(2026, 1, 5)  # A Monday
+
+    def daily_pattern(self, timestamp: int, total_bays: int) -> float:
+        """Empty at night, full around noon"""
+        hour = (timestamp % 86400) / 3600
+        return total_bays * (0.55 + 0.45 * math.cos(2 * math.pi * hour / 24))
+
+    def create_histories(self, total_bays, days: int = 14):
+        import numpy as np
+
+        timestamps = np.arange(datetime_to_timestamp(self.START), datetime_to_timestamp(self.START) + days * 86400,
+                               300)
+        return [(timestamps, np.array([round(self.daily_pattern(t, bays)) for t in timestamps])) for bays in total_bays]
+
+    def test_seasonal(self):
+        from smartpark.forecast import OccupancyForecaster
+
+        total_bays = [100, 500, 2000]
+        forecaster = OccupancyForecaster(total_bays, horizons=[1800, 3600])
+        forecaster.fit(self.create_histories(total_bays))
+
+        now = datetime_to_timestamp(self.START + timedelta(days=14)) - 300  # The last sample
+        forecasts = forecaster.forecast(now)
+        self.assertEqual(forecasts.shape, (3, 2))
+        for i, bays in enumerate(total_bays):
+            for j, horizon in enumerate([1800, 3600]):
+                self.assertAlmostEqual(forecasts[i, j], self.daily_pattern(now + horizon, bays), delta=0.03 * bays)
+
+    def test_trend(self):
+        from smartpark.forecast import OccupancyForecaster
+
+        forecaster = OccupancyForecaster([100], horizons=[1800, 3600])
+        forecaster.fit(self.create_histories([100]))
+        now = datetime_to_timestamp(self.START + timedelta(days=14, hours=6))
+        seasonal = forecaster.forecast(now)[0]
+
+        # An event nearby fills the car park faster than usual
+        for minutes in range(0, 61, 10):
+            timestamp = now - 3600 + minutes * 60
+            forecaster.update(0, timestamp, round(self.daily_pattern(timestamp, 100)) - minutes // 2)
+
+        forecasts = forecaster.forecast(now)[0]
+        self.assertLess(forecasts[0], seasonal[0] - 20)
+        self.assertGreaterEqual(forecasts[1], 0)
+        self.assertGreater(forecasts[1] - seasonal[1], forecasts[0] - seasonal[0])  # Fading out
+
+    def test_display_history(self):
+        from smartpark.carpark import CarPark
+        from smartpark.forecast import load_display_history
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "display_messages.txt")
+            display_topic = "carpark/L1/carpark_forecast/display"
+            timestamps, available = self.create_histories([10], days=7)[0]
+            with open(file_path, "w") as file:
+                for timestamp, bays in zip(timestamps, available):
+                    time_str = timestamp_to_datetime(int(timestamp)).strftime('%Y-%m-%d %H:%M:%S')
+                    for topic in [display_topic, display_topic, "carpark/L1/carpark_other/display"]:  # Two displays
+                        file.write(f"{bays},25,{time_str},{10 - bays},{10 - bays},0,{topic}\n")
+                file.write("invalid\n")
+
+            loaded_timestamps, loaded_available = load_display_history(file_path, display_topic)
+            self.assertEqual(loaded_timestamps.tolist(), timestamps.tolist())
+            self.assertEqual(loaded_available.tolist(), available.tolist())
+
+            # Lines stored without the display topic, plain or traced, are read for any car park
+            legacy_path = os.path.join(directory, "legacy_display_messages.txt")
+            with open(legacy_path, "w") as file:
+                file.write("3,25,2026-01-05 08:00:00,7,7,0\n")
+                file.write("2,25,2026-01-05 09:00:00,8,8,0,event1|1767600000.0|1767600000.1\n")
+            self.assertEqual(load_display_history(legacy_path, display_topic)[1].tolist(), [3, 2])
+
+            car_park = create_car_park("carpark_forecast", 10, CarPark, forecast_history=file_path,
+                                       forecast_horizons=[1800, 3600])
+            self.assertEqual(car_park.display_topic, display_topic)
+            unfitted = car_park.forecaster
+            deadline = time.monotonic() + 5
+            while car_park.forecaster is unfitted and time.monotonic() < deadline:  # Fitted in the background
+                time.sleep(0.01)
+            self.assertIsNot(car_park.forecaster, unfitted)
+
+            car_park.event_time = self.START + timedelta(days=7)
+            horizons = [horizon.split(":") for horizon in car_park.publish_forecast().split(";")]
+            self.assertEqual([minutes for minutes, _ in horizons], ["30", "60"])
+            self.assertTrue(all(0 <= int(bays) <= 10 for _, bays in horizons))
+
+    def test_first_run(self):
+        from smartpark.carpark import CarPark
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "display_messages.txt")  # Not stored yet
+            car_park = create_car_park("carpark_forecast_first_run", 10, CarPark, forecast_history=file_path,
+                                       forecast_horizons=[1800])
+            car_park.event_time = self.START
+            self.assertEqual(car_park.publish_forecast(), "30:10")  # From the live state only
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import threading
+import time
+
+import paho.mqtt.client as paho
+
+from smartpark.carpark import SENSORS_DOWN
+from smartpark.heartbeat import SensorLivenessMonitor
+
+from helpers import create_car_park, create_sensor
+
+
+class TestSensorLivenessMonitor(unittest.TestCase):
+    def test_down_and_recovered(self):
+        monitor = SensorLivenessMonitor(timeout=10, now=0)
+        monitor.watch("sensor1", 0)
+        monitor.watch("sensor2", 0)
+
+        self.assertEqual(monitor.check(5), [])
+        self.assertFalse(monitor.beat("sensor1", 5))
+        self.assertEqual(monitor.check(12), ["sensor2"])
+        self.assertEqual(monitor.check(13), [])  # Reported once
+        self.assertEqual(monitor.check(16), ["sensor1"])
+        self.assertEqual(monitor.down_sensors, {"sensor1", "sensor2"})
+
+        self.assertTrue(monitor.beat("sensor2", 20))
+        self.assertFalse(monitor.is_down("sensor2"))
+        self.assertFalse(monitor.beat("sensor3", 20))  # Not watched
+
+        monitor.unwatch("sensor1")
+        self.assertEqual(monitor.down_sensors, set())
+        self.assertEqual(monitor.check(100), ["sensor2"])
+
+
+class TestHeartbeat(unittest.TestCase):
+    def test_sensor(self):
+        sensor = create_sensor()
+        sensor.send_heartbeat()
+        self.assertEqual(sensor.published[0][0], "carpark/L1/sensor1/entry/heartbeat")
+        self.assertAlmostEqual(float(sensor.published[0][1]), time.time(), delta=5)
+
+    def test_car_park(self):
+        car_park = create_car_park("carpark_heartbeat", sensor_timeout=30, sensor_check_interval=3600)
+        car_park.register_sensor_topic("carpark/L1/sensor1/entry")
+        car_park.register_sensor_topic("carpark/L1/sensor2/exit")
+        now = time.monotonic()
+
+        heartbeat = paho.MQTTMessage(topic=b"carpark/L1/sensor1/entry/heartbeat")
+        heartbeat.payload = f"{time.time()}".encode()
+        car_park._on_heartbeat(car_park.client, None, heartbeat)
+
+        self.assertEqual(car_park.check_sensors(now + 10), [])
+        self.assertEqual(sorted(car_park.check_sensors(now + 40)),
+                         ["carpark/L1/sensor1/entry", "carpark/L1/sensor2/exit"])
+        self.assertEqual(SENSORS_DOWN.labels("carpark_heartbeat").value, 2)
+
+        # A detection is a sign of life too
+        detection = paho.MQTTMessage(topic=b"carpark/L1/sensor2/exit")
+        detection.payload = b"Exit,25"
+        car_park.on_message(car_park.client, None, detection)
+        self.assertEqual(car_park.sensor_liveness.down_sensors, {"carpark/L1/sensor1/entry"})
+
+        car_park.unregister_sensor_topic("carpark/L1/sensor1/entry")
+        self.assertEqual(SENSORS_DOWN.labels("carpark_heartbeat").value, 0)
+
+    def test_busy_ingress(self):
+        car_park = create_car_park("carpark_heartbeat_busy", sensor_timeout=30, sensor_check_interval=3600,
+                                   ingress_queue_size=1)
+        car_park.register_sensor_topic("carpark/L1/sensor1/entry")
+        self.assertEqual(car_park.check_sensors(time.monotonic() + 40), ["carpark/L1/sensor1/entry"])
+
+        # The worker is busy and its queue is full
+        released = threading.Event()
+        telemetry = paho.MQTTMessage(topic=b"carpark/L1/sensor2/exit/telemetry")
+        telemetry.payload = b"25"
+        car_park._admit(lambda *args: released.wait(1))(car_park.client, None, telemetry)
+        car_park._admit(car_park._on_telemetry, event=False)(car_park.client, None, telemetry)
+
+        heartbeat = paho.MQTTMessage(topic=b"carpark/L1/sensor1/entry/heartbeat")
+        heartbeat.payload = f"{time.time()}".encode()
+        car_park.client._handle_on_message(heartbeat)
+        self.assertEqual(car_park.sensor_liveness.down_sensors, set())  # Recorded on arrival, not shed
+        released.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import threading
+import time
+
+import paho.mqtt.client as paho
+
+from smartpark.carpark import MESSAGE_ERRORS, SHED_MESSAGES
+from smartpark.ingress import IngressQueue
+
+from helpers import create_car_park
+
+
+class TestIngressQueue(unittest.TestCase):
+    def test_priority(self):
+        queue = IngressQueue(10)
+        queue.put("telemetry1", event=False)
+        queue.put("entry")
+        queue.put("telemetry2", event=False)
+        queue.put("exit")
+
+        self.assertEqual(len(queue), 4)
+        self.assertEqual(queue.pending_events, 2)
+        self.assertEqual([queue.get() for _ in range(4)], ["entry", "exit", "telemetry1", "telemetry2"])
+        self.assertIsNone(queue.get(timeout=0.01))
+
+    def test_drop_oldest(self):
+        queue = IngressQueue(2)
+        self.assertEqual(queue.put("telemetry1", event=False), 0)
+        self.assertEqual(queue.put("entry"), 0)
+        self.assertEqual(queue.put("exit"), 1)  # The telemetry makes room for the event
+        self.assertEqual(queue.put("telemetry2", event=False), 1)  # Full of events: the telemetry is dropped
+
+        self.assertEqual(queue.dropped, 2)
+        self.assertEqual([queue.get(), queue.get()], ["entry", "exit"])
+
+        with self.assertRaises(ValueError):
+            IngressQueue(1, overflow="drop-newest")
+
+    def test_block(self):
+        queue = IngressQueue(1, overflow=IngressQueue.BLOCK)
+        queue.put("telemetry", event=False)
+
+        producer = threading.Thread(target=queue.put, args=("entry",))
+        producer.start()
+        time.sleep(0.05)
+        self.assertTrue(producer.is_alive())  # Waits for room
+
+        self.assertEqual(queue.get(), "telemetry")
+        producer.join(1)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(queue.get(), "entry")
+        self.assertEqual(queue.dropped, 0)
+
+
+class TestCarParkIngress(unittest.TestCase):
+    def test_burst(self):
+        car_park = create_car_park("carpark_ingress", 100, ingress_queue_size=100)
+        shed_displays = SHED_MESSAGES.labels("carpark_ingress", "display").value
+
+        # Delay the worker, so that the burst is queued behind the first message
+        published = threading.Event()
+        publish_to_display = car_park.publish_to_display
+
+        def wait_and_publish():
+            published.wait(1)
+            return publish_to_display()
+
+        car_park.publish_to_display = wait_and_publish
+
+        for _ in range(10):
+            message = paho.MQTTMessage(topic=b"carpark/L1/sensor1/entry")
+            message.payload = b"Enter,25"
+            car_park.client.on_message(car_park.client, None, message)
+        published.set()
+
+        deadline = time.monotonic() + 2
+        while (car_park.total_cars < 10 or len(car_park._ingress) > 0) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(car_park.total_cars, 10)  # Events are never dropped
+        self.assertGreater(SHED_MESSAGES.labels("carpark_ingress", "display").value - shed_displays, 0)
+        self.assertFalse(car_park._display_pending)  # The final state was published
+
+    def test_telemetry_before_event(self):
+        car_park = create_car_park("carpark_ingress_telemetry", 100, ingress_queue_size=100)
+        car_park.register_sensor_topic("carpark/L1/sensor1/entry")
+
+        # The worker is busy: the telemetry and the event wait, and the events come first in the queue
+        released = threading.Event()
+        car_park._admit(lambda *args: released.wait(1))(car_park.client, None, None)
+
+        telemetry = paho.MQTTMessage(topic=b"carpark/L1/sensor1/entry/telemetry")
+        telemetry.payload = b"23.50"
+        car_park.client._handle_on_message(telemetry)
+        entry = paho.MQTTMessage(topic=b"carpark/L1/sensor1/entry")
+        entry.payload = b"Enter,"
+        car_park.client._handle_on_message(entry)
+        released.set()
+
+        deadline = time.monotonic() + 2
+        while car_park.total_cars < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(car_park.total_cars, 1)
+        self.assertEqual(car_park.get_all_cars()[0].entry_temperature, 23.5)
+
+    def test_handler_error(self):
+        car_park = create_car_park("carpark_ingress_error", 100, ingress_queue_size=100)
+        errors = MESSAGE_ERRORS.labels("carpark_ingress_error").value
+
+        def fail(client, userdata, message):
+            raise RuntimeError("handler failed")
+
+        message = paho.MQTTMessage(topic=b"carpark/L1/sensor1/entry")
+        message.payload = b"Enter,25"
+        with self.assertLogs(car_park.logger, "ERROR"):
+            car_park._admit(fail)(car_park.client, None, message)
+            car_park.client.on_message(car_park.client, None, message)  # The worker goes on after the error
+
+            deadline = time.monotonic() + 2
+            while car_park.total_cars < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        self.assertEqual(MESSAGE_ERRORS.labels("carpark_ingress_error").value - errors, 1)
+        self.assertEqual(car_park.total_cars, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
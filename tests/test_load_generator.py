@@ -0,0 +1,73 @@
+import unittest
+
+from smartpark.config import Config
+from smartpark.load_generator import LoadGenerator
+from smartpark.sensor import DETECTIONS
+from smartpark.sensor_message import SensorMessage
+from smartpark.project_paths import PROJECT_ROOT_DIR
+
+from helpers import record_publishes
+
+
+class TestLoadGenerator(unittest.TestCase):
+    def test_max_events(self):
+        load_generator = LoadGenerator(Config(PROJECT_ROOT_DIR / 'tests' / 'sample_config.toml'), rate=100000,
+                                       seed=0, connect=False)
+        published = {sensor.topic_address: record_publishes(sensor) for sensor in load_generator.sensors}
+        detections = sum(DETECTIONS.labels(topic).value for topic in published)
+
+        report = load_generator.run(duration=None, max_events=200)
+
+        self.assertEqual(report["Events"], 200)
+        self.assertEqual(report["Publish Errors"], 0)
+        self.assertEqual(report["Max Queue Depth"], 0)
+        self.assertEqual(sum(DETECTIONS.labels(topic).value for topic in published) - detections, 200)
+
+        # Published through the Sensors, with the metadata used for deduplication and ordering
+        for sensor_topic, messages in published.items():
+            self.assertGreater(len(messages), 0)
+            sequences = []
+            for topic, payload in messages:
+                self.assertEqual(topic, sensor_topic)
+                sensor_message = SensorMessage.from_payload(payload)
+                self.assertEqual(sensor_message.signal, "Enter" if topic.endswith("entry") else "Exit")
+                self.assertIsNotNone(sensor_message.event_id)
+                self.assertIsNotNone(sensor_message.timestamp)
+                sequences.append(sensor_message.seq)
+            self.assertEqual(sequences, list(range(1, len(messages) + 1)))
+
+    def test_invalid_arguments(self):
+        config = Config(PROJECT_ROOT_DIR / 'tests' / 'sample_config.toml')
+        with self.assertRaises(ValueError):
+            LoadGenerator(config, arrivals="burst", connect=False)
+        with self.assertRaises(ValueError):
+            LoadGenerator(config, arrivals=LoadGenerator.TRACE, connect=False)
+        with self.assertRaises(ValueError):
+            LoadGenerator(config, rate=100, connect=False).run(duration=None)
+
+    def test_sensors_per_car_park(self):
+        load_generator = LoadGenerator(Config(PROJECT_ROOT_DIR / 'tests' / 'sample_config.toml'), rate=100000,
+                                       seed=0, connect=False, sensors_per_car_park=10)
+        published = {sensor.topic_address: record_publishes(sensor) for sensor in load_generator.sensors}
+
+        # Synthetic Sensors, each on its own topic
+        self.assertEqual(len(load_generator.sensors), 20)
+        self.assertEqual(len(published), 20)
+        self.assertEqual(sorted(load_generator.sensor_topics), ["carpark1", "carpark2"])
+        self.assertIn("carpark1/L306/sensor1-v0/entry", load_generator.sensor_topics["carpark1"])
+        self.assertIn("carpark1/L306/sensor2-v1/exit", load_generator.sensor_topics["carpark1"])
+        for topics in load_generator.sensor_topics.values():
+            self.assertEqual(len(topics), 10)
+            self.assertEqual(sum(topic.endswith("entry") for topic in topics), 5)
+
+        report = load_generator.run(duration=None, max_events=2000)
+        self.assertEqual(report["Events"], 2000)
+
+        # The load is spread over all the Virtual Sensors
+        counts = [len(messages) for messages in published.values()]
+        self.assertEqual(sum(counts), 2000)
+        self.assertGreater(min(counts), 2000 / 20 / 2)
+
+        with self.assertRaises(ValueError):
+            LoadGenerator(Config(PROJECT_ROOT_DIR / 'tests' / 'sample_config.toml'), connect=False,
+                          sensors_per_car_park=1)
@@ -0,0 +1,76 @@
+import unittest
+import gc
+import threading
+import weakref
+import urllib.request
+
+from smartpark.carpark import AVAILABLE_BAYS
+from smartpark.metrics import MetricsRegistry, start_metrics_server
+
+from helpers import create_car_park
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registry = MetricsRegistry()
+
+    def test_counter_threads(self):
+        """Test Counter increments from many threads are not lost"""
+        counter = self.registry.counter("test_events_total", "Events", ["car_park"]).labels("carpark1")
+
+        def increment():
+            for _ in range(10000):
+                counter.inc()
+
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(counter.value, 40000)
+        self.assertIn('test_events_total{car_park="carpark1"} 40000', self.registry.expose())
+
+    def test_gauge_and_histogram(self):
+        """Test Gauges and cumulative Histogram Buckets in the Prometheus Text Format"""
+        self.registry.gauge("test_available_bays", "Available bays").labels().set_function(lambda: 3)
+
+        histogram = self.registry.histogram("test_handle_seconds", "Handling", ["car_park"], buckets=[0.1, 1])
+        for value in [0.05, 0.5, 5]:
+            histogram.labels("carpark1").observe(value)
+
+        text = self.registry.expose()
+        self.assertIn("# TYPE test_available_bays gauge\ntest_available_bays 3", text)
+        self.assertIn('test_handle_seconds_bucket{car_park="carpark1",le="0.1"} 1', text)
+        self.assertIn('test_handle_seconds_bucket{car_park="carpark1",le="1"} 2', text)
+        self.assertIn('test_handle_seconds_bucket{car_park="carpark1",le="+Inf"} 3', text)
+        self.assertIn('test_handle_seconds_count{car_park="carpark1"} 3', text)
+
+        self.assertRaises(ValueError, lambda: self.registry.counter("test_available_bays", "Conflict"))
+        self.assertRaises(ValueError, lambda: histogram.labels("carpark1", "extra"))
+
+    def test_gauge_owner(self):
+        """Test Gauges computed from a Car Park do not keep it alive"""
+        car_park = create_car_park("carpark_metrics_owner", 4)
+        self.assertEqual(AVAILABLE_BAYS.labels("carpark_metrics_owner").value, 4)
+
+        car_park_ref = weakref.ref(car_park)
+        del car_park
+        gc.collect()
+        self.assertIsNone(car_park_ref())
+        self.assertEqual(AVAILABLE_BAYS.labels("carpark_metrics_owner").value, 0)
+
+    def test_http_endpoint(self):
+        """Test Scraping the Metrics over HTTP"""
+        self.registry.counter("test_scrapes_total", "Scrapes").labels().inc()
+        server = start_metrics_server(0, registry=self.registry)
+
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                self.assertIn("test_scrapes_total 1", response.read().decode())
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
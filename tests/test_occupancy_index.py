@@ -0,0 +1,87 @@
+import unittest
+import random
+
+from datetime import datetime
+
+from smartpark.car import Car, timestamp_to_datetime
+from smartpark.occupancy_index import OccupancyIndex
+
+from helpers import create_car_park
+
+
+def create_stays(num_stays: int, seed: int):
+    generator = random.Random(seed)
+    stays = []
+    for _ in range(num_stays):
+        entry_time = generator.randint(0, 10000)
+        exit_time = entry_time + generator.randint(0, 500) if generator.random() < 0.9 else None
+        stays.append((entry_time, exit_time))
+    return stays
+
+
+def count_occupancy(stays, time: int) -> int:
+    return sum(1 for entry_time, exit_time in stays if entry_time <= time and (exit_time is None or time < exit_time))
+
+
+class TestOccupancyIndex(unittest.TestCase):
+    def assert_matches(self, index: OccupancyIndex, stays):
+        generator = random.Random(1)
+        for _ in range(200):
+            time = generator.randint(-10, 11000)
+            self.assertEqual(index.occupancy_at(timestamp_to_datetime(time)), count_occupancy(stays, time))
+
+            end = time + generator.randint(0, 1000)
+            self.assertEqual(index.peak_occupancy(timestamp_to_datetime(time), timestamp_to_datetime(end)),
+                             max(count_occupancy(stays, t) for t in range(time, end + 1)))
+
+    def test_build(self):
+        stays = create_stays(300, seed=0)
+        cars = []
+        for entry_time, exit_time in stays:
+            car = Car("ABC-123", "ModelA")
+            car.entry_timestamp = entry_time
+            car.exit_timestamp = exit_time
+            cars.append(car)
+
+        index = OccupancyIndex.build(cars, seed=0)
+        self.assertEqual(len(index), len({time for stay in stays for time in stay if time is not None}))
+        self.assert_matches(index, stays)
+
+    def test_updates(self):
+        stays = create_stays(300, seed=1)
+        index = OccupancyIndex(seed=0)
+        for entry_time, exit_time in stays:
+            index.add_stay(entry_time, exit_time)
+        self.assert_matches(index, stays)
+
+        with self.assertRaises(ValueError):
+            index.peak_occupancy(datetime(2024, 1, 2), datetime(2024, 1, 1))
+
+    def test_compact(self):
+        stays = create_stays(300, seed=2)
+        index = OccupancyIndex(seed=0)
+        for entry_time, exit_time in stays:
+            index.add_stay(entry_time, exit_time)
+        num_changes = len(index)
+
+        index.compact(5000)
+        self.assertLess(len(index), num_changes)
+        for time in range(5000, 11000, 7):  # Unchanged from the compacted time on
+            self.assertEqual(index.occupancy_at_timestamp(time), count_occupancy(stays, time))
+        self.assertEqual(index.peak_occupancy_timestamps(5000, 6000),
+                         max(count_occupancy(stays, t) for t in range(5000, 6001)))
+
+    def test_car_park_listener(self):
+        car_park = create_car_park("carpark1", occupancy_index=True)
+        car_park.temperature = 25
+        cars = [Car("ABC-123", "ModelA"), Car("XYZ-789", "ModelB")]
+        for car in cars:
+            car_park.add_car(car)
+        self.assertEqual(car_park.occupancy_index.occupancy_at(cars[1].entry_time), 2)
+
+        car_park.remove_car(cars[0])
+        self.assertEqual(car_park.occupancy_index.occupancy_at(cars[0].exit_time), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
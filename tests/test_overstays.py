@@ -0,0 +1,65 @@
+import unittest
+from datetime import datetime, timedelta
+
+from smartpark.car import Car
+from smartpark.carpark import OVERSTAYS
+from smartpark.timing_wheel import TimingWheel
+
+from helpers import create_car_park
+
+
+class TestTimingWheel(unittest.TestCase):
+    def test_advance(self):
+        wheel = TimingWheel(tick=1, num_slots=8)
+        wheel.schedule("a", 3)
+        wheel.schedule("b", 5.5)
+        wheel.schedule("c", 20)  # Beyond one round of the wheel
+        wheel.schedule("d", 4)
+
+        self.assertEqual(wheel.advance(2), [])
+        self.assertTrue(wheel.cancel("d"))
+        self.assertFalse(wheel.cancel("d"))
+        self.assertEqual(wheel.advance(5), ["a"])
+        self.assertEqual(wheel.advance(12), ["b"])  # "c" shares the slot of tick 12, one round later
+        self.assertEqual(len(wheel), 1)
+
+        wheel.schedule("e", 0)  # Past deadline: expires on the next advance
+        self.assertEqual(wheel.advance(100), ["e", "c"])  # Long pause: every slot is visited once
+        self.assertEqual(len(wheel), 0)
+
+    def test_reschedule(self):
+        wheel = TimingWheel(tick=0.5, num_slots=4)
+        wheel.schedule("sensor1", 1)
+        wheel.schedule("sensor1", 3)
+        self.assertEqual(wheel.get_deadline("sensor1"), 3)
+        self.assertEqual(wheel.advance(2), [])
+        self.assertEqual(wheel.advance(3), ["sensor1"])
+        self.assertNotIn("sensor1", wheel)
+
+        with self.assertRaises(ValueError):
+            TimingWheel(tick=0)
+
+
+class TestCarParkOverstays(unittest.TestCase):
+    def test_overstays(self):
+        car_park = create_car_park("carpark_overstays", max_stay=3600, overstay_check_interval=3600)
+        overstays = OVERSTAYS.labels("carpark_overstays").value
+        car_park.temperature = 25
+        start = datetime(2026, 1, 1, 8)
+
+        cars = [Car(f"ABC-00{i}", "ModelA") for i in range(3)]
+        for i, car in enumerate(cars):
+            car_park.event_time = start + timedelta(minutes=10 * i)
+            car_park.add_car(car)
+        car_park.event_time = start + timedelta(minutes=30)
+        car_park.remove_car(cars[0])
+
+        self.assertEqual(car_park.check_overstays(start + timedelta(minutes=65)), [])
+        self.assertEqual(car_park.check_overstays(start + timedelta(minutes=75)), [cars[1]])
+        self.assertEqual(car_park.check_overstays(start + timedelta(hours=2)), [cars[2]])
+        self.assertEqual(car_park.check_overstays(start + timedelta(hours=3)), [])  # Reported once
+        self.assertEqual(OVERSTAYS.labels("carpark_overstays").value - overstays, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
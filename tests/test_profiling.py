@@ -0,0 +1,81 @@
+import unittest
+import os
+import threading
+
+import paho.mqtt.client as paho
+
+from smartpark.carpark import PARSE_ERRORS
+from smartpark.profiling import Profiler, PROFILER
+
+from helpers import create_car_park
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.profiler = Profiler()
+
+        @self.profiler.span("root", capture=True)
+        def root():
+            return child() + 1
+
+        @self.profiler.span("child")
+        def child():
+            return sum(range(1000))
+
+        self.root = root
+
+    def test_disabled(self):
+        """Test Spans are not recorded while disabled"""
+        self.assertEqual(self.root(), 499501)
+        self.assertEqual(self.profiler.spans(), {})
+        self.assertEqual(self.profiler.stop(), [])
+
+    def test_capture(self):
+        """Test Spans, cProfile and Stack Captures are written on stop()"""
+        self.profiler.start(sample_rate=1.0, stack_interval=0.001)
+        for _ in range(200):
+            self.root()
+
+        spans = self.profiler.spans()
+        self.assertEqual(spans["root"]["count"], 200)
+        self.assertEqual(spans["child"]["count"], 200)
+
+        paths = self.profiler.stop("test_profiler")
+        try:
+            self.assertFalse(self.profiler.enabled)
+            self.assertTrue(any(path.endswith(".pstats") for path in paths))
+            self.assertTrue(any(path.endswith(".spans.json") for path in paths))
+            for path in paths:
+                self.assertTrue(os.path.exists(path))
+        finally:
+            for path in paths:
+                os.remove(path)
+
+
+class TestProfilingCommands(unittest.TestCase):
+    def send_command(self, car_park, command: str):
+        message = paho.MQTTMessage(topic=car_park.profiling_topic.encode())
+        message.payload = command.encode()
+        car_park._on_profiling_command(car_park.client, None, message)
+
+    def test_commands(self):
+        car_park = create_car_park("carpark_profiling")
+        parse_errors = PARSE_ERRORS.labels("carpark_profiling").value
+
+        for command in ["start,abc", "start,2", "start,0.1,1", "restart", ""]:
+            self.send_command(car_park, command)  # Logged and counted, not raised to the network loop
+        self.assertEqual(PARSE_ERRORS.labels("carpark_profiling").value - parse_errors, 5)
+        self.assertFalse(PROFILER.enabled)
+
+        self.send_command(car_park, "start,0.5")
+        self.assertTrue(PROFILER.enabled)
+
+        self.send_command(car_park, "stop")
+        for thread in threading.enumerate():  # The captures are written off the network thread
+            if thread.name == "profiling-carpark_profiling":
+                thread.join()
+        self.assertFalse(PROFILER.enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import threading
+import time
+from datetime import datetime
+
+from smartpark.carpark import CARS_EXITED, LATE_MESSAGES
+from smartpark.reorder import ReorderBuffer
+from smartpark.sensor_message import SensorMessage
+
+from helpers import FakeClock, create_car_park
+
+
+class TestReorderBuffer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.buffer = ReorderBuffer(max_lateness=5, clock=self.clock)
+
+    def test_watermark(self):
+        for timestamp in [100, 103, 101]:
+            self.assertTrue(self.buffer.push(timestamp, timestamp))
+        self.assertEqual(self.buffer.pop_ready(), [])
+
+        # 106 is 5 seconds newer than 101, which is released with the older events
+        self.buffer.push(106, 106)
+        self.assertEqual(self.buffer.pop_ready(), [100, 101])
+        self.assertEqual(self.buffer.watermark, 101)
+
+        self.assertFalse(self.buffer.push(99, 99))  # Late
+        self.assertTrue(self.buffer.push(102, 102))
+        self.assertEqual(self.buffer.pop_all(), [102, 103, 106])
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_waiting_time(self):
+        self.buffer.push(100, "a")
+        self.clock.now = 1
+        self.buffer.push(99, "b")
+        self.assertEqual(self.buffer.next_deadline(), 5)
+
+        # Nothing newer arrives: the events are released once they waited long enough
+        self.clock.now = 5
+        self.assertEqual(self.buffer.pop_ready(), ["b", "a"])
+        self.assertIsNone(self.buffer.next_deadline())
+
+
+class TestCarParkReorder(unittest.TestCase):
+    def create_car_park(self, **config):
+        return create_car_park("carpark_reorder", **config)
+
+    def test_sensor_time_order(self):
+        car_park = self.create_car_park(reorder_lateness=0.2)
+        now = time.time()
+        late_messages = LATE_MESSAGES.labels("carpark_reorder").value
+
+        # The exit was detected after the entry, but arrives first
+        self.assertTrue(car_park.handle_sensor_message(SensorMessage.from_payload(f"Exit,25,ts={now}")))
+        self.assertTrue(car_park.handle_sensor_message(SensorMessage.from_payload(f"Enter,24,ts={now - 1}")))
+        self.assertEqual(car_park.total_cars, 1)  # The entry is 1 s older than the exit, the exit waits
+
+        time.sleep(0.5)  # Applied by the timer, as nothing newer arrives
+        self.assertEqual(car_park.total_cars, 0)
+        self.assertEqual(car_park.entry_or_exit_time, datetime.fromtimestamp(now).replace(microsecond=0))  # Sensor time
+
+        self.assertFalse(car_park.handle_sensor_message(SensorMessage.from_payload(f"Enter,24,ts={now - 2}")))
+        self.assertEqual(car_park.total_cars, 1)
+        self.assertEqual(LATE_MESSAGES.labels("carpark_reorder").value - late_messages, 1)
+
+    def test_single_thread(self):
+        car_park = create_car_park("carpark_reorder_thread", reorder_lateness=0.05)
+        now = time.time()
+        for i in range(3):
+            car_park.handle_sensor_message(SensorMessage.from_payload(f"Exit,25,ts={now + i}"))
+            car_park.handle_sensor_message(SensorMessage.from_payload(f"Enter,24,ts={now + i - 0.5}"))
+            time.sleep(0.2)
+        self.assertEqual(car_park.total_cars, 0)
+
+        # Every deadline is waited for by the same thread: its metric cells do not grow with the deadlines
+        threads = [thread for thread in threading.enumerate() if thread.name == "reorder-carpark_reorder_thread"]
+        self.assertEqual(len(threads), 1)
+        self.assertLessEqual(len(CARS_EXITED.labels("carpark_reorder_thread")._value._cells), 2)
+
+    def test_arrival_order(self):
+        car_park = self.create_car_park()
+        now = time.time()
+        car_park.handle_sensor_message(SensorMessage.from_payload(f"Exit,25,ts={now}"))
+        car_park.handle_sensor_message(SensorMessage.from_payload(f"Enter,24,ts={now - 1}"))
+        self.assertEqual(car_park.total_cars, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+
+from datetime import datetime, timedelta
+
+from smartpark.car import Car
+from smartpark.reservations import LAPSES, ReservationBook
+from smartpark.sensor_message import SensorMessage
+
+from helpers import create_car_park
+
+
+class TestReservationBook(unittest.TestCase):
+    def setUp(self) -> None:
+        self.book = ReservationBook(total_bays=2, seed=0)
+
+    def test_capacity(self):
+        first = self.book.book("A", datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 10))
+        second = self.book.book("B", datetime(2024, 1, 1, 9), datetime(2024, 1, 1, 11))
+        self.assertIsNotNone(first)
+        self.assertIsNotNone(second)
+
+        # Both bays are held in [9, 10), not before nor after
+        self.assertIsNone(self.book.book("C", datetime(2024, 1, 1, 7), datetime(2024, 1, 1, 9, 30)))
+        self.assertIsNotNone(self.book.book("D", datetime(2024, 1, 1, 7), datetime(2024, 1, 1, 9)))
+        self.assertIsNotNone(self.book.book("E", datetime(2024, 1, 1, 10), datetime(2024, 1, 1, 12)))
+        self.assertEqual(self.book.available_bays(datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 12)), 0)
+
+        self.assertEqual(self.book.held_bays(datetime(2024, 1, 1, 8, 30)), 2)
+        self.assertEqual(self.book.held_bays(datetime(2024, 1, 1, 11)), 1)
+        self.assertEqual(self.book.held_bays(datetime(2024, 1, 1, 12)), 0)
+
+        self.assertTrue(self.book.cancel(second.reservation_id))
+        self.assertFalse(self.book.cancel(second.reservation_id))
+        self.assertEqual(self.book.available_bays(datetime(2024, 1, 1, 9), datetime(2024, 1, 1, 10)), 1)
+        self.assertEqual(len(self.book), 3)
+
+        with self.assertRaises(ValueError):
+            self.book.book("F", datetime(2024, 1, 1, 10), datetime(2024, 1, 1, 10))
+
+    def test_claim(self):
+        reservation = self.book.book("A", datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 10))
+
+        # Too early: the reservation is not active yet
+        car = Car("A", "ModelA")
+        car.entered_car_park(25, datetime(2024, 1, 1, 7))
+        self.book.on_car_added(car)
+        self.assertIsNotNone(self.book.get_reservation(reservation.reservation_id))
+
+        car.entered_car_park(25, datetime(2024, 1, 1, 9))
+        self.book.on_car_added(car)
+        self.assertIsNone(self.book.get_reservation(reservation.reservation_id))
+        self.assertEqual(self.book.get_reservations_by_license_plate("A"), [])
+
+        # The bay was held until the car arrived
+        self.assertEqual(self.book.held_bays(datetime(2024, 1, 1, 8, 59, 59)), 1)
+        self.assertEqual(self.book.held_bays(datetime(2024, 1, 1, 9)), 0)
+
+    def test_lapsed(self):
+        lapsed = self.book.book("A", datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 10))
+        active = self.book.book("B", datetime(2024, 1, 1, 9), datetime(2024, 1, 1, 12))
+        lapses = LAPSES.labels().value
+
+        car = Car("C", "ModelC")
+        car.entered_car_park(25, datetime(2024, 1, 1, 11))
+        self.book.on_car_added(car)
+
+        # The unclaimed reservation is forgotten, and the past of the index is merged into one change
+        self.assertIsNone(self.book.get_reservation(lapsed.reservation_id))
+        self.assertEqual(self.book.get_reservations_by_license_plate("A"), [])
+        self.assertFalse(self.book.cancel(lapsed.reservation_id))
+        self.assertEqual(len(self.book), 1)
+        self.assertEqual(len(self.book._index), 2)
+        self.assertEqual(LAPSES.labels().value - lapses, 1)
+
+        self.assertIsNotNone(self.book.get_reservation(active.reservation_id))
+        self.assertEqual(self.book.held_bays(datetime(2024, 1, 1, 11)), 1)
+        self.assertEqual(self.book.available_bays(datetime(2024, 1, 1, 11), datetime(2024, 1, 1, 13)), 1)
+
+
+class TestCarParkReservations(unittest.TestCase):
+    def test_available_bays(self):
+        car_park = create_car_park("carpark1", 2, reservations=True)
+        car_park.temperature = 25
+        car_park.event_time = datetime(2024, 1, 1, 9)
+
+        reservation = car_park.reserve_bay("A", datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 10))
+        self.assertIsNotNone(reservation)
+        self.assertEqual(car_park.held_bays, 1)
+        self.assertEqual(car_park.available_bays, 1)
+
+        other_car = Car("B", "ModelB")
+        car_park.add_car(other_car)
+        car_park.park_car(other_car)
+        self.assertEqual(car_park.available_bays, 0)
+        self.assertEqual(car_park.publish_to_display().split(";")[0], "0")
+
+        # No bay left now, but there is one once the reservation ends
+        self.assertIsNone(car_park.reserve_bay("C", datetime(2024, 1, 1, 9), datetime(2024, 1, 1, 11)))
+        self.assertIsNotNone(car_park.reserve_bay("C", datetime(2024, 1, 1, 10), datetime(2024, 1, 1, 11)))
+
+        # The reserved car takes its bay
+        car_park.add_car(Car("A", "ModelA"))
+        self.assertEqual(car_park.held_bays, 0)
+        self.assertEqual(car_park.available_bays, 1)
+
+    def test_current_time_after_events(self):
+        car_park = create_car_park("carpark_reservations_clock", 2, reservations=True)
+        an_hour_ago = datetime.now() - timedelta(hours=1)
+        car_park.handle_sensor_message(SensorMessage.from_payload(f"Enter,25,ts={an_hour_ago.timestamp()}"))
+        self.assertEqual(car_park.parked_cars, 1)
+
+        # Started since the last event: held now, and checked against the parked car
+        start = datetime.now() - timedelta(minutes=10)
+        self.assertIsNotNone(car_park.reserve_bay("A", start, start + timedelta(hours=2)))
+        self.assertEqual(car_park.held_bays, 1)
+        self.assertEqual(car_park.available_bays, 0)
+        self.assertIsNone(car_park.reserve_bay("B", start, start + timedelta(hours=2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+from unittest import mock
+import multiprocessing
+import subprocess
+import threading
+import time
+import sys
+
+import paho.mqtt.client as paho
+
+from smartpark.config import Config
+from smartpark import runner as runner_module
+from smartpark.runner import Role, RoleRunner, SENSOR, CAR_PARK, DISPLAY
+from smartpark.project_paths import PROJECT_ROOT_DIR, DATA_DIR
+
+
+class PublishingSensor:
+    """Sensor Role publishing one Detection as soon as it starts"""
+    def __init__(self, entry_sensor_config: dict, exit_sensor_config: dict):
+        self.client = paho.Client()
+        self.client.connect(entry_sensor_config["host"], entry_sensor_config["port"])
+        self.topic = "/".join(entry_sensor_config[key] for key in ["topic-root", "location", "name", "topic-qualifier"])
+
+    def start_sensing(self):
+        self.client.loop_start()
+        self.client.publish(self.topic, "Enter,25").wait_for_publish()
+        self.client.loop_stop()
+
+
+def count_stored_display_messages(display_topic: str) -> int:
+    file_path = DATA_DIR / "display_messages.txt"
+    if not file_path.exists():
+        return 0
+    with open(file_path, "r") as file:
+        return sum(1 for line in file if line.rstrip("\n").endswith("," + display_topic))
+
+
+class TestRunner(unittest.TestCase):
+    def setUp(self) -> None:
+        self.config_path = str(PROJECT_ROOT_DIR / 'tests' / 'sample_config.toml')
+        self.config = Config(self.config_path)
+
+    def test_role_spec(self):
+        role = Role.from_spec("display:tk:display2")
+        self.assertEqual((role.role, role.device_type, role.name), (DISPLAY, "tk", "display2"))
+        self.assertTrue(role.is_gui)
+
+        role = Role.from_spec("carpark")
+        self.assertEqual((role.role, role.device_type, role.name), (CAR_PARK, "simulated", None))
+        self.assertFalse(role.is_gui)
+
+        self.assertEqual(Role.from_spec("sensor").device_type, "random")
+        self.assertEqual(str(Role.from_spec("sensor::sensor1,sensor2")), "sensor:random:sensor1,sensor2")
+
+        with self.assertRaises(ValueError):
+            Role.from_spec("gate")
+
+        with self.assertRaises(ValueError):
+            Role.from_spec("display:led")
+
+    def test_sensor_configs(self):
+        entry_config, exit_config = Role(SENSOR)._get_sensor_configs(self.config, "carpark1")
+        self.assertEqual((entry_config["name"], entry_config["topic-qualifier"]), ("sensor1", "entry"))
+        self.assertEqual((exit_config["name"], exit_config["topic-qualifier"]), ("sensor2", "exit"))
+
+        entry_config, exit_config = Role(SENSOR, name="sensor1,sensor2")._get_sensor_configs(self.config, "carpark1")
+        self.assertEqual((entry_config["name"], exit_config["name"]), ("sensor1", "sensor2"))
+
+    def test_headless_imports(self):
+        # Headless roles must not load tkinter, nor pprint before serving
+        code = "import sys, smartpark.sensor, smartpark.carpark, smartpark.display, smartpark.runner; " \
+               "print(sorted(m for m in ['tkinter', 'pprint', 'http.server'] if m in sys.modules))"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=PROJECT_ROOT_DIR).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_run_until_quit(self):
+        runner = RoleRunner(self.config_path, "carpark1", [Role.from_spec("carpark"),
+                                                            Role.from_spec("display:console")])
+        thread = threading.Thread(target=runner.run, daemon=True)
+        thread.start()
+        thread.join(timeout=1)
+        self.assertTrue(thread.is_alive())
+
+        client = paho.Client()
+        client.connect("localhost", 1883)
+        client.loop_start()
+        # The car park and the display subscribe to "quit" on their first message
+        client.publish("carpark1/L306/sensor1/entry", "Enter,25").wait_for_publish()
+        thread.join(timeout=1)
+        client.publish("quit", "quit").wait_for_publish()
+        client.loop_stop()
+
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+
+    def test_second_gui_in_process(self):
+        # Console Displays stand in for GUIs: the first runs in the calling thread, the second in its own process
+        with mock.patch.object(runner_module, "GUI_TYPES", ["tk", "console"]):
+            runner = RoleRunner(self.config_path, "carpark2", [Role.from_spec("carpark"),
+                                                                Role.from_spec("display:console:display1"),
+                                                                Role.from_spec("display:console:display2")])
+            thread = threading.Thread(target=runner.run, daemon=True)
+            thread.start()
+
+            deadline = time.monotonic() + 10
+            while "display:console:display2" not in [p.name for p in multiprocessing.active_children()]:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.1)
+            time.sleep(2)  # The child process imports and connects
+
+        client = paho.Client()
+        client.connect("localhost", 1883)
+        client.loop_start()
+        client.publish("carpark2/L250/sensor1/entry", "Enter,25").wait_for_publish()
+        thread.join(timeout=1)
+        client.publish("quit", "quit").wait_for_publish()
+        client.loop_stop()
+
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_sensors_after_ready(self):
+        # The Sensor publishes at once: the Display of the child process must have subscribed before
+        display_topic = self.config.create_car_park_display_topic("carpark2")
+        stored_messages = count_stored_display_messages(display_topic)
+
+        with mock.patch.object(runner_module, "GUI_TYPES", ["tk", "console"]), \
+                mock.patch.dict(runner_module.ROLE_TYPES[SENSOR], {"publishing": f"{__name__}:PublishingSensor"}):
+            runner = RoleRunner(self.config_path, "carpark2", [Role.from_spec("sensor:publishing"),
+                                                                Role.from_spec("carpark"),
+                                                                Role.from_spec("display:console:display1"),
+                                                                Role.from_spec("display:console:display2")],
+                                sensor_delay=0)
+            thread = threading.Thread(target=runner.run, daemon=True)
+            thread.start()
+
+            # Stored by both Displays
+            deadline = time.monotonic() + 20
+            while count_stored_display_messages(display_topic) < stored_messages + 2 and time.monotonic() < deadline:
+                time.sleep(0.1)
+
+        client = paho.Client()
+        client.connect("localhost", 1883)
+        client.loop_start()
+        client.publish("quit", "quit").wait_for_publish()
+        client.loop_stop()
+        thread.join(timeout=10)
+
+        self.assertEqual(count_stored_display_messages(display_topic), stored_messages + 2)
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
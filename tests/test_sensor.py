@@ -1,5 +1,8 @@
 import unittest
+import tempfile
 import random
+import time
+import os
 
 from smartpark.config import Config
 from smartpark.sensor import Sensor, Detector, FileDetector, DetectorFactory
@@ -127,6 +130,35 @@ class TestFileDetector(unittest.TestCase):
 
         self.assertEqual(counter, 30)
 
+    def test_accelerated_replay(self):
+        """Test Replay of timestamped lines in accelerated mode"""
+        config = Config(PROJECT_ROOT_DIR / 'tests' / 'sample_config.toml')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+            file.write("Enter,21.5,2024-01-01 10:00:00\n"
+                       "Exit,22,2024-01-01 10:00:10\n"
+                       "Enter,23,2024-01-01 10:00:20\n"
+                       "Quit,0\n"
+                       "Enter,24,2024-01-01 10:00:30\n")
+
+        try:
+            self.assertEqual(FileDetector.parse_timestamp("1704067220"), 1704067220.0)
+
+            detector = FileDetector(config.get_sensor_config_dict("carpark1", "sensor1", "entry"),
+                                    config.get_sensor_config_dict("carpark1", "sensor2", "exit"),
+                                    file.name, replay_mode=FileDetector.REPLAY_ACCELERATED, speed=100
+                                    )
+
+            start = time.monotonic()
+            events = list(detector.start_sensing(use_quit=False))
+            elapsed = time.monotonic() - start
+
+            self.assertEqual(events, [("Enter", 21.5), ("Exit", 22.0), ("Enter", 23.0)])
+            self.assertGreaterEqual(elapsed, 0.2)  # 20 s of recorded time replayed 100x faster
+            self.assertRaises(ValueError, lambda: FileDetector(None, None, file.name, replay_mode="unknown"))
+        finally:
+            os.remove(file.name)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from datetime import datetime, timedelta
+
+from smartpark.carpark import CarPark
+from smartpark.simulation import VirtualClock, EventScheduler, CarParkSimulation, exponential_dwell_time
+
+from helpers import create_car_park
+
+
+START = datetime(2026, 1, 5)
+
+
+class TestEventScheduler(unittest.TestCase):
+    def test_order(self):
+        clock = VirtualClock(START)
+        scheduler = EventScheduler(clock)
+        log = []
+
+        def record(name: str):
+            log.append((name, clock()))
+            if name == "a":
+                scheduler.schedule_after(30, record, "c")  # Scheduled by an action
+
+        scheduler.schedule(START + timedelta(minutes=2), record, "b")
+        scheduler.schedule(START + timedelta(minutes=1), record, "a")
+        scheduler.schedule(START + timedelta(minutes=2), record, "b2")
+        scheduler.schedule(START + timedelta(hours=2), record, "d")
+
+        self.assertEqual(scheduler.run(START + timedelta(hours=1)), 4)
+        self.assertEqual(log, [("a", START + timedelta(minutes=1)), ("c", START + timedelta(minutes=1, seconds=30)),
+                               ("b", START + timedelta(minutes=2)), ("b2", START + timedelta(minutes=2))])
+        self.assertEqual(clock(), START + timedelta(hours=1))
+        self.assertEqual(len(scheduler), 1)
+
+        with self.assertRaises(ValueError):
+            clock.advance_to(START)
+
+
+class TestCarParkSimulation(unittest.TestCase):
+    def create_simulation(self, total_bays: int, **kwargs) -> CarParkSimulation:
+        clock = VirtualClock(START)
+        car_park = create_car_park("carpark_simulation", total_bays, CarPark, clock=clock)
+        return CarParkSimulation(car_park, clock, seed=0, **kwargs)
+
+    def test_virtual_time(self):
+        simulation = self.create_simulation(50, arrival_rate=60, dwell_time=exponential_dwell_time(1800))
+        report = simulation.run(timedelta(days=1))
+
+        self.assertEqual(report["Virtual Time"], START + timedelta(days=1))
+        self.assertAlmostEqual(report["Arrivals"], 24 * 60, delta=200)
+        self.assertEqual(report["Arrivals"] - report["Turned Away"] - report["Departures"], report["Cars"])
+        self.assertEqual(simulation.car_park.parked_cars, report["Cars"])
+
+        # The cars enter at virtual times, not now
+        entry_times = [car.entry_time for car in simulation.car_park.get_all_cars()]
+        self.assertTrue(all(START <= entry_time <= START + timedelta(days=1) for entry_time in entry_times))
+
+        report = simulation.run(timedelta(hours=1))  # Continues from where it stopped
+        self.assertEqual(report["Virtual Time"], START + timedelta(days=1, hours=1))
+
+    def test_full(self):
+        def daily_profile(time: datetime) -> float:
+            return 120 if 8 <= time.hour < 18 else 0  # Cars per hour, none at night
+
+        simulation = self.create_simulation(10, arrival_rate=daily_profile, dwell_time=lambda rng: 8 * 3600)
+        report = simulation.run(timedelta(hours=12))
+
+        self.assertEqual(report["Peak Parked Cars"], 10)
+        self.assertGreater(report["Turned Away"], 0)
+        self.assertEqual(simulation.car_park.available_bays, 0)
+        self.assertTrue(all(car.entry_time.hour >= 8 for car in simulation.car_park.get_all_cars()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import math
+
+import paho.mqtt.client as paho
+
+from smartpark.telemetry import TemperatureFilter
+
+from helpers import FakeClock, create_car_park, create_sensor
+
+
+class TestTemperatureFilter(unittest.TestCase):
+    def test_deadband(self):
+        clock = FakeClock()
+        temperature_filter = TemperatureFilter(deadband=1, max_interval=60, window=2, clock=clock)
+
+        self.assertEqual(temperature_filter.update(20), 20)  # The first reading is always published
+        self.assertIsNone(temperature_filter.update(21))  # Average 20.5
+        self.assertEqual(temperature_filter.update(22), 21.5)
+        self.assertIsNone(temperature_filter.update(21.5))
+
+        clock.now = 60
+        self.assertEqual(temperature_filter.update(21.5), 21.5)  # Max interval
+
+        with self.assertRaises(ValueError):
+            TemperatureFilter(window=0)
+
+
+class TestTelemetry(unittest.TestCase):
+    def test_sensor(self):
+        sensor = create_sensor(telemetry=True)
+        sensor.on_car_entry()
+        sensor.on_car_entry()
+
+        topics = [topic for topic, _ in sensor.published]
+        self.assertEqual(topics, ["carpark/L1/sensor1/entry/telemetry", "carpark/L1/sensor1/entry",
+                                  "carpark/L1/sensor1/entry"])
+        self.assertEqual(sensor.published[0][1], "25.00")
+        self.assertTrue(sensor.published[1][1].startswith("Enter,,"))
+
+    def test_retained(self):
+        sensor = create_sensor(telemetry=True)
+        retained = []
+        sensor.client.publish = lambda topic, payload=None, qos=0, retain=False: retained.append(retain)
+        sensor.record_temperature(25)
+        self.assertEqual(retained, [True])  # A car park (re)starting gets the latest temperature
+
+    def test_car_park_cache(self):
+        car_park = create_car_park("carpark_telemetry")
+        car_park.register_sensor_topic("carpark/L1/sensor1/entry")
+
+        def receive(topic: str, payload: bytes):
+            message = paho.MQTTMessage(topic=topic.encode())
+            message.payload = payload
+            if topic.endswith("/telemetry"):
+                car_park._on_telemetry(car_park.client, None, message)
+            else:
+                car_park.on_message(car_park.client, None, message)
+
+        receive("carpark/L1/sensor1/entry", b"Enter,")  # No telemetry yet: counted, at an unknown temperature
+        self.assertEqual(car_park.total_cars, 1)
+        self.assertTrue(math.isnan(car_park.get_all_cars()[0].entry_temperature))
+
+        receive("carpark/L1/sensor1/entry/telemetry", b"23.50")
+        receive("carpark/L1/sensor1/entry", b"Enter,")
+        self.assertEqual(car_park.get_all_cars()[1].entry_temperature, 23.5)
+
+        receive("carpark/L1/sensor1/entry", b"Enter,26")  # A temperature in the message is used as-is
+        self.assertEqual(car_park.temperature, "26")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import sys
+import threading
+
+from smartpark.sensor_message import SensorMessage
+from smartpark.tracing import LatencyHistogram, Tracer, create_trace_field, parse_trace_field
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def setUp(self) -> None:
+        self.histogram = LatencyHistogram(max_seconds=10)
+
+    def test_percentiles(self):
+        """Test Percentiles are within the relative error of the Buckets"""
+        for i in range(1, 1001):
+            self.histogram.record(i / 1000)  # 1 ms to 1 s
+
+        self.assertEqual(self.histogram.count, 1000)
+        self.assertAlmostEqual(self.histogram.sum, 500.5, places=3)
+        self.assertEqual(self.histogram.max, 1.0)
+
+        for q in [50, 90, 99]:
+            self.assertAlmostEqual(self.histogram.percentile(q), q / 100, delta=q / 100 / 16)
+
+    def test_bounds(self):
+        """Test Negative and Overflowing Values are clamped"""
+        self.histogram.record(-1)
+        self.histogram.record(100)
+        self.assertEqual(self.histogram.count, 2)
+        self.assertEqual(self.histogram.percentile(0), 1e-6)
+        self.assertEqual(self.histogram.max, 10)
+
+    def test_threads(self):
+        """Test Values recorded from many Threads are not lost"""
+        def record():
+            for i in range(20000):
+                self.histogram.record(i / 1000000)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+        try:
+            threads = [threading.Thread(target=record) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        self.assertEqual(self.histogram.count, 80000)
+        self.assertEqual(sum(self.histogram.buckets().values()), 80000)
+
+    def test_tracer(self):
+        """Test Tracer Stages and Snapshot"""
+        tracer = Tracer()
+        tracer.record("car_park.handle", 0.002)
+        tracer.record("car_park.handle", 0.004)
+        self.assertEqual(tracer.stages(), ["car_park.handle"])
+        self.assertEqual(tracer.snapshot()["car_park.handle"]["count"], 2)
+
+
+class TestSensorMessage(unittest.TestCase):
+    def test_round_trip(self):
+        """Test Parsing of Sensor Messages with and without Metadata"""
+        message = SensorMessage.from_payload("Enter,24")
+        self.assertEqual((message.signal, message.temperature, message.metadata), ("Enter", "24", {}))
+        self.assertIsNone(message.event_id)
+        self.assertIsNone(message.timestamp)
+
+        message = SensorMessage.from_payload("Exit,21.5,id=abc,ts=1700000000.5")
+        self.assertEqual(message.event_id, "abc")
+        self.assertEqual(message.timestamp, 1700000000.5)
+        self.assertEqual(message.to_payload(), "Exit,21.5,id=abc,ts=1700000000.5")
+
+        self.assertRaises(ValueError, lambda: SensorMessage.from_payload("Enter"))
+        self.assertRaises(ValueError, lambda: SensorMessage.from_payload("Enter,24,id"))
+
+    def test_trace_field(self):
+        event_id, sensor_time, _ = parse_trace_field(create_trace_field("abc", 1700000000.5))
+        self.assertEqual((event_id, sensor_time), ("abc", 1700000000.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
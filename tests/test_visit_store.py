@@ -0,0 +1,95 @@
+import unittest
+import tempfile
+import os
+
+from datetime import datetime
+
+from smartpark.car import Car
+from smartpark.visit_store import VisitStore
+
+from helpers import create_car_park
+
+
+def create_car(license_plate: str, car_model: str, entry_time: datetime, exit_time: datetime | None = None) -> Car:
+    car = Car(license_plate, car_model)
+    car.entered_car_park(25, entry_time)
+    if exit_time is not None:
+        car.exited_car_park(26, exit_time)
+    return car
+
+
+class TestVisitStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = VisitStore(os.path.join(self.temp_dir.name, "visits.db"))
+
+    def tearDown(self) -> None:
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def test_entries_and_exits(self):
+        first_visit = create_car("ABC-123", "ModelA", datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 9))
+        self.store.record_entry(first_visit)
+        self.store.record_exit(first_visit)
+
+        second_visit = create_car("ABC-123", "ModelA", datetime(2024, 1, 2, 8))
+        self.store.on_car_added(second_visit)
+        self.assertTrue(self.store.flush(timeout=5))
+
+        visits = self.store.get_visits_by_license_plate("ABC-123")
+        self.assertEqual([(car.entry_time, car.exit_time) for car in visits],
+                         [(datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 9)), (datetime(2024, 1, 2, 8), None)])
+
+        # The exit closes the latest open visit only
+        second_visit.exited_car_park(27, datetime(2024, 1, 2, 10))
+        self.store.on_car_removed(second_visit)
+        self.store.flush(timeout=5)
+
+        visits = self.store.get_visits_by_license_plate("ABC-123")
+        self.assertEqual([car.exit_time for car in visits], [datetime(2024, 1, 1, 9), datetime(2024, 1, 2, 10)])
+        self.assertEqual(visits[1].exit_temperature, 27)
+        self.assertEqual(self.store.get_open_visits(), [])
+
+    def test_queries(self):
+        cars = [create_car("A", "ModelA", datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 12)),
+                create_car("B", "ModelB", datetime(2024, 1, 1, 9), datetime(2024, 1, 1, 10)),
+                create_car("C", "ModelA", datetime(2024, 1, 1, 13)),
+                create_car("D", "ModelB", datetime(2024, 1, 1, 6), datetime(2024, 1, 1, 7))]
+        for car in cars:
+            self.store.record_entry(car)
+            if car.exit_time is not None:
+                self.store.record_exit(car)
+        self.store.flush(timeout=5)
+
+        def plates(visits):
+            return sorted(car.license_plate for car in visits)
+
+        self.assertEqual(plates(self.store.get_visits_in_window(datetime(2024, 1, 1, 11), datetime(2024, 1, 1, 11))),
+                         ["A"])
+        self.assertEqual(plates(self.store.get_visits_in_window(datetime(2024, 1, 1, 9, 30), datetime(2024, 1, 2))),
+                         ["A", "B", "C"])
+        self.assertEqual(plates(self.store.get_visits_in_window(datetime(2024, 1, 2), datetime(2024, 1, 3))), ["C"])
+
+        self.assertEqual(plates(self.store.get_visits_by_car_model("ModelA")), ["A", "C"])
+        self.assertEqual(plates(self.store.get_visits_by_car_model("ModelB", start=datetime(2024, 1, 1, 8))), ["B"])
+        self.assertEqual(plates(self.store.get_open_visits()), ["C"])
+        self.assertEqual([car.license_plate for car in self.store.iter_visits(batch_size=2)], ["D", "A", "B", "C"])
+
+    def test_car_park_listener(self):
+        car_park = create_car_park("carpark1", visit_store=os.path.join(self.temp_dir.name, "car_park.db"))
+        car_park.temperature = 25
+        car = Car("XYZ-789", "ModelC")
+        car_park.add_car(car)
+        car_park.remove_car(car)
+        car_park.visit_store.close()
+
+        # An absolute path is used as-is
+        store = VisitStore(os.path.join(self.temp_dir.name, "car_park.db"))
+        visits = store.get_visits_by_license_plate("XYZ-789")
+        store.close()
+        self.assertEqual(len(visits), 1)
+        self.assertEqual(visits[0].exit_timestamp, car.exit_timestamp)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+import tempfile
+import os
+
+from smartpark.car import Car
+from smartpark.config import Config, flatten_zone_configs
+from smartpark.zones import ZoneTree
+
+from helpers import create_car_park
+
+
+ZONES_CONFIG = """
+[[car_parks]]
+name = "carpark1"
+location = "L1"
+host = "localhost"
+port = 1883
+topic-root = "carpark1"
+total_bays = 5
+
+[[car_parks.zones]]
+name = "level1"
+
+[[car_parks.zones.zones]]
+name = "ev"
+bays = 1
+type = "ev"
+
+[[car_parks.zones.zones]]
+name = "general"
+bays = 2
+
+[[car_parks.zones]]
+name = "level2"
+bays = 2
+"""
+
+
+class TestZoneConfig(unittest.TestCase):
+    def test_flatten(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_path = os.path.join(temp_dir, "config.toml")
+            with open(config_path, "w") as file:
+                file.write(ZONES_CONFIG)
+            config = Config(config_path)
+
+        zone_configs = config.get_car_park_config("carpark1")["zones"]
+        self.assertEqual([(zone["path"], zone["parent"], zone["bays"]) for zone in zone_configs],
+                         [("level1", None, 3), ("level1/ev", "level1", 1), ("level1/general", "level1", 2),
+                          ("level2", None, 2)])
+        self.assertEqual(zone_configs[1]["type"], "ev")
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            flatten_zone_configs([{"name": "level1"}])
+        with self.assertRaises(ValueError):
+            flatten_zone_configs([{"name": "level1", "bays": 3, "zones": [{"name": "ev", "bays": 1}]}])
+        with self.assertRaises(ValueError):
+            flatten_zone_configs([{"name": "level1", "bays": 1}, {"name": "level1", "bays": 1}])
+
+
+class TestZoneTree(unittest.TestCase):
+    def setUp(self) -> None:
+        self.zones = ZoneTree(flatten_zone_configs([
+            {"name": "level1", "zones": [{"name": "ev", "bays": 1}, {"name": "general", "bays": 2}]},
+            {"name": "level2", "bays": 2}]))
+
+    def test_counters(self):
+        ev = self.zones.get_zone_id("level1/ev")
+        self.assertEqual([self.zones.get_path(zone_id) for zone_id in self.zones.occupy(ev)], ["level1/ev", "level1"])
+        self.assertEqual(self.zones.get_available(self.zones.get_zone_id("level1")), 2)
+
+        # The free zones are found down the hierarchy, skipping the full ones
+        self.assertEqual(self.zones.find_free_zone(), self.zones.get_zone_id("level1/general"))
+        self.assertIsNone(self.zones.find_free_zone(ev))
+
+        self.zones.release(ev)
+        self.assertEqual(self.zones.get_occupied(self.zones.get_zone_id("level1")), 0)
+
+        with self.assertRaises(ValueError):
+            self.zones.get_zone_id("level3")
+
+    def test_bays(self):
+        self.assertEqual([self.zones.get_path(self.zones.get_zone_of_bay(bay_id)) for bay_id in range(5)],
+                         ["level1/ev", "level1/general", "level1/general", "level2", "level2"])
+
+
+class TestCarParkZones(unittest.TestCase):
+    def create_car_park(self, **config):
+        car_park = create_car_park("carpark1", **{"zones": flatten_zone_configs([
+            {"name": "level1", "zones": [{"name": "ev", "bays": 1}, {"name": "general", "bays": 2}]},
+            {"name": "level2", "bays": 2}])} | config)
+        car_park.temperature = 25
+        return car_park
+
+    def test_park_in_zone(self):
+        car_park = self.create_car_park()
+        car = Car("A", "ModelA")
+        car_park.add_car(car)
+        car_park.park_car(car, zone="level2")
+        self.assertEqual(car_park.zones.get_path(car.zone_id), "level2")
+        self.assertEqual(car_park.zones.get_available(car.zone_id), 1)
+
+        car_park.remove_car(car)
+        self.assertIsNone(car.zone_id)
+        self.assertEqual(car_park.zones.get_available(car_park.zones.get_zone_id("level2")), 2)
+
+    def test_full_zone(self):
+        car_park = self.create_car_park()
+        ev_zone_id = car_park.zones.get_zone_id("level1/ev")
+        cars = [Car("A", "ModelA"), Car("B", "ModelB")]
+        for car in cars:
+            car_park.add_car(car)
+
+        self.assertTrue(car_park.park_car(cars[0], zone="level1/ev"))
+        self.assertFalse(car_park.park_car(cars[1], zone="level1/ev"))  # Refused, the car stays un-parked
+        self.assertFalse(cars[1].is_parked)
+        self.assertIsNone(cars[1].zone_id)
+        self.assertEqual(car_park.parked_cars, 1)
+        self.assertEqual(car_park.zones.get_occupied(ev_zone_id), 1)
+        top_zone_ids = [car_park.zones.get_zone_id("level1"), car_park.zones.get_zone_id("level2")]
+        self.assertEqual(sum(car_park.zones.get_occupied(zone_id) for zone_id in top_zone_ids), car_park.parked_cars)
+
+        self.assertTrue(car_park.park_car(cars[1], zone="level1"))
+        self.assertEqual(car_park.zones.get_path(cars[1].zone_id), "level1/general")
+
+    def test_all_zones_full(self):
+        car_park = self.create_car_park(total_bays=10)  # More bays than the zones hold
+        cars = [Car(f"{i}", "ModelA") for i in range(6)]
+        for car in cars:
+            car_park.add_car(car)
+
+        self.assertTrue(all(car_park.park_car(car) for car in cars[:5]))
+        self.assertFalse(car_park.park_car(cars[5]))  # No free zone: refused, the car stays un-parked
+        self.assertFalse(cars[5].is_parked)
+        self.assertEqual(car_park.parked_cars, 5)
+
+    def test_zones_of_bays(self):
+        car_park = self.create_car_park(bay_assignment=True, bay_distances=[5, 4, 3, 2, 1])
+        car = Car("A", "ModelA")
+        car_park.add_car(car)
+        car_park.park_car(car)
+        self.assertEqual((car.bay_id, car_park.zones.get_path(car.zone_id)), (4, "level2"))
+
+        with self.assertRaises(ValueError):
+            car_park.park_car(Car("B", "ModelB"), zone="level1")
+
+
+if __name__ == '__main__':
+    unittest.main()